@@ -9,7 +9,6 @@ import cStringIO
 
 from abc import ABCMeta, abstractmethod, abstractproperty
 
-from StringIO import StringIO
 from google.cloud import storage
 
 # For plotting and writing to file. use('agg') is to disable display
@@ -22,6 +21,7 @@ with warnings.catch_warnings():
 
 from ram import config
 from ram.analysis.run_aggregator import RunAggregator
+from ram.data.gcs_cache import get_gcs_cache
 from gearbox import convert_date_array
 
 
@@ -433,13 +433,12 @@ def write_json_cloud(out_dictionary, path, bucket):
 
 
 def read_json_cloud(path, bucket):
-    blob = bucket.get_blob(path)
-    return json.loads(blob.download_as_string())
+    return json.loads(get_gcs_cache().download_as_string(bucket, path))
 
 
 def read_csv_cloud(path, bucket):
-    blob = bucket.get_blob(path)
-    return pd.read_csv(StringIO(blob.download_as_string()))
+    with get_gcs_cache().open_blob(bucket, path) as f:
+        return pd.read_csv(f)
 
 
 def to_csv_cloud(data, path, bucket):
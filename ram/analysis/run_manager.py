@@ -3,7 +3,6 @@ import json
 import numpy as np
 import pandas as pd
 import datetime as dt
-from StringIO import StringIO
 import matplotlib.pyplot as plt
 
 from google.cloud import storage
@@ -13,6 +12,8 @@ from ram.utils.time_funcs import convert_date_array
 from ram import config
 from ram.analysis.statistics import get_stats
 from ram.analysis.selection import basic_model_selection
+from ram.data.gcs_cache import get_gcs_cache
+from ram.data.gcs_catalog import get_bucket_catalog
 
 
 class RunManager(object):
@@ -63,11 +64,7 @@ class RunManager(object):
         if config.GCP_CLOUD_IMPLEMENTATION:
             gcp_client = storage.Client()
             bucket = gcp_client.get_bucket(config.GCP_STORAGE_BUCKET_NAME)
-            cursor = bucket.list_blobs(prefix='simulations/', delimiter='/')
-            for blob in cursor:
-                pass
-            strategies = [prefix for prefix in cursor.prefixes]
-            return strategies
+            return get_bucket_catalog(bucket).list_dirs('simulations/')
         else:
             path = config.SIMULATIONS_DATA_DIR
             return [x for x in os.listdir(path) if
@@ -100,11 +97,8 @@ class RunManager(object):
         if config.GCP_CLOUD_IMPLEMENTATION:
             gcp_client = storage.Client()
             bucket = gcp_client.get_bucket(config.GCP_STORAGE_BUCKET_NAME)
-            cursor = bucket.list_blobs(
-                prefix='simulations/{}/'.format(strategy_class))
-            all_files = [x.name for x in cursor]
-            run_names = list(set([x.split('/')[2] for x in all_files]))
-            run_names.sort()
+            run_names = get_bucket_catalog(bucket).list_dirs(
+                'simulations/{}/'.format(strategy_class))
             # Make path names
             paths = [
                 'simulations/{}/{}/meta.json'.format(strategy_class, run) for
@@ -540,10 +534,9 @@ def read_json(path):
 
 
 def read_json_cloud(path, bucket):
-    blob = bucket.get_blob(path)
-    return json.loads(blob.download_as_string())
+    return json.loads(get_gcs_cache().download_as_string(bucket, path))
 
 
 def read_csv_cloud(path, bucket):
-    blob = bucket.get_blob(path)
-    return pd.read_csv(StringIO(blob.download_as_string()), index_col=0)
+    with get_gcs_cache().open_blob(bucket, path) as f:
+        return pd.read_csv(f, index_col=0)
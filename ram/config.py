@@ -34,6 +34,15 @@ POSITION_SHEET_DIR = os.path.join(BASE_DIR, 'position_sheet')
 
 MODEL_SELECTION_OUTPUT_DIR = os.path.join(BASE_DIR, 'model_selection')
 
+SQL_CACHE_DIR = os.path.join(BASE_DIR, 'sql_cache')
+
+TRADING_CALENDAR_DIR = os.path.join(BASE_DIR, 'trading_calendars')
+
+GCS_CACHE_DIR = os.path.join(BASE_DIR, 'gcs_cache')
+
 ERN_PEAD_DIR = os.path.join(os.getenv('DATA'), 'ram', 'data', 'temp_ern_pead')
 
 GCP_STORAGE_BUCKET_NAME = 'ram_data'
+
+# Prepped data files downloaded ahead of the one being read
+GCS_PREFETCH_FILES = 2
@@ -2,28 +2,71 @@ import os
 import json
 import shutil
 import itertools
+import threading
 import numpy as np
 import pandas as pd
 from tqdm import tqdm
+from collections import OrderedDict
 import datetime as dt
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+from multiprocessing.util import Finalize
 
 from StringIO import StringIO
 from google.cloud import storage
 
-from gearbox import convert_date_array
-
 from ram import config
 
+from ram.data.sql_features import parse_feature_args
+from ram.data.feature_store import FeatureStore
+from ram.data.gcs_catalog import get_bucket_catalog
+from ram.data.feature_engine import rank_features
+from ram.data.feature_engine import unranked_feature
 from ram.data.data_handler_sql import DataHandlerSQL
+from ram.data.data_handler_sql import MAX_SECCODE_DATA_FEATURES
 from ram.data.data_constructor_blueprint import DataConstructorBlueprint
 
 from ram.utils.documentation import get_git_branch_commit
+from ram.utils.read_write import PREPPED_DATA_FORMATS
+from ram.utils.read_write import PREPPED_DATA_MANIFEST
+from ram.utils.read_write import make_manifest_entry
+from ram.utils.read_write import read_manifest
+from ram.utils.read_write import update_manifest
+from ram.utils.read_write import is_prepped_data_file
+from ram.utils.read_write import find_prepped_data_file
+from ram.utils.read_write import read_prepped_data
+from ram.utils.read_write import write_prepped_data
 
 
 class DataConstructor(object):
 
-    def __init__(self, ram_prepped_data_dir=config.PREPPED_DATA_DIR):
+    def __init__(self, ram_prepped_data_dir=config.PREPPED_DATA_DIR,
+                 sql_cache=None, n_workers=1, worker_type='thread',
+                 feature_store_dir=None):
+        """
+        Parameters
+        ----------
+        sql_cache : SQLResultCache
+            Optional on-disk cache of feature pulls, so reruns and
+            overlapping blueprints skip queries that were already made
+        n_workers : int
+            Number of universe periods that are pulled and written
+            concurrently, each worker with its own DataHandlerSQL
+        worker_type : str
+            ['thread', 'process'] Processes also parallelize the pandas
+            cleaning and file writing
+        feature_store_dir : str
+            Optional directory of a FeatureStore for universe runs.
+            Overlapping periods then only query SecCode date ranges that
+            were not pulled before. Stored values are not refreshed, so
+            use for historical rebuilds. Periods are built serially.
+        """
+        assert worker_type in ('thread', 'process')
         self._prepped_data_dir = ram_prepped_data_dir
+        self._sql_cache = sql_cache
+        self._n_workers = n_workers
+        self._worker_type = worker_type
+        self._feature_store_dir = feature_store_dir
 
     # ~~~~~~ Interface ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
@@ -34,21 +77,63 @@ class DataConstructor(object):
         self._write_archive_meta_data(blueprint)
         self._make_data(blueprint)
 
+    def run_container(self, blueprint_container):
+        """
+        Runs every blueprint in the container. Universe blueprints with
+        the same date parameters are pulled together: one query per
+        period for the union of their universes and features, split
+        into each blueprint's own version directory and meta.json.
+        With a feature store or several workers, each blueprint is run
+        on its own, as fused pulls support neither.
+        """
+        groups = OrderedDict()
+        for blueprint in blueprint_container.get_blueprints():
+            if blueprint.constructor_type == 'universe':
+                key = json.dumps(blueprint.universe_date_parameters,
+                                 sort_keys=True)
+            else:
+                key = id(blueprint)
+            groups.setdefault(key, []).append(blueprint)
+        fuse = (self._feature_store_dir is None) and (self._n_workers <= 1)
+        for blueprints in groups.values():
+            if (len(blueprints) == 1) or (not fuse):
+                for blueprint in blueprints:
+                    self.run(blueprint)
+                continue
+            output_dirs = []
+            for blueprint in blueprints:
+                self._check_parameters(blueprint)
+                self._init_run(blueprint)
+                self._make_output_directory(blueprint)
+                self._write_archive_meta_data(blueprint)
+                output_dirs.append(self._output_dir)
+            self._make_fused_universe_data(blueprints, output_dirs)
+
     def rerun(self, output_dir_name, rerun_version):
         blueprint = self._init_rerun(output_dir_name, rerun_version)
         self._check_file_completeness(blueprint)
         self._make_data(blueprint)
 
-    def run_live(self, blueprint):
+    def run_live(self, blueprint, previous_file_name=None):
+        """
+        Parameters
+        ----------
+        previous_file_name : str
+            Optional earlier live file in the output directory for the
+            same blueprint. If it was built for the same universe, only
+            dates after it are pulled and appended to it.
+        """
         self._check_parameters(blueprint)
-        self._init_run_live(blueprint)
+        self._init_run_live(blueprint, previous_file_name)
         self._make_data(blueprint)
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
     def _make_data(self, blueprint):
 
-        dh = DataHandlerSQL()
+        dh = DataHandlerSQL(cache=self._sql_cache)
+        ext = PREPPED_DATA_FORMATS[
+            getattr(blueprint, 'output_file_format', 'csv')]
 
         # Market data - Do first to facilitate dev while doing data pull
         if hasattr(blueprint, 'market_data_params'):
@@ -58,7 +143,7 @@ class DataConstructor(object):
                 features=params['features'],
                 start_date='1990-01-01',
                 end_date='2050-04-01')
-            self._clean_and_write_output(data, 'market_index_data.csv')
+            self._clean_and_write_output(data, 'market_index_data' + ext)
 
         if blueprint.constructor_type == 'etfs':
             data = dh.get_etf_data(
@@ -66,8 +151,8 @@ class DataConstructor(object):
                 features=blueprint.features,
                 start_date=blueprint.etfs_filter_arguments['start_date'],
                 end_date=blueprint.etfs_filter_arguments['end_date'])
-            file_name = '{}.csv'.format(
-                blueprint.etfs_filter_arguments['output_file_name'])
+            file_name = '{}{}'.format(
+                blueprint.etfs_filter_arguments['output_file_name'], ext)
             self._clean_and_write_output(data, file_name)
 
         elif blueprint.constructor_type == 'seccodes':
@@ -76,8 +161,8 @@ class DataConstructor(object):
                 features=blueprint.features,
                 start_date=blueprint.seccodes_filter_arguments['start_date'],
                 end_date=blueprint.seccodes_filter_arguments['end_date'])
-            file_name = '{}.csv'.format(
-                blueprint.seccodes_filter_arguments['output_file_name'])
+            file_name = '{}{}'.format(
+                blueprint.seccodes_filter_arguments['output_file_name'], ext)
             self._clean_and_write_output(data, file_name)
 
         elif blueprint.constructor_type == 'indexes':
@@ -85,47 +170,167 @@ class DataConstructor(object):
 
         elif blueprint.constructor_type == 'universe':
             date_iterator = self._make_date_iterator(blueprint)
-            created_files = []
-            for t1, t2, t3 in tqdm(date_iterator):
-                # Check if file already exists in output directory
-                file_name = '{}_data.csv'.format(t2.strftime('%Y%m%d'))
-                if file_name in self._version_files:
-                    continue
-                created_files.append(file_name)
-                # Otherwise pull and process data
+            # Skip files that already exist in output directory, in any
+            # format, so reruns after a format change don't duplicate them
+            date_iterator = [
+                x for x in date_iterator if find_prepped_data_file(
+                    self._version_files,
+                    '{}_data'.format(x[1].strftime('%Y%m%d'))) is None]
+            # Select universes for all periods in one query
+            univ_seccodes = dh.get_filtered_seccodes_batch(
+                [t2 - dt.timedelta(days=1) for _, t2, _ in date_iterator],
+                blueprint.universe_filter_arguments)
+            tasks = []
+            for t1, t2, t3 in date_iterator:
                 adj_filter_date = t2 - dt.timedelta(days=1)
-                data = dh.get_filtered_univ_data(
-                    features=blueprint.features,
-                    start_date=t1,
-                    end_date=t3,
-                    filter_date=adj_filter_date,
-                    filter_args=blueprint.universe_filter_arguments)
-                data['TestFlag'] = data.Date > adj_filter_date
-                self._clean_and_write_output(data, file_name)
+                tasks.append((
+                    os.path.join(self._output_dir, '{}_data{}'.format(
+                        t2.strftime('%Y%m%d'), ext)),
+                    blueprint.features,
+                    blueprint.universe_filter_arguments,
+                    t1, adj_filter_date, t3,
+                    univ_seccodes[adj_filter_date]))
+            if self._feature_store_dir:
+                store = FeatureStore(self._feature_store_dir,
+                                     blueprint.features)
+                entries = [_make_universe_file(dh, *t, store=store)
+                           for t in tqdm(tasks)]
+            else:
+                entries = self._make_universe_files(dh, tasks)
+            entries = [x for x in entries if x]
             # Update meta params
-            max_train_date = data.Date[~data.TestFlag].max()
-            self._update_meta_file(max_train_date, created_files)
+            if entries:
+                update_manifest(self._output_dir, entries)
+                created_files = [os.path.basename(t[0]) for t in tasks]
+                self._update_meta_file(entries[-1]['max_train_date'],
+                                       created_files)
 
         # HACK
         elif blueprint.constructor_type == 'universe_live':
             t1, t2, t3 = self._make_implementation_dates(blueprint)
             adj_filter_date = t2 - dt.timedelta(days=1)
-            data = dh.get_filtered_univ_data(
-                features=blueprint.features,
-                start_date=t1,
-                end_date=t3,
-                filter_date=adj_filter_date,
-                filter_args=blueprint.universe_filter_arguments)
+            previous = self._get_previous_live_data(t1, adj_filter_date)
+            start_date = _get_delta_start_date(previous, blueprint.features)
+            data = None
+            if start_date:
+                delta = dh.get_seccode_data(
+                    seccodes=previous.SecCode.unique().tolist(),
+                    features=blueprint.features,
+                    start_date=start_date,
+                    end_date=t3)
+                # A corporate action since the previous file changes the
+                # adjusted history, which then needs a full pull
+                if _same_adjustment(previous, delta, start_date):
+                    data = pd.concat([previous[previous.Date < start_date],
+                                      delta], ignore_index=True)
+            if data is None:
+                data = dh.get_filtered_univ_data(
+                    features=blueprint.features,
+                    start_date=t1,
+                    end_date=t3,
+                    filter_date=adj_filter_date,
+                    filter_args=blueprint.universe_filter_arguments)
             data['TestFlag'] = data.Date > adj_filter_date
-            file_name = '{}.csv'.format(blueprint.output_file_name)
+            file_name = '{}{}'.format(blueprint.output_file_name, ext)
             self._clean_and_write_output(data, file_name)
 
         dh.close_connections()
         return
 
+    def _make_fused_universe_data(self, blueprints, output_dirs):
+        dh = DataHandlerSQL(cache=self._sql_cache)
+        exts = [PREPPED_DATA_FORMATS[getattr(b, 'output_file_format', 'csv')]
+                for b in blueprints]
+
+        market_data = {}
+        for blueprint, output_dir, ext in zip(blueprints, output_dirs, exts):
+            if not hasattr(blueprint, 'market_data_params'):
+                continue
+            params = blueprint.market_data_params
+            key = json.dumps(params, sort_keys=True)
+            if key not in market_data:
+                market_data[key] = dh.get_index_data(
+                    seccodes=params['seccodes'],
+                    features=params['features'],
+                    start_date='1990-01-01',
+                    end_date='2050-04-01')
+            self._output_dir = output_dir
+            self._clean_and_write_output(market_data[key],
+                                         'market_index_data' + ext)
+
+        date_iterator = self._make_date_iterator(blueprints[0])
+        filter_dates = [t2 - dt.timedelta(days=1) for _, t2, _ in
+                        date_iterator]
+        univ_seccodes = [
+            dh.get_filtered_seccodes_batch(filter_dates,
+                                           b.universe_filter_arguments)
+            for b in blueprints]
+        # Ranks depend on the universe, so unranked values are pulled
+        # and ranked per blueprint
+        features = []
+        for b in blueprints:
+            for f in b.features:
+                if unranked_feature(f) not in features:
+                    features.append(unranked_feature(f))
+
+        entries = [[] for b in blueprints]
+        for (t1, t2, t3), filter_date in tqdm(zip(date_iterator,
+                                                  filter_dates)):
+            seccodes = [u[filter_date] for u in univ_seccodes]
+            data = _get_seccode_data_all_features(
+                dh, np.unique(np.concatenate(seccodes)).tolist(),
+                features, t1, t3)
+            if len(data) == 0:
+                continue
+            data_seccodes = data.SecCode.astype(int)
+            for i, blueprint in enumerate(blueprints):
+                b_data = data[data_seccodes.isin(
+                    seccodes[i].astype(int))].reset_index(drop=True)
+                if len(b_data) == 0:
+                    continue
+                b_data = rank_features(b_data, blueprint.features)
+                b_data['TestFlag'] = b_data.Date > filter_date
+                path = os.path.join(output_dirs[i], '{}_data{}'.format(
+                    t2.strftime('%Y%m%d'), exts[i]))
+                entry = _clean_and_write_output(b_data, path)
+                if entry:
+                    entries[i].append(entry)
+
+        for output_dir, b_entries in zip(output_dirs, entries):
+            if b_entries:
+                self._output_dir = output_dir
+                update_manifest(output_dir, b_entries)
+                self._update_meta_file(b_entries[-1]['max_train_date'],
+                                       [x['file_name'] for x in b_entries])
+        dh.close_connections()
+
+    def _make_universe_files(self, dh, tasks):
+        """
+        Returns the manifest entry of each period, in the order of `tasks`
+        """
+        if (self._n_workers <= 1) or (len(tasks) <= 1):
+            return [_make_universe_file(dh, *t) for t in tqdm(tasks)]
+        if self._worker_type == 'thread':
+            pool_class, handlers = ThreadPool, []
+        else:
+            pool_class, handlers = Pool, None
+        pool = pool_class(min(self._n_workers, len(tasks)),
+                          initializer=_init_worker,
+                          initargs=(self._sql_cache, handlers))
+        try:
+            # imap keeps task order, so file naming and meta are unchanged
+            return list(tqdm(pool.imap(_make_universe_file_worker, tasks),
+                             total=len(tasks)))
+        finally:
+            pool.close()
+            pool.join()
+            for worker_dh in (handlers or []):
+                worker_dh.close_connections()
+
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
     def _init_run(self, blueprint):
+        self._manifest_flag = True
         if blueprint.constructor_type == 'universe':
             self._version_files = []
 
@@ -140,12 +345,11 @@ class DataConstructor(object):
         # Set instance variables for outputs
         self._version = rerun_version
         self._output_dir = output_dir
+        self._manifest_flag = True
         if blueprint.constructor_type == 'universe':
             self._version_files = [x for x in os.listdir(output_dir)
-                                   if x[-9:] == '_data.csv']
+                                   if is_prepped_data_file(x)]
             self._version_files.sort()
-            if 'market_index_data.csv' in self._version_files:
-                self._version_files.remove('market_index_data.csv')
         print('[DataConstructor] - Restarting {}'.format(rerun_version))
         return blueprint
 
@@ -153,17 +357,12 @@ class DataConstructor(object):
         dh = DataHandlerSQL()
         all_dates = dh.get_all_dates()
         dh.close_connections()
-        df = pd.DataFrame()
+        manifest = read_manifest(self._output_dir) or {}
         # Iterate through backwards until first full file given
         # database dates
         date_iterator = self._make_date_iterator(blueprint)
         files_to_drop = []
         for file_name in reversed(self._version_files):
-            # Get all unique dates from file
-            path = os.path.join(self._output_dir, file_name)
-            data = pd.read_csv(path, usecols=['Date'])
-            data_dates = data.Date.unique()
-            data_dates = convert_date_array(data_dates)
             # Match file name with date
             file_name_2 = file_name.split('_')[0]
             d = [d for d in date_iterator
@@ -172,15 +371,43 @@ class DataConstructor(object):
             period_dates = all_dates[all_dates >= d[1]]
             period_dates = period_dates[period_dates <= d[2]]
             # Must have these test dates.
-            if np.all(pd.Series(period_dates).isin(data_dates)):
+            if _has_dates(self._output_dir, file_name,
+                          manifest.get(file_name), period_dates):
                 break
             else:
                 files_to_drop.append(file_name)
         self._version_files = [x for x in self._version_files
                                if x not in files_to_drop]
 
-    def _init_run_live(self, blueprint):
+    def _init_run_live(self, blueprint, previous_file_name=None):
         self._output_dir = blueprint.output_file_dir
+        self._previous_file_name = previous_file_name
+        # Live directories only hold the files that are read downstream
+        self._manifest_flag = False
+
+    def _get_previous_live_data(self, start_date, filter_date):
+        """
+        Returns the previous live file if it was built for the universe
+        of this start and filter date, else None
+        """
+        if not self._previous_file_name:
+            return None
+        path = os.path.join(self._output_dir, self._previous_file_name)
+        if not os.path.isfile(path):
+            return None
+        data = read_prepped_data(path)
+        if len(data) == 0:
+            return None
+        # Start dates are month aligned, so the first date must be in the
+        # same month, and train/test rows must split on the same date
+        min_date = data.Date.min()
+        if (min_date.year, min_date.month) != \
+                (start_date.year, start_date.month):
+            return None
+        if np.any(data.TestFlag.astype(bool) !=
+                  (data.Date > pd.Timestamp(filter_date))):
+            return None
+        return data.drop('TestFlag', axis=1)
 
     # ~~~~~~ Output functionality ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
@@ -236,17 +463,16 @@ class DataConstructor(object):
         # Read and then rewrite
         path = os.path.join(self._output_dir, 'meta.json')
         meta = json.load(open(path, 'r'))
-        meta['max_train_date'] = str(max_train_date.strftime('%Y-%m-%d'))
+        meta['max_train_date'] = max_train_date
         meta['newly_created_files'] = created_files
         with open(path, 'w') as outfile:
             json.dump(meta, outfile)
 
     def _clean_and_write_output(self, data, file_name):
-        if len(data) > 0:
-            data = data.drop_duplicates()
-            data.SecCode = data.SecCode.astype(int).astype(str)
-            data = data.sort_values(['SecCode', 'Date'])
-            data.to_csv(os.path.join(self._output_dir, file_name), index=False)
+        entry = _clean_and_write_output(data, os.path.join(self._output_dir,
+                                                           file_name))
+        if entry and self._manifest_flag:
+            update_manifest(self._output_dir, [entry])
 
     # ~~~~~~ Iterator ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
@@ -349,6 +575,126 @@ class DataConstructor(object):
         return True
 
 
+# ~~~~~~ Universe period workers ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# Each pool worker thread or process holds its own DataHandlerSQL
+_WORKER = threading.local()
+
+
+def _init_worker(sql_cache, handlers=None):
+    _WORKER.dh = DataHandlerSQL(max_connections=1, cache=sql_cache)
+    if handlers is not None:
+        # Worker threads share the process: closed once the pool joins
+        handlers.append(_WORKER.dh)
+    else:
+        # Pool processes run exit finalizers before they stop
+        Finalize(None, _WORKER.dh.close_connections, exitpriority=10)
+
+
+def _make_universe_file_worker(task):
+    return _make_universe_file(_WORKER.dh, *task)
+
+
+def _make_universe_file(dh, path, features, filter_args,
+                        start_date, filter_date, end_date, seccodes,
+                        store=None):
+    if store:
+        data = store.get_seccode_data(dh, seccodes, start_date, end_date)
+    else:
+        data = dh.get_filtered_univ_data(
+            features=features,
+            start_date=start_date,
+            end_date=end_date,
+            filter_date=filter_date,
+            filter_args=filter_args,
+            seccodes=seccodes)
+    data['TestFlag'] = data.Date > filter_date
+    return _clean_and_write_output(data, path)
+
+
+def _get_seccode_data_all_features(dh, seccodes, features, start_date,
+                                   end_date):
+    """
+    get_seccode_data for any number of features, in pulls of at most
+    MAX_SECCODE_DATA_FEATURES features merged on SecCode and Date
+    """
+    data = None
+    for i in range(0, len(features), MAX_SECCODE_DATA_FEATURES):
+        batch = dh.get_seccode_data(
+            seccodes=seccodes,
+            features=features[i:i+MAX_SECCODE_DATA_FEATURES],
+            start_date=start_date,
+            end_date=end_date)
+        data = batch if data is None else \
+            data.merge(batch, how='outer', on=['SecCode', 'Date'])
+    return data
+
+
+def _clean_and_write_output(data, path):
+    """
+    Returns the manifest entry of the written file, or None if there was
+    no data to write
+    """
+    if len(data) > 0:
+        data = data.drop_duplicates()
+        data.SecCode = data.SecCode.astype(int).astype(str)
+        data = data.sort_values(['SecCode', 'Date'])
+        write_prepped_data(data, path)
+        return make_manifest_entry(data, path)
+
+
+def _get_delta_start_date(previous, features):
+    """
+    First date to pull on top of `previous` live data. LEAD features of
+    the last rows had no future data yet, so those rows are pulled again,
+    along with the last complete date to check the adjustment against.
+    Returns None if a full pull is needed.
+    """
+    if previous is None:
+        return None
+    max_lead = 0
+    for f in features:
+        shift = parse_feature_args(f)['shift']
+        if shift and (shift[0] == 'LEAD'):
+            max_lead = max(max_lead, shift[1])
+    dates = np.sort(previous.Date.unique())
+    if max_lead >= len(dates):
+        return None
+    return pd.Timestamp(dates[-max_lead - 1]).to_pydatetime()
+
+
+def _same_adjustment(previous, delta, overlap_date):
+    """
+    True if the split and dividend adjusted columns of `previous` match
+    those pulled again in `delta` on `overlap_date`
+    """
+    columns = [c for c in previous.columns
+               if (c.find('Adj') >= 0) and (c in delta.columns)]
+    old = previous[previous.Date == overlap_date]
+    new = delta[pd.to_datetime(delta.Date) == overlap_date]
+    old = old.set_index(old.SecCode.astype(int))[columns].sort_index()
+    new = new.set_index(new.SecCode.astype(int))[columns].sort_index()
+    if (len(old) == 0) or (not old.index.equals(new.index)):
+        return False
+    return np.allclose(old.values.astype(float), new.values.astype(float),
+                       rtol=1e-6, equal_nan=True)
+
+
+def _has_dates(version_dir, file_name, entry, dates):
+    """
+    True if the file has all `dates`. Answered from the manifest entry
+    unless the file was changed after it was written, or the entry
+    predates manifests listing each file's dates.
+    """
+    path = os.path.join(version_dir, file_name)
+    if entry and ('dates' in entry) and \
+            (entry['n_bytes'] == os.path.getsize(path)):
+        dates = pd.to_datetime(pd.Series(dates)).dt.strftime('%Y-%m-%d')
+        return set(dates).issubset(entry['dates'])
+    data_dates = read_prepped_data(path, columns=['Date']).Date.unique()
+    return np.all(pd.Series(dates).isin(data_dates))
+
+
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
 def get_data_version_name(strategy_name,
@@ -381,14 +727,11 @@ def _get_versions(prepped_data_dir, strategy_name):
 def _get_versions_cloud(strategy_name):
     client = storage.Client()
     bucket = client.get_bucket(config.GCP_STORAGE_BUCKET_NAME)
-    all_files = [x.name for x in bucket.list_blobs()]
-    all_files = [x for x in all_files if x.find('prepped_data') >= 0]
-    all_files = [x for x in all_files if x.find('version') >= 0]
-    all_files = [x for x in all_files if x.find(strategy_name + '/') >= 0]
-    all_files = list(set([x.split('/')[2] for x in all_files]))
-    all_files = [x for x in all_files if x.find('archive') == -1]
-    all_files.sort()
-    return {i: d for i, d in enumerate(all_files)}
+    dirs = get_bucket_catalog(bucket).list_dirs(
+        'prepped_data/{}/'.format(strategy_name))
+    dirs = [x for x in dirs if x.find('version') >= 0]
+    dirs = [x for x in dirs if x.find('archive') == -1]
+    return {i: d for i, d in enumerate(dirs)}
 
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -435,11 +778,7 @@ def _get_strategies(prepped_data_dir):
 def _get_strategies_cloud():
     client = storage.Client()
     bucket = client.get_bucket(config.GCP_STORAGE_BUCKET_NAME)
-    all_files = [x.name for x in bucket.list_blobs()
-                 if x.name.find('prepped_data') > -1]
-    dirs = list(set([x.split('/')[1] for x in all_files]))
-    dirs.sort()
-    return dirs
+    return get_bucket_catalog(bucket).list_dirs('prepped_data/')
 
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -531,14 +870,16 @@ def _get_meta_data_cloud(strategy_name, version):
 
 def _get_max_test_dates_counts(prepped_data_dir, strategy_name, version):
     path = os.path.join(prepped_data_dir, strategy_name, version)
+    manifest = read_manifest(path)
+    if manifest is not None:
+        return _get_max_test_dates_counts_manifest(manifest)
     files = os.listdir(path)
-    files = [f for f in files if f.find('_data.csv') > 1]
-    if 'market_index_data.csv' in files:
-        files.remove('market_index_data.csv')
+    files = [f for f in files if is_prepped_data_file(f)]
     if len(files):
         max_file = max(files)
-        data = pd.read_csv(os.path.join(path, max_file))
-        max_test_date = data.Date.max()
+        data = read_prepped_data(os.path.join(path, max_file),
+                                 columns=['Date'])
+        max_test_date = data.Date.max().strftime('%Y-%m-%d')
         max_file = max_file.split('_')[0]
         return max_file, max_test_date, len(files)
     else:
@@ -548,26 +889,47 @@ def _get_max_test_dates_counts(prepped_data_dir, strategy_name, version):
 def _get_max_test_dates_counts_cloud(strategy_name, version):
     client = storage.Client()
     bucket = client.get_bucket(config.GCP_STORAGE_BUCKET_NAME)
-    all_files = [x.name for x in bucket.list_blobs()]
-    all_files = [x for x in all_files if x.find('prepped_data') >= 0]
-    all_files = [x for x in all_files if x.find(version) >= 0]
-    all_files = [x for x in all_files if x.find(strategy_name) >= 0]
-    all_files = [x for x in all_files if x.find('_data.csv') >= 0]
-    # Remove market file if present
-    for f in all_files:
-        if f.find('market_index_data.csv') > -1:
-            all_files.remove(f)
+    manifest = _get_manifest_cloud(strategy_name, version, bucket)
+    if manifest is not None:
+        return _get_max_test_dates_counts_manifest(manifest)
+    all_files = get_bucket_catalog(bucket).list_files(
+        'prepped_data/{}/{}/'.format(strategy_name, version),
+        recursive=False)
+    all_files = [x for x in all_files if is_prepped_data_file(x)]
     if len(all_files):
         path = max(all_files)
         blob = bucket.get_blob(path)
-        data = pd.read_csv(StringIO(blob.download_as_string()))
-        max_test_date = data.Date.max()
+        data = read_prepped_data(StringIO(blob.download_as_string()),
+                                 file_name=path, columns=['Date'])
+        max_test_date = data.Date.max().strftime('%Y-%m-%d')
         max_file = path.split('/')[-1].split('_')[0]
         return max_file, max_test_date, len(all_files)
     else:
         return 'No Files', 'No Files', 0
 
 
+def _get_max_test_dates_counts_manifest(manifest):
+    files = [f for f in manifest if is_prepped_data_file(f)]
+    if len(files):
+        max_file = max(files)
+        return max_file.split('_')[0], manifest[max_file]['max_date'], \
+            len(files)
+    else:
+        return 'No Files', 'No Files', 0
+
+
+def _get_manifest_cloud(strategy_name, version, bucket):
+    """
+    Returns None if the version has no manifest
+    """
+    path = os.path.join('prepped_data', strategy_name, version,
+                        PREPPED_DATA_MANIFEST)
+    blob = bucket.get_blob(path)
+    if blob is None:
+        return None
+    return json.loads(blob.download_as_string())['files']
+
+
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
 def _print_line_underscore(pstring):
@@ -8,6 +8,7 @@ class DataConstructorBlueprint(object):
                  description=None,
                  market_data_flag=False,
                  strategy_name=None,
+                 output_file_format='csv',
                  blueprint_json=None):
         """
         Parameters
@@ -19,6 +20,9 @@ class DataConstructorBlueprint(object):
         strategy_name : str
             Name of strategy, otherwise the blueprint will output
             to a standardized directory
+        output_file_format : str
+            ['csv', 'npz'] File format of the prepped data. npz stores
+            typed columns and is much faster to read back.
         blueprint_json : dict
             From outputted, so to init from file
         """
@@ -34,6 +38,9 @@ class DataConstructorBlueprint(object):
         assert description, 'Description must be provided'
         self.description = description
 
+        assert output_file_format in ('csv', 'npz')
+        self.output_file_format = output_file_format
+
         # Features are set by default
         self.features = ['PRMA10_Close']
 
@@ -100,6 +107,8 @@ class DataConstructorBlueprint(object):
         output['output_dir_name'] = self.output_dir_name
         output['features'] = self.features
         output['description'] = self.description
+        output['output_file_format'] = getattr(self, 'output_file_format',
+                                               'csv')
         if self.constructor_type == 'universe':
             output['constructor_type'] = 'universe'
             output['universe_filter_arguments'] = \
@@ -147,6 +156,14 @@ class DataConstructorBlueprintContainer(object):
         }
         self._index += 1
 
+    def get_blueprints(self):
+        """
+        Returns list of blueprints in the order they were added
+        """
+        keys = self._blueprints.keys()
+        keys.sort()
+        return [self._blueprints[k]['blueprint'] for k in keys]
+
     def get_blueprint_by_name_or_index(self, index):
         try:
             index = int(index)
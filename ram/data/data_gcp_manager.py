@@ -5,7 +5,11 @@ import pandas as pd
 from google.cloud import storage
 
 from ram import config
+from ram.data.data_constructor import _get_manifest_cloud
 from ram.data.data_constructor import _print_line_underscore
+from ram.utils.read_write import PREPPED_DATA_MANIFEST
+from ram.utils.read_write import find_prepped_data_file
+from ram.utils.read_write import read_manifest
 
 
 def update_prepped_data_gcp(strategy, version):
@@ -16,17 +20,26 @@ def update_prepped_data_gcp(strategy, version):
     # Local Files
     version_path = os.path.join(config.PREPPED_DATA_DIR, strategy, version)
     local_files = os.listdir(version_path)
-
-    # GCP Storage files for  Strategy/Version
-    gs_files = [x.name for x in bucket.list_blobs()]
-    gs_files = [x for x in gs_files if x.find('prepped_data') > -1]
-    gs_files = [x for x in gs_files if x.split('/')[1] == strategy]
-    gs_files = [x for x in gs_files if x.split('/')[2] == version]
-    gs_files = [x.split('/')[-1] for x in gs_files]
     gs_version_path = 'prepped_data/{}/{}/'.format(strategy, version)
 
-    # Which files don't exist in cloud storage
-    upload_files = [x for x in local_files if x not in gs_files]
+    local_manifest = read_manifest(version_path)
+    gs_manifest = _get_manifest_cloud(strategy, version, bucket)
+
+    if (local_manifest is not None) and (gs_manifest is not None):
+        # Files that are new or changed since the last upload
+        upload_files = [
+            f for f, entry in local_manifest.items()
+            if (f not in gs_manifest) or
+            (gs_manifest[f]['checksum'] != entry['checksum'])]
+    else:
+        # GCP Storage files for  Strategy/Version
+        gs_files = [x.name for x in bucket.list_blobs()]
+        gs_files = [x for x in gs_files if x.find('prepped_data') > -1]
+        gs_files = [x for x in gs_files if x.split('/')[1] == strategy]
+        gs_files = [x for x in gs_files if x.split('/')[2] == version]
+        gs_files = [x.split('/')[-1] for x in gs_files]
+        # Which files don't exist in cloud storage
+        upload_files = [x for x in local_files if x not in gs_files]
 
     # See if the local version has updated existing files
     meta = json.load(open(os.path.join(version_path, 'meta.json'), 'r'))
@@ -34,12 +47,14 @@ def update_prepped_data_gcp(strategy, version):
         upload_files.extend(meta['newly_created_files'])
 
     # If market data exists, this should always be updated
-    if ('market_index_data.csv' in local_files) and \
-            ('market_index_data.csv' not in upload_files) and \
+    market_file = find_prepped_data_file(local_files, 'market_index_data')
+    if market_file and (market_file not in upload_files) and \
             (len(upload_files) > 0):
-        upload_files.extend(['market_index_data.csv'])
+        upload_files.extend([market_file])
 
-    upload_files = list(set(upload_files))
+    # Manifest is uploaded last, after the files it describes
+    upload_files = [x for x in set(upload_files)
+                    if x != PREPPED_DATA_MANIFEST]
     upload_files.sort()
 
     if upload_files:
@@ -60,6 +75,12 @@ def update_prepped_data_gcp(strategy, version):
         blob = bucket.blob(os.path.join(gs_version_path, 'meta.json'))
         blob.upload_from_filename(os.path.join(version_path, 'meta.json'))
 
+        if local_manifest is not None:
+            blob = bucket.blob(os.path.join(gs_version_path,
+                                            PREPPED_DATA_MANIFEST))
+            blob.upload_from_filename(os.path.join(version_path,
+                                                   PREPPED_DATA_MANIFEST))
+
     else:
         print('\nNo new files to upload for {}/{}\n'.format(strategy, version))
 
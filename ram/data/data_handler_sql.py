@@ -1,49 +1,81 @@
 import time
+import uuid
+import weakref
+import decimal
 import pypyodbc
 import numpy as np
 import pandas as pd
 import datetime as dt
+from collections import OrderedDict
 from dateutil import parser as dparser
+from multiprocessing.pool import ThreadPool
 
 from ram.utils.time_funcs import check_input_date
 from ram.data.sql_features import sqlcmd_from_feature_list
+from ram.data.feature_engine import is_local_feature
+from ram.data.feature_engine import make_raw_sqlcmd
+from ram.data.feature_engine import compute_features
+from ram.data.sql_connection_pool import SQLConnectionPool
+from ram.data.trading_calendar import get_trading_calendar
 
 pypyodbc.connection_timeout = 8
 
+SECCODE_TEMP_TABLE = '#ram_seccodes'
+
+# Features beyond this are dropped by get_seccode_data
+MAX_SECCODE_DATA_FEATURES = 300
+
 
 class DataHandlerSQL(object):
 
-    def __init__(self, table='ram.dbo.ram_equity_pricing'):
+    def __init__(self, table='ram.dbo.ram_equity_pricing', pool=None,
+                 max_connections=4, stream_fetch=True, max_workers=1,
+                 seccode_filter='inline', cache=None, feature_engine='sql'):
+        """
+        Parameters
+        ----------
+        table : str
+            Pricing table that features are pulled from
+        pool : SQLConnectionPool
+            Optionally share a connection pool between handlers
+        max_connections : int
+            Size of the handler's own pool if one isn't passed
+        stream_fetch : bool
+            Read feature queries in chunks straight into typed column
+            arrays rather than through a list of row tuples
+        max_workers : int
+            Number of feature batches in get_seccode_data that are
+            queried concurrently, each on its own pooled connection
+        seccode_filter : str
+            'inline' writes the SecCode list into every feature subquery.
+            'temp_table' loads it once per connection into a session temp
+            table that the subqueries select from, which keeps statement
+            text small and constant across universes.
+        cache : SQLResultCache
+            Opt-in on-disk cache for feature pulls. Cache hits do not
+            touch the database and are not subject to the time constraint.
+        feature_engine : str
+            'sql' computes all features in the database. 'local' pulls
+            raw pricing columns once and computes technical features
+            (see feature_engine.LOCAL_FUNCS) in Python, leaving the rest
+            to the database.
+        """
+        assert seccode_filter in ('inline', 'temp_table')
+        assert feature_engine in ('sql', 'local')
         self._table = table
-
-    def _connect(self):
-        try:
-            try:
-                connection = pypyodbc.connect('Driver={SQL Server};'
-                                              'Server=QADIRECT;'
-                                              'Database=ram;'
-                                              'uid=ramuser;pwd=183madison')
-            except:
-                # Mac/Linux implementation. unixODBC and FreeTDS works
-                # https://github.com/mkleehammer/pyodbc/wiki/Connecting-to-SQL-Server-from-Mac-OSX
-                connect_str = "DSN=qadirectdb;UID=ramuser;PWD=183madison"
-                connection = pypyodbc.connect(connect_str)
-            assert connection.connected == 1
-            self._connection = connection
-            self._cursor = connection.cursor()
-            self._cursor.autocommit = True
-        except:
-            self._connection = None
-            self._cursor = None
-
-    def _disconnect(self):
-        try:
-            self._cursor.close()
-            self._connection.close()
-        except:
-            pass
-        self._cursor = None
-        self._connection = None
+        self._stream_fetch = stream_fetch
+        self._max_workers = max_workers
+        self._seccode_filter = seccode_filter
+        self._feature_engine = feature_engine
+        # SecCodes currently loaded in each connection's temp table
+        self._loaded_seccodes = weakref.WeakKeyDictionary()
+        self._cache = cache
+        self._data_as_of = None
+        if pool is None:
+            pool = SQLConnectionPool(_make_connection,
+                                     max_size=max(max_connections,
+                                                  max_workers))
+        self._pool = pool
 
     def _test_time_constraint(self):
         if (dt.datetime.now().time() >= dt.time(5, 0)) & \
@@ -59,7 +91,8 @@ class DataHandlerSQL(object):
                                end_date,
                                filter_date,
                                univ_size=None,
-                               filter_args=None):
+                               filter_args=None,
+                               seccodes=None):
         """
         Purpose of this class is to provide an interface to get a filtered
         universe.
@@ -71,6 +104,9 @@ class DataHandlerSQL(object):
         count : int
         filter_args : dict
             Should have elements: univ_size, where, and filter
+        seccodes : list
+            Universe already selected for this filter date, for example
+            by `get_filtered_seccodes_batch`. Skips the filter query.
 
         Returns
         -------
@@ -84,11 +120,12 @@ class DataHandlerSQL(object):
             assert univ_size, 'Must provide filter args or univ_size'
             filter_args = {'univ_size': univ_size}
 
-        if filter_date:
-            seccodes = self._get_filtered_seccodes(d2, filter_args,
-                                                   self._table)
-        else:
-            seccodes = []
+        if seccodes is None:
+            if filter_date:
+                seccodes = self._get_filtered_seccodes(d2, filter_args,
+                                                       self._table)
+            else:
+                seccodes = []
         return self.get_seccode_data(seccodes, features, d1, d3)
 
     def get_seccode_data(self,
@@ -111,25 +148,66 @@ class DataHandlerSQL(object):
         # Check user input
         start_date, _, end_date = _format_dates(start_date, None, end_date)
 
-        output = pd.DataFrame(columns=['SecCode', 'Date'])
+        if self._seccode_filter == 'temp_table':
+            id_table = SECCODE_TEMP_TABLE
+            temp_seccodes = seccodes
+        else:
+            id_table = None
+            temp_seccodes = None
+
+        # Technical features computed locally from one raw pull
+        features = features[:MAX_SECCODE_DATA_FEATURES]
+        if self._feature_engine == 'local':
+            local_features = [f for f in features if is_local_feature(f)]
+            sql_features = [f for f in features if f not in local_features]
+        else:
+            local_features = []
+            sql_features = features
+
+        tasks = []
+        if local_features:
+            tasks.append((self._get_local_batch,
+                          (seccodes, local_features, start_date, end_date,
+                           id_table, temp_seccodes)))
+
         # With large numbers of SecCodes and Features, there is not enough
         # memory to perform a query. Break up by features
-        batches = range(0, 301, 10)
-        for i1, i2 in zip(batches[:-1], batches[1:]):
-            batch_features = features[i1:i2]
-            if len(batch_features) == 0:
-                break
+        for i in range(0, len(sql_features), 10):
             # Get features, and strings for cte and regular query
             sqlcmd, batch_features = sqlcmd_from_feature_list(
-                batch_features, seccodes, start_date, end_date, self._table)
-            univ = self.sql_execute(sqlcmd)
-            univ_df = pd.DataFrame(
-                univ, columns=['SecCode', 'Date'] + batch_features)
-            _check_for_duplicates(univ_df, ['SecCode', 'Date'])
-            output = output.merge(univ_df, on=['SecCode', 'Date'],
-                                  how='outer')
-            _check_for_duplicates(output, ['SecCode', 'Date'])
-        return output
+                sql_features[i:i+10], seccodes, start_date, end_date,
+                self._table, id_table=id_table)
+            tasks.append((self._get_batch,
+                          (sqlcmd, ['SecCode', 'Date'] + batch_features,
+                           temp_seccodes)))
+
+        if (self._max_workers > 1) and (len(tasks) > 1):
+            pool = ThreadPool(min(self._max_workers, len(tasks)))
+            try:
+                batches = pool.map(lambda t: t[0](*t[1]), tasks)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            batches = [t[0](*t[1]) for t in tasks]
+        data = _align_batches(batches)
+        if local_features:
+            data = data[['SecCode', 'Date'] + features]
+        return data
+
+    def _get_batch(self, sqlcmd, columns, temp_seccodes):
+        univ_df = self._execute_to_frame(sqlcmd, columns, temp_seccodes)
+        _check_for_duplicates(univ_df, ['SecCode', 'Date'])
+        return univ_df.set_index(['SecCode', 'Date'])
+
+    def _get_local_batch(self, seccodes, features, start_date, end_date,
+                         id_table, temp_seccodes):
+        sqlcmd, columns = make_raw_sqlcmd(features, seccodes, start_date,
+                                          end_date, self._table, id_table)
+        raw = self._execute_to_frame(sqlcmd, columns, temp_seccodes)
+        _check_for_duplicates(raw, ['SecCode', 'Date'])
+        univ_df = compute_features(raw, features, start_date, end_date)
+        return univ_df.set_index(['SecCode', 'Date'])
 
     def get_index_data(self,
                        seccodes,
@@ -185,11 +263,7 @@ class DataHandlerSQL(object):
         sqlcmd, features = sqlcmd_from_feature_list(
             features, seccodes, d1, d3, 'ram.dbo.ram_index_pricing')
 
-        univ = self.sql_execute(sqlcmd)
-
-        univ_df = pd.DataFrame(univ)
-        univ_df.columns = ['SecCode', 'Date'] + features
-        return univ_df
+        return self._execute_to_frame(sqlcmd, ['SecCode', 'Date'] + features)
 
     def get_etf_data(self,
                      tickers,
@@ -230,14 +304,36 @@ class DataHandlerSQL(object):
         return univ_df
 
     def get_all_dates(self):
-        if not hasattr(self, '_dates'):
-            # Get all dates available in master database
-            self._dates = np.unique(self.sql_execute(
-                """
-                select distinct Date_ from {0} order by Date_;
-                """.format(self._table)
-            )).flatten()
-        return self._dates
+        """
+        All dates available in master database, from the process-wide
+        calendar that is persisted locally and refreshed daily.
+        """
+        table = self._table
+        calendar = get_trading_calendar(
+            table.split('.')[-1] + '_dates',
+            lambda: self._get_dates(
+                'select distinct Date_ from {0};'.format(table)),
+            self.get_data_as_of)
+        return pd.DatetimeIndex(calendar.get_dates()).to_pydatetime()
+
+    def get_trading_calendar(self):
+        """
+        Process-wide calendar of all trading dates, past and future,
+        from ram_trading_dates.
+        """
+        return get_trading_calendar(
+            'ram_trading_dates',
+            lambda: self._get_dates(
+                'select distinct T0 from ram.dbo.ram_trading_dates '
+                'where T0 is not null;'),
+            self.get_data_as_of)
+
+    def _get_dates(self, sqlcmd):
+        dates = self.sql_execute(sqlcmd)
+        # Failed queries return None, which must not become a calendar
+        if dates is None:
+            raise IOError('Could not load dates: {}'.format(sqlcmd))
+        return [x[0] for x in dates]
 
     def get_live_seccode_ticker_map(self):
         query_string = \
@@ -272,44 +368,104 @@ class DataHandlerSQL(object):
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-    def _get_filtered_seccodes(self, filter_date, args, table):
-        univ_size = args['univ_size']
-        filter_col = args['filter'] if 'filter' in args else 'AvgDolVol'
-        where = 'and {0}'.format(args['where']) if 'where' in args else ''
-        # Get exact filter date
-        all_dates = self.get_all_dates()
-        filter_date = all_dates[all_dates <= filter_date][-1]
-
-        # Get SecCodess using next business date(filter_date). First CTE
-        # filters top ID for unique Company (Issuer).
-        seccodes = np.array(self.sql_execute(
-            """
-            ; with tempdata as (
-            select      ID.Issuer, M.SecCode, M.{3},
-                        ROW_NUMBER() over (
-                            PARTITION BY ID.Issuer
-                            ORDER BY M.{3} DESC, M.SecCode) AS rank_val
-            from        {4} M
-            join        ram.dbo.ram_master_ids ID
-                on      M.SecCode = ID.SecCode
-                and     M.Date_ between ID.StartDate and ID.EndDate
-            left join   ram.dbo.ram_idccode_to_gvkey_map G
-                on      M.IdcCode = G.IdcCode
-                and     M.Date_ between G.StartDate and G.EndDate
-            left join   ram.dbo.ram_compustat_sector S
-                on      S.GVKey = G.GVKey
-                and     M.Date_ between S.StartDate and S.EndDate
-            where       M.Date_ = '{1}'
-            and         M.NormalTradingFlag = 1
-            and         M.OneYearTradingFlag = 1
-            {2}
+    def get_filtered_seccodes_batch(self, filter_dates, filter_args,
+                                    table=None):
+        """
+        Selects the filtered universe for many filter dates with one
+        set-based query, instead of one query per date.
+
+        Parameters
+        ----------
+        filter_dates : list
+            Dates as given to `get_filtered_univ_data`. Each is moved back
+            to the closest trading date on or before it.
+        filter_args : dict
+            Should have elements: univ_size, where, and filter
+
+        Returns
+        -------
+        seccodes : dict
+            Keyed by the input filter dates, with arrays of SecCodes
+            ordered by the filter column
+        """
+        table = table if table else self._table
+        univ_size = filter_args['univ_size']
+        filter_col = filter_args['filter'] if 'filter' in filter_args \
+            else 'AvgDolVol'
+        where = 'and {0}'.format(filter_args['where']) \
+            if 'where' in filter_args else ''
+
+        request_dates = OrderedDict()
+        for d in filter_dates:
+            request_dates[check_input_date(d).strftime('%Y-%m-%d')] = d
+        output = dict([(d, np.array([])) for d in filter_dates])
+
+        # First CTE maps each requested date to the closest trading date,
+        # second filters top ID for unique Company (Issuer) per date.
+        request_keys = list(request_dates.keys())
+        for i in range(0, len(request_keys), 1000):
+            values = ', '.join(["('{}')".format(d)
+                                for d in request_keys[i:i+1000]])
+            rows = self.sql_execute(
+                """
+                ; with filter_dates as (
+                select      cast(D.RequestDate as date) as RequestDate,
+                            (select max(Date_) from {4}
+                             where Date_ <= D.RequestDate) as FilterDate
+                from        (values {1}) D (RequestDate)
+                )
+                , tempdata as (
+                select      F.RequestDate, ID.Issuer, M.SecCode, M.{3},
+                            ROW_NUMBER() over (
+                                PARTITION BY F.RequestDate, ID.Issuer
+                                ORDER BY M.{3} DESC, M.SecCode) AS rank_val
+                from        {4} M
+                join        filter_dates F
+                    on      M.Date_ = F.FilterDate
+                join        ram.dbo.ram_master_ids ID
+                    on      M.SecCode = ID.SecCode
+                    and     M.Date_ between ID.StartDate and ID.EndDate
+                left join   ram.dbo.ram_idccode_to_gvkey_map G
+                    on      M.IdcCode = G.IdcCode
+                    and     M.Date_ between G.StartDate and G.EndDate
+                left join   ram.dbo.ram_compustat_sector S
+                    on      S.GVKey = G.GVKey
+                    and     M.Date_ between S.StartDate and S.EndDate
+                where       M.NormalTradingFlag = 1
+                and         M.OneYearTradingFlag = 1
+                {2}
+                )
+                , univ as (
+                select      RequestDate, SecCode,
+                            ROW_NUMBER() over (
+                                PARTITION BY RequestDate
+                                ORDER BY {3} DESC, SecCode) AS univ_rank
+                from        tempdata
+                where       rank_val = 1
+                )
+                select      RequestDate, SecCode from univ
+                where       univ_rank <= {0}
+                order by    RequestDate, univ_rank;
+                """.format(univ_size, values, where, filter_col, table)
             )
-            select top {0} SecCode from tempdata
-            where rank_val = 1
-            order by {3} desc;
-            """.format(univ_size, filter_date, where, filter_col, table)
-        )).flatten()
-        return seccodes
+            # Failed queries return None, which must not become empty
+            # universes
+            if rows is None:
+                raise IOError('Could not select universes for filter '
+                              'dates {} to {}'.format(
+                                  request_keys[i],
+                                  request_keys[i:i+1000][-1]))
+            rows = pd.DataFrame(list(rows),
+                                columns=['RequestDate', 'SecCode'])
+            for d, group in rows.groupby('RequestDate', sort=False):
+                d = check_input_date(d)
+                output[request_dates[d.strftime('%Y-%m-%d')]] = \
+                    group.SecCode.values
+        return output
+
+    def _get_filtered_seccodes(self, filter_date, args, table):
+        return self.get_filtered_seccodes_batch(
+            [filter_date], args, table)[filter_date]
 
     def _map_ticker_to_seccode(self, tickers):
         if isinstance(tickers, str):
@@ -320,7 +476,9 @@ class DataHandlerSQL(object):
             "from ram.dbo.ram_master_ids_etf;"), columns=['SecCode', 'Ticker'])
         return seccodes[seccodes.Ticker.isin(tickers)]
 
-    def prior_trading_date(self, t0_dates=dt.date.today()):
+    def prior_trading_date(self, t0_dates=None):
+        if t0_dates is None:
+            t0_dates = dt.date.today()
         if not isinstance(t0_dates, list):
             t0_dates = [t0_dates]
         if not isinstance(t0_dates[0], dt.date):
@@ -328,38 +486,54 @@ class DataHandlerSQL(object):
                 t0_dates = [dparser.parse(x) for x in t0_dates]
             except:
                 return np.nan
-        date_order = np.argsort(t0_dates)
-        input_order = np.argsort(date_order)
+        prior_date = self.get_trading_calendar().prior_trading_date(t0_dates)
+        prior_date = prior_date.astype(object)
+        if len(t0_dates) == 1:
+            return prior_date[0]
+        return prior_date
 
-        str_dates = ['{0}/{1}/{2}'.format(x.month, x.day, x.year)
-                     for x in t0_dates]
-        if len(str_dates) > 1:
-            sql_dates = tuple(str_dates)
-        else:
-            sql_dates = "('" + str_dates[0] + "')"
+    def sql_execute(self, sqlcmd, time_constrained=True, temp_seccodes=None):
+        if time_constrained:
+            self._test_time_constraint()
+        for i in range(5):
+            try:
+                return self._pooled_execute(sqlcmd, lambda c: c.fetchall(),
+                                            temp_seccodes)
+            except Exception as e:
+                print(e)
+                time.sleep(2)
 
-        sql_cmd = ("select Tm1 "
-                   "from ram.dbo.ram_trading_dates "
-                   "where CalendarDate in {}".format(sql_dates))
-        prior_date = self.sql_execute(sql_cmd)
-        prior_date = [x[0].date() for x in prior_date]
+    def sql_execute_frame(self, sqlcmd, columns, time_constrained=True,
+                          chunk_size=50000, temp_seccodes=None):
+        """
+        Streams the result set with `fetchmany` into preallocated typed
+        column arrays and builds the DataFrame from those, so the full
+        list of row tuples never exists.
 
-        if len(t0_dates) == 1:
-            return prior_date[0]
-        return np.array(prior_date)[input_order]
+        Parameters
+        ----------
+        sqlcmd : str
+        columns : list
+            Output column names in select order
+        chunk_size : int
+            Rows per `fetchmany` call
+        temp_seccodes : list
+            Loaded into SECCODE_TEMP_TABLE on the connection before the
+            statement runs, if not already there
 
-    def sql_execute(self, sqlcmd, time_constrained=True):
+        Returns
+        -------
+        data : pandas.DataFrame
+            SecCode as int, Date as datetime64, numeric columns as float
+        """
         if time_constrained:
             self._test_time_constraint()
         for i in range(5):
             try:
-                self._connect()
-                self._cursor.execute(sqlcmd)
-                return_data = self._cursor.fetchall()
-                self._disconnect()
-                return return_data
+                return self._pooled_execute(
+                    sqlcmd, lambda c: _fetch_columnar(c, columns, chunk_size),
+                    temp_seccodes)
             except Exception as e:
-                self._disconnect()
                 print(e)
                 time.sleep(2)
 
@@ -371,18 +545,333 @@ class DataHandlerSQL(object):
             self._test_time_constraint()
         for i in range(5):
             try:
-                self._connect()
-                self._cursor.execute(sqlcmd)
-                self._connection.commit()
-                self._disconnect()
+                self._pooled_execute(sqlcmd)
                 break
             except Exception as e:
-                self._disconnect()
                 print(e)
                 time.sleep(2)
 
+    def _pooled_execute(self, sqlcmd, fetch_func=None, temp_seccodes=None):
+        # Connections that raise are discarded by the pool
+        with self._pool.connection() as connection:
+            if temp_seccodes is not None:
+                self._load_temp_seccodes(connection, temp_seccodes)
+            cursor = connection.cursor()
+            try:
+                cursor.execute(sqlcmd)
+                if fetch_func:
+                    return fetch_func(cursor)
+                connection.commit()
+            finally:
+                cursor.close()
+
+    def _execute_to_frame(self, sqlcmd, columns, temp_seccodes=None):
+        # Without a data-as-of stamp entries can't be validated, so the
+        # cache is bypassed for both reads and writes
+        key = None
+        if self._cache is not None:
+            data_as_of = self.get_data_as_of()
+            if data_as_of is not None:
+                key = self._cache.make_key(sqlcmd, data_as_of,
+                                           temp_seccodes)
+                data = self._cache.get(key)
+                if data is not None:
+                    return data
+        if self._stream_fetch:
+            data = self.sql_execute_frame(sqlcmd, columns,
+                                          temp_seccodes=temp_seccodes)
+        else:
+            data = self.sql_execute(sqlcmd, temp_seccodes=temp_seccodes)
+            if data is not None:
+                data = pd.DataFrame(data, columns=columns)
+        # Failed queries return None and are not cached
+        if data is None:
+            return pd.DataFrame(columns=columns)
+        if key is not None:
+            self._cache.put(key, data)
+        return data
+
+    def get_data_as_of(self):
+        """
+        Time of the last ram table update, from the table monitor that
+        runs after `ram_table_update`. Refreshed every 15 minutes. None
+        if the monitor can't be read, in which case nothing is cached
+        or invalidated.
+        """
+        if (self._data_as_of is None) or \
+                (time.time() - self._data_as_of[1] > 900):
+            as_of = self.sql_execute(
+                'select max(StatusDateTime) from ram.dbo.ram_table_monitor',
+                time_constrained=False)
+            as_of = as_of[0][0] if as_of else None
+            if as_of is None:
+                return None
+            if (self._cache is not None) and \
+                    ((self._data_as_of is None) or
+                     (self._data_as_of[0] != as_of)):
+                self._cache.invalidate(as_of)
+            self._data_as_of = (as_of, time.time())
+        return self._data_as_of[0]
+
+    def get_cache_stats(self):
+        if self._cache is None:
+            return None
+        return self._cache.get_stats()
+
+    def _load_temp_seccodes(self, connection, seccodes):
+        seccodes = tuple(sorted(set([int(x) for x in seccodes])))
+        if self._loaded_seccodes.get(connection) == seccodes:
+            return
+        cursor = connection.cursor()
+        try:
+            for sqlcmd in make_temp_seccode_table_cmds(seccodes):
+                cursor.execute(sqlcmd)
+            connection.commit()
+        finally:
+            cursor.close()
+        self._loaded_seccodes[connection] = seccodes
+
+    def get_pool_stats(self):
+        return self._pool.get_stats()
+
     def close_connections(self):
-        self._disconnect()
+        self._pool.close_idle()
+
+
+def _make_connection():
+    # Autocommit, as the single connection before pooling was, so reads
+    # don't hold transactions open on idle pooled connections
+    try:
+        connection = pypyodbc.connect('Driver={SQL Server};'
+                                      'Server=QADIRECT;'
+                                      'Database=ram;'
+                                      'uid=ramuser;pwd=183madison',
+                                      autocommit=True)
+    except:
+        # Mac/Linux implementation. unixODBC and FreeTDS works
+        # https://github.com/mkleehammer/pyodbc/wiki/Connecting-to-SQL-Server-from-Mac-OSX
+        connect_str = "DSN=qadirectdb;UID=ramuser;PWD=183madison"
+        connection = pypyodbc.connect(connect_str, autocommit=True)
+    assert connection.connected == 1
+    return connection
+
+
+def make_temp_seccode_table_cmds(seccodes, table=SECCODE_TEMP_TABLE):
+    """
+    Statements that (re)create the session temp table holding the
+    universe. SQL Server takes at most 1000 rows per VALUES clause.
+    """
+    cmds = [
+        "if object_id('tempdb..{0}') is not null drop table {0};".format(
+            table),
+        'create table {0} (SecCode int primary key);'.format(table)
+    ]
+    for i in range(0, len(seccodes), 1000):
+        values = ', '.join(['({0})'.format(x) for x in seccodes[i:i+1000]])
+        cmds.append('insert into {0} values {1};'.format(table, values))
+    return cmds
+
+
+def benchmark_feature_fusion(seccodes, features, start_date, end_date,
+                             table='ram.dbo.ram_equity_pricing',
+                             repetitions=3):
+    """
+    Compares the fused feature query, which reads each source table
+    once per group of features, with one subquery per feature. See
+    `_measure_queries` for how server cost is measured.
+
+    Returns
+    -------
+    stats : pandas.DataFrame
+        Indexed by mode, see `_measure_queries`
+    """
+    d1, _, d3 = _format_dates(start_date, None, end_date)
+    queries = OrderedDict()
+    for mode, fuse in [('per_feature', False), ('fused', True)]:
+        sqlcmd, _ = sqlcmd_from_feature_list(features, seccodes, d1, d3,
+                                             table, fuse=fuse)
+        queries[mode] = ([sqlcmd], None)
+    return _measure_queries(queries, table, repetitions)
+
+
+def _measure_queries(queries, table, repetitions):
+    """
+    Runs each query once to warm the plan and page caches, then
+    `repetitions` times with the order of the modes alternating. Server
+    CPU time, elapsed time and logical reads of the measured runs come
+    from sys.dm_exec_query_stats, which needs VIEW SERVER STATE. Each
+    statement is tagged with a comment so its plan cache entry can be
+    found.
+
+    Parameters
+    ----------
+    queries : OrderedDict
+        Mode to (sqlcmds, temp_seccodes), where one run of a mode
+        executes all of its sqlcmds. Temp table loads are not part of
+        the measured statements.
+
+    Returns
+    -------
+    stats : pandas.DataFrame
+        Indexed by mode, with the characters of all statements and the
+        mean server cpu_ms, elapsed_ms and logical_reads per run
+    """
+    dh = DataHandlerSQL(table=table)
+    tags = dict([(mode, 'benchmark {} {}'.format(mode, uuid.uuid4().hex))
+                 for mode in queries])
+    sqlcmds = dict([(mode, ['/* {} */ {}'.format(tags[mode], x)
+                            for x in queries[mode][0]])
+                    for mode in queries])
+
+    def run(mode):
+        for sqlcmd in sqlcmds[mode]:
+            if dh.sql_execute(sqlcmd, time_constrained=False,
+                              temp_seccodes=queries[mode][1]) is None:
+                raise IOError('Benchmark query failed: {}'.format(mode))
+
+    modes = list(queries.keys())
+    for mode in modes:
+        run(mode)
+    before = dict([(m, _query_stats(dh, tags[m])) for m in modes])
+    for i in range(repetitions):
+        for mode in (modes if i % 2 == 0 else modes[::-1]):
+            run(mode)
+    stats = {}
+    for mode in modes:
+        delta = _query_stats(dh, tags[mode]) - before[mode]
+        stats[mode] = delta / repetitions
+        stats[mode]['statement_chars'] = sum(
+            [len(x) for x in queries[mode][0]])
+    dh.close_connections()
+    return pd.DataFrame(stats).T[['statement_chars', 'cpu_ms',
+                                  'elapsed_ms', 'logical_reads']]
+
+
+def _query_stats(dh, tag):
+    """
+    Cumulative server statistics of the statements tagged with `tag`
+    """
+    rows = dh.sql_execute(
+        """
+        select      isnull(sum(S.total_worker_time), 0) / 1000.0,
+                    isnull(sum(S.total_elapsed_time), 0) / 1000.0,
+                    isnull(sum(S.total_logical_reads), 0)
+        from        sys.dm_exec_query_stats S
+        cross apply sys.dm_exec_sql_text(S.sql_handle) T
+        where       T.text like '/* {0} */%'
+        """.format(tag), time_constrained=False)
+    if not rows:
+        raise IOError('Could not read sys.dm_exec_query_stats')
+    return pd.Series([float(x) for x in rows[0]],
+                     index=['cpu_ms', 'elapsed_ms', 'logical_reads'])
+
+
+def benchmark_seccode_filter(seccodes, features, start_date, end_date,
+                             table='ram.dbo.ram_equity_pricing',
+                             repetitions=3):
+    """
+    Compares the inline SecCode filter with the temp table filter on the
+    statements get_seccode_data issues for all of `features`, in its
+    batches of ten. See `_measure_queries` for how server cost is
+    measured; the temp table load is not included.
+
+    Returns
+    -------
+    stats : pandas.DataFrame
+        Indexed by mode, see `_measure_queries`
+    """
+    d1, _, d3 = _format_dates(start_date, None, end_date)
+    queries = OrderedDict()
+    for mode, id_table, temp_seccodes in [
+            ('inline', None, None),
+            ('temp_table', SECCODE_TEMP_TABLE, seccodes)]:
+        sqlcmds = []
+        for i in range(0, len(features), 10):
+            sqlcmd, _ = sqlcmd_from_feature_list(
+                features[i:i+10], seccodes, d1, d3, table,
+                id_table=id_table)
+            sqlcmds.append(sqlcmd)
+        queries[mode] = (sqlcmds, temp_seccodes)
+    return _measure_queries(queries, table, repetitions)
+
+
+def _fetch_columnar(cursor, columns, chunk_size):
+    buffers = None
+    n_rows = 0
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        chunk = zip(*rows)
+        if buffers is None:
+            buffers = [np.empty(chunk_size, dtype=_infer_dtype(c, v))
+                       for c, v in zip(columns, chunk)]
+        n_new = n_rows + len(rows)
+        if n_new > len(buffers[0]):
+            capacity = max(n_new, 2 * len(buffers[0]))
+            buffers = [_grow_buffer(b, n_rows, capacity) for b in buffers]
+        for i, values in enumerate(chunk):
+            buffers[i] = _fill_buffer(buffers[i], n_rows, n_new, values)
+        n_rows = n_new
+    if buffers is None:
+        return pd.DataFrame(columns=columns)
+    return pd.DataFrame(
+        OrderedDict([(c, b[:n_rows]) for c, b in zip(columns, buffers)]),
+        columns=columns)
+
+
+def _infer_dtype(column, values):
+    if column == 'SecCode':
+        return np.int64
+    for v in values:
+        if v is None:
+            continue
+        if isinstance(v, (dt.date, dt.datetime)):
+            return 'datetime64[ns]'
+        if isinstance(v, (int, long, float, decimal.Decimal)):
+            return np.float64
+        return object
+    return np.float64
+
+
+def _grow_buffer(buff, n_rows, capacity):
+    out = np.empty(capacity, dtype=buff.dtype)
+    out[:n_rows] = buff[:n_rows]
+    return out
+
+
+def _fill_buffer(buff, i1, i2, values):
+    """
+    Writes values into buff[i1:i2], widening the buffer's dtype
+    (int -> float -> object) if the values don't fit.
+    """
+    while True:
+        try:
+            buff[i1:i2] = np.array(values, dtype=buff.dtype)
+            return buff
+        except (TypeError, ValueError, decimal.InvalidOperation):
+            if buff.dtype == np.int64:
+                buff = buff.astype(np.float64)
+            elif buff.dtype.kind == 'M':
+                buff = buff.astype('datetime64[us]').astype(object)
+            elif buff.dtype == object:
+                raise
+            else:
+                buff = buff.astype(object)
+
+
+def _align_batches(batches):
+    """
+    Outer-joins feature batches indexed by SecCode/Date in one pass.
+    """
+    if len(batches) == 0:
+        return pd.DataFrame(columns=['SecCode', 'Date'])
+    index = batches[0].index
+    for b in batches[1:]:
+        index = index.union(b.index)
+    index = index.sort_values()
+    output = pd.concat([b.reindex(index) for b in batches], axis=1)
+    return output.reset_index()
 
 
 def _format_dates(start_date, filter_date, end_date):
@@ -1,5 +1,7 @@
+import warnings
 import numpy as np
 import pandas as pd
+from collections import OrderedDict
 
 from abc import ABCMeta, abstractmethod, abstractproperty
 
@@ -31,20 +33,128 @@ def data_rank(pdata):
     # It is assumed that these are the correct labels
     pdata.index.name = 'Date'
     pdata.columns.name = 'SecCode'
-    ranks = pdata.rank(axis=1, pct=True)
+    ranks = pd.DataFrame(data_rank_stack(pdata.values), index=pdata.index,
+                         columns=pdata.columns)
     return ranks
 
 
 def data_fill_median(data, backfill=False):
-    if backfill:
-        row_median = data.median(axis=1).fillna(method='backfill')
-    else:
-        row_median = data.median(axis=1)
-    fill_df = pd.concat([row_median] * data.shape[1], axis=1)
-    fill_df.columns = data.columns
-    fill_df.index = data.index
-    data = data.fillna(fill_df)
-    return data
+    if not data.isnull().values.any():
+        return data.copy()
+    return pd.DataFrame(data_fill_median_stack(data.values, backfill),
+                        index=data.index, columns=data.columns)
+
+
+def data_rank_stack(values, fill_median=False, backfill=False):
+    """
+    Percentile ranks along the last axis of any number of stacked
+    Date x SecCode features, for example a (feature, date, seccode)
+    array. Same as `DataFrame.rank(axis=1, pct=True)` on each feature:
+    ties get their average rank, and nulls stay null and aren't counted.
+    As in that method, positive infinity is ranked as null.
+
+    With `fill_median`, null ranks are then filled as with
+    `data_fill_median_stack`, taking the medians from the sorted ranks.
+    """
+    values = np.asarray(values, dtype=float)
+    out = np.empty(values.shape)
+    medians = np.empty(values.shape[:-1])
+    for rows, out_rows, median_rows in _row_chunks(values, out, medians):
+        # Nulls and positive infinity sort to the end of each row
+        null = np.isnan(rows) | (rows == np.inf)
+        order = rows.argsort(axis=1)
+        ordered = np.take_along_axis(rows, order, axis=1)
+        # Positions of the first and last of each run of equal values
+        n = rows.shape[1]
+        positions = np.arange(n)
+        run_start = np.ones(rows.shape, dtype=bool)
+        run_start[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+        run_end = np.ones(rows.shape, dtype=bool)
+        run_end[:, :-1] = run_start[:, 1:]
+        first = np.maximum.accumulate(
+            np.where(run_start, positions, 0), axis=1)
+        last = np.minimum.accumulate(
+            np.where(run_end, positions, n)[:, ::-1], axis=1)[:, ::-1]
+        counts = (~null).sum(axis=1)[:, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ranks = ((first + last) / 2. + 1) / counts
+        if fill_median:
+            median_rows[:] = _sorted_medians(ranks, counts)
+        np.put_along_axis(out_rows, order, ranks, axis=1)
+        out_rows[null] = np.nan
+    if fill_median:
+        _fill_medians(out, medians, backfill)
+    return out
+
+
+def data_fill_median_stack(values, backfill=False):
+    """
+    Fills nulls with the median of their row, along the last axis, for
+    any number of stacked Date x SecCode features. Same as
+    `data_fill_median` on each feature, but the medians are only
+    broadcast where values are missing.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        Array of (..., date, seccode)
+    backfill : bool
+        Rows without any values take the next date's median
+    """
+    values = np.array(values, dtype=float)
+    medians = np.empty(values.shape[:-1])
+    for rows, median_rows in _row_chunks(values, medians):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            median_rows[:] = np.nanmedian(rows, axis=1)
+    _fill_medians(values, medians, backfill)
+    return values
+
+
+def _sorted_medians(ordered, counts):
+    # Medians of rows sorted with their `counts` values first, as
+    # np.nanmedian
+    lower = np.take_along_axis(ordered, np.maximum(counts - 1, 0) // 2,
+                               axis=1)
+    upper = np.take_along_axis(ordered, counts // 2, axis=1)
+    return np.where(counts > 0, (lower + upper) / 2., np.nan)[:, 0]
+
+
+def _fill_medians(values, medians, backfill):
+    """
+    Fills nulls of `values` in place with `medians` of their rows, back
+    filled along the dates first if `backfill`.
+    """
+    if backfill and medians.ndim:
+        medians = _backfill(medians)
+    null = np.isnan(values)
+    values[null] = np.broadcast_to(medians[..., None], values.shape)[null]
+
+
+def _row_chunks(values, *outs, **kwargs):
+    """
+    Rows of the last axis of `values`, as 2d blocks of about `max_size`
+    values so temporary arrays stay small for large stacks, with the
+    matching rows of each output. Outputs are either the shape of
+    `values` or the shape of its rows.
+    """
+    max_size = kwargs.get('max_size', 2 ** 20)
+    n = max(values.shape[-1], 1)
+    rows = values.reshape(int(np.prod(values.shape[:-1])), values.shape[-1])
+    outs = [x.reshape(rows.shape) if x.shape == values.shape
+            else x.reshape(len(rows)) for x in outs]
+    step = max(max_size // n, 1)
+    for i in range(0, len(rows), step):
+        yield tuple([rows[i:i + step]] + [x[i:i + step] for x in outs])
+
+
+def _backfill(values):
+    # Back fills nulls along the last axis
+    values = values[..., ::-1]
+    valid = ~np.isnan(values)
+    inds = np.where(valid, np.arange(values.shape[-1]), 0)
+    inds = np.maximum.accumulate(inds, axis=-1)
+    return np.take_along_axis(values, inds, axis=-1)[..., ::-1]
 
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -52,7 +162,20 @@ def data_fill_median(data, backfill=False):
 class FeatureAggregator(object):
 
     def __init__(self, live_flag=False):
-        self._data = pd.DataFrame()
+        """
+        Collects Date x SecCode features into one (SecCode, Date) by
+        feature matrix. Each feature is written into its own column as it
+        is added, and the matrix is expanded if a feature has dates or
+        SecCodes that weren't seen before.
+        """
+        self._index = None
+        self._columns = None
+        self._values = np.empty((0, 0))
+        # Column of each label, and of the counts of labels that were
+        # added more than once and are averaged
+        self._slots = OrderedDict()
+        self._count_slots = {}
+        self._dtypes = set()
 
     def add_feature(self, data, label, fill_median=True, backfill=False):
         """
@@ -65,29 +188,127 @@ class FeatureAggregator(object):
             data = data.to_frame().T
         if fill_median:
             data = data_fill_median(data, backfill)
-        data = data.unstack().reset_index()
-        data.columns = ['SecCode', 'Date', 'val']
-        data['label'] = label
-        self._data = self._data.append(data)
+        self._expand(data.index, data.columns)
+        if not (data.index.equals(self._index) and
+                data.columns.equals(self._columns)):
+            data = data.reindex(index=self._index, columns=self._columns)
+        self._dtypes.update(data.dtypes.unique())
+        # Rows are SecCode major, as with `unstack`
+        values = data.values.astype(float).T.ravel()
+        if label in self._slots:
+            self._add_to_mean(label, values)
+        else:
+            slot = self._new_slot(label)
+            self._values[:, slot] = values
 
     def make_dataframe(self):
         """
         Will put back in missing values if there was nothing to handle
         """
-        output = self._data.pivot_table(
-            values='val', index=['SecCode', 'Date'],
-            columns='label', aggfunc='mean').reset_index()
-        del output.columns.name
         # Sorted output features
-        features = self._data.label.unique().tolist()
-        features.sort()
-        features = ['SecCode', 'Date'] + features
-        # Add back in missing columns
-        missing_cols = set(features) - set(output.columns)
-        output = output.join(pd.DataFrame(columns=missing_cols))
-        output = output[features]
+        features = sorted(self._slots.keys())
+        values = self._values[:, [self._slots[f] for f in features]]
+        for i, f in enumerate(features):
+            if f in self._count_slots:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    values[:, i] /= self._values[:, self._count_slots[f]]
+        # Drop SecCode/Dates with no values in any feature
+        keep = ~np.isnan(values).all(axis=1)
+        output = pd.DataFrame(values[keep], columns=features)
+        output.insert(0, 'Date', np.tile(
+            self._index.values, len(self._columns))[keep])
+        output.insert(0, 'SecCode', np.repeat(
+            self._columns.values, len(self._index))[keep])
+        # Features with no values are object columns of nulls
+        for f in features:
+            if output[f].isnull().all():
+                output[f] = output[f].astype(object)
+        self._restore_dtype(output, features)
         return output
 
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _expand(self, index, columns):
+        """
+        Grows the rows to the union of the current and new dates and
+        SecCodes, keeping them sorted.
+        """
+        if self._index is None:
+            old_index, old_columns = None, None
+            new_index = index.sort_values()
+            new_columns = columns.sort_values()
+        else:
+            if index.equals(self._index) and columns.equals(self._columns):
+                return
+            old_index, old_columns = self._index, self._columns
+            new_index = old_index.union(index)
+            new_columns = old_columns.union(columns)
+            if new_index.equals(old_index) and \
+                    new_columns.equals(old_columns):
+                return
+        n_slots = self._values.shape[1]
+        new_values = np.full((len(new_columns), len(new_index), n_slots),
+                             np.nan)
+        if old_index is not None:
+            col_inds = new_columns.get_indexer(old_columns)
+            row_inds = new_index.get_indexer(old_index)
+            new_values[col_inds[:, None], row_inds[None, :]] = \
+                self._values.reshape(len(old_columns), len(old_index),
+                                     n_slots)
+        self._index = new_index
+        self._columns = new_columns
+        self._values = new_values.reshape(
+            len(new_columns) * len(new_index), n_slots)
+
+    def _new_slot(self, label):
+        slot = len(self._slots) + len(self._count_slots)
+        if slot == self._values.shape[1]:
+            # Double capacity so adding features stays linear
+            new_values = np.full((self._values.shape[0],
+                                  max(2 * self._values.shape[1], 16)),
+                                 np.nan)
+            new_values[:, :slot] = self._values
+            self._values = new_values
+        if label is not None:
+            self._slots[label] = slot
+        return slot
+
+    def _restore_dtype(self, output, features):
+        """
+        Features that were all bool or all integer keep their type where
+        there are no nulls, as pivot_table did. Averaged bools are floats.
+        """
+        if len(self._dtypes) != 1:
+            return
+        dtype = list(self._dtypes)[0]
+        if dtype.kind not in 'bi':
+            return
+        for f in features:
+            values = output[f].values
+            if (values.dtype.kind != 'f') or np.isnan(values).any():
+                continue
+            if dtype.kind == 'b':
+                if f not in self._count_slots:
+                    output[f] = values.astype(dtype)
+            elif np.all(values == np.round(values)):
+                output[f] = values.astype(dtype)
+
+    def _add_to_mean(self, label, values):
+        """
+        Labels added more than once are averaged, ignoring nulls, so the
+        column holds their sum and a count column is kept alongside.
+        """
+        sums = self._values[:, self._slots[label]]
+        if label not in self._count_slots:
+            slot = self._new_slot(None)
+            self._count_slots[label] = slot
+            sums = self._values[:, self._slots[label]]
+            self._values[:, slot] = ~np.isnan(sums)
+        counts = self._values[:, self._count_slots[label]]
+        valid = ~np.isnan(values)
+        sums[valid] = np.nan_to_num(sums[valid]) + values[valid]
+        counts[valid] = np.nan_to_num(counts[valid]) + 1
+
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
@@ -266,3 +487,539 @@ class RSI(BaseTechnicalFeature):
         rsi.index = changes.columns
         rsi.name = data.index[-1]
         return rsi
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class RollingWindows(object):
+
+    def __init__(self, data):
+        """
+        Rolling statistics of a Date x SecCode frame for any number of
+        windows. Means, sums and standard deviations come from cumulative
+        sums built once, and maxes from a table of maxes over doubling
+        spans, so each extra window is one vectorized difference. Results
+        are memoized, so one object should be shared within a period.
+
+        As with pandas rolling functions, a window with any null value
+        is null.
+        """
+        self.data = data
+        self._values = data.values.astype(float)
+        self._memo = {}
+
+    # ~~~~~~ Interface ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def mean(self, window):
+        return self._make_frame(self._get(
+            ('mean', window), lambda: self._mean(window)))
+
+    def sum(self, window):
+        return self._make_frame(self._get(('sum', window), lambda: (
+            self._center * window + self._window_sums(window, 1)) *
+            self._nonzero(window)))
+
+    def std(self, window, ddof=1):
+        return self._make_frame(self._get(
+            ('std', window, ddof), lambda: self._std(window, ddof)))
+
+    def max(self, window):
+        return self._make_frame(self._get(
+            ('max', window), lambda: self._max(window)))
+
+    def derive(self, name, func):
+        """
+        RollingWindows of `func(self.data)`, memoized under `name`
+        """
+        return self._get(('derive', name),
+                         lambda: RollingWindows(func(self.data)))
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _get(self, key, func):
+        if key not in self._memo:
+            self._memo[key] = func()
+        return self._memo[key]
+
+    def _make_frame(self, values):
+        return pd.DataFrame(values, index=self.data.index,
+                            columns=self.data.columns, copy=False)
+
+    @property
+    def _center(self):
+        # Centering each column keeps the cumulative sums small, which
+        # limits cancellation in the sums of squares
+        def center():
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                center = np.nanmean(self._values, axis=0)
+            return np.nan_to_num(center)
+        return self._get('center', center)
+
+    def _cumsum(self, power):
+        def cumsum():
+            values = np.nan_to_num(self._values - self._center) ** power
+            return np.vstack([np.zeros((1, values.shape[1])),
+                              values.cumsum(axis=0)])
+        return self._get(('cumsum', power), cumsum)
+
+    def _window_diff(self, cumsum, window):
+        """
+        Window sums from a cumulative sum with a leading zero row, null
+        where the window isn't complete or has a null value
+        """
+        out = np.full(self._values.shape, np.nan)
+        out[window - 1:] = cumsum[window:] - cumsum[:-window]
+        out[self._null_windows(window)] = np.nan
+        return out
+
+    def _window_sums(self, window, power):
+        return self._window_diff(self._cumsum(power), window)
+
+    def _null_windows(self, window):
+        def null_windows():
+            counts = self._get('null_counts', lambda: np.vstack([
+                np.zeros((1, self._values.shape[1])),
+                np.isnan(self._values).cumsum(axis=0)]))
+            out = np.ones(self._values.shape, dtype=bool)
+            out[window - 1:] = (counts[window:] - counts[:-window]) > 0
+            return out
+        return self._get(('null_windows', window), null_windows)
+
+    def _nonzero(self, window):
+        """
+        Zero where every value of the window is zero, so those sums are
+        exactly zero rather than a rounding remainder
+        """
+        def nonzero():
+            counts = self._get('nonzero_counts', lambda: np.vstack([
+                np.zeros((1, self._values.shape[1])),
+                (self._values != 0).cumsum(axis=0)]))
+            out = np.ones(self._values.shape)
+            out[window - 1:] = (counts[window:] - counts[:-window]) > 0
+            return out
+        return self._get(('nonzero', window), nonzero)
+
+    def _mean(self, window):
+        mean = (self._center + self._window_sums(window, 1) / window) * \
+            self._nonzero(window)
+        # Windows of a single repeated value average to exactly that
+        # value, consistent with their zero standard deviation
+        return np.where(self._constant_windows(window), self._values, mean)
+
+    def _std(self, window, ddof):
+        if window - ddof <= 0:
+            return np.full(self._values.shape, np.nan)
+        sums = self._window_sums(window, 1)
+        sq_sums = self._window_sums(window, 2)
+        with np.errstate(invalid='ignore'):
+            var = (sq_sums - sums ** 2 / window) / (window - ddof)
+            var[var < 0] = 0
+        # Windows of a single repeated value have no spread at all
+        var[self._constant_windows(window)] = 0
+        return np.sqrt(var)
+
+    def _constant_windows(self, window):
+        def constant_windows():
+            counts = self._get('change_counts', lambda: np.vstack([
+                np.zeros((2, self._values.shape[1])),
+                (np.diff(self._values, axis=0) != 0).cumsum(axis=0)]))
+            out = np.zeros(self._values.shape, dtype=bool)
+            out[window - 1:] = counts[window:] == \
+                counts[1:len(counts) - window + 1]
+            out[self._null_windows(window)] = False
+            return out
+        return self._get(('constant_windows', window), constant_windows)
+
+    def _max(self, window):
+        # Maxes over spans of 2**k rows ending at each row. A window is
+        # covered by two, possibly overlapping, spans of the largest
+        # 2**k <= window
+        k = int(np.log2(window))
+        levels = self._get('max_levels', lambda: [
+            np.where(np.isnan(self._values), -np.inf, self._values)])
+        while len(levels) <= k:
+            span = 2 ** (len(levels) - 1)
+            prev = levels[-1]
+            level = prev.copy()
+            level[span:] = np.maximum(prev[span:], prev[:-span])
+            levels.append(level)
+        span = 2 ** k
+        out = np.full(self._values.shape, np.nan)
+        out[window - 1:] = np.maximum(levels[k][window - 1:],
+                                      levels[k][span - 1:len(out) -
+                                                window + span])
+        out[self._null_windows(window)] = np.nan
+        return out
+
+
+class LiveWindows(object):
+
+    def __init__(self, history):
+        """
+        Last date counterpart of RollingWindows. Sums, sums of squares,
+        counts and maxes of `history` (Date x SecCode, up to yesterday)
+        are accumulated backwards from its last row once. Each live
+        refresh sets today's bar with `set_bar`, and completing any
+        window with it is then O(1) per SecCode.
+
+        As with the `calculate_last_date` methods, nulls inside a window
+        are skipped, except by `sum(window, skipna=False)`.
+        """
+        self.history = history
+        self.bar = None
+        values = history.values.astype(float)[::-1]
+        valid = ~np.isnan(values)
+        self._cols = cols = np.arange(values.shape[1])
+        self.last = self._make_series(values[0])
+        self.last_valid = self._make_series(
+            values[valid.argmax(axis=0), cols])
+        # Centering on the last price keeps the sums of squares small,
+        # and windows of a single repeated price exactly zero
+        self._center = np.nan_to_num(self.last_valid.values)
+        centered = np.where(valid, values - self._center, 0)
+        self._sums = _tail_sums(centered)
+        self._sq_sums = _tail_sums(centered ** 2)
+        self._counts = _tail_sums(valid)
+        self._nulls = _tail_sums(~valid)
+        self._maxes = np.vstack([np.full((1, len(cols)), np.nan),
+                                 np.fmax.accumulate(values, axis=0)])
+        # Oldest row with a value, going back from the last row
+        self._oldest_valid = np.maximum.accumulate(
+            np.where(valid, np.arange(len(values))[:, None], -1), axis=0)
+        self._memo = {}
+
+    # ~~~~~~ Interface ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def set_bar(self, bar):
+        """
+        Today's values, a Series by SecCode or an array in the order of
+        the history's columns. Returns self.
+        """
+        if isinstance(bar, pd.Series):
+            name = bar.name
+            bar = bar.reindex(self.history.columns).values
+        else:
+            name = None
+        self.bar = self._make_series(np.asarray(bar, dtype=float), name)
+        return self
+
+    def pct_change_windows(self, window):
+        """
+        Per SecCode, the number of returns that `pct_change` of only the
+        trailing `window` values, today's included, leaves non-null.
+        That is the returns after the window's first non-null value.
+        """
+        if window < 2:
+            return np.zeros(len(self._cols), dtype=int)
+        return self._oldest_valid[min(window, len(self._sums)) - 2] + 1
+
+    def mean(self, window):
+        sums, _, counts = self._window_sums(window)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self._make_series(self._center + sums / counts)
+
+    def sum(self, window, skipna=True):
+        sums, _, counts = self._window_sums(window)
+        out = self._center * counts + sums
+        if not skipna:
+            nulls = self._at(self._nulls, window) + self.bar.isnull().values
+            out[nulls > 0] = np.nan
+        return self._make_series(out)
+
+    def std(self, window, ddof=1):
+        sums, sq_sums, counts = self._window_sums(window)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            var = (sq_sums - sums ** 2 / counts) / (counts - ddof)
+            var[var < 0] = 0
+        var[counts - ddof <= 0] = np.nan
+        return self._make_series(np.sqrt(var))
+
+    def max(self, window):
+        return self._make_series(
+            np.fmax(self._at(self._maxes, window), self.bar.values))
+
+    def derive(self, name, func, bar_func):
+        """
+        LiveWindows of `func(self.history)`, memoized under `name`, with
+        its bar set to `bar_func(self)`
+        """
+        if name not in self._memo:
+            self._memo[name] = LiveWindows(func(self.history))
+        windows = self._memo[name].set_bar(bar_func(self))
+        windows.bar.name = self.bar.name
+        return windows
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _at(self, tail_values, window):
+        """
+        Accumulated values of the history rows the bar completes `window`
+        with. Windows can be given per SecCode, and empty windows also
+        leave out the bar.
+        """
+        tail = np.zeros(len(self._cols), dtype=int) + window - 1
+        assert tail.max() < len(tail_values)
+        return tail_values[np.maximum(tail, 0), self._cols]
+
+    def _window_sums(self, window):
+        bar = self.bar.values - self._center
+        valid = ~np.isnan(bar) & (np.asarray(window) > 0)
+        bar = np.where(valid, bar, 0)
+        return (self._at(self._sums, window) + bar,
+                self._at(self._sq_sums, window) + bar ** 2,
+                self._at(self._counts, window) + valid)
+
+    def _make_series(self, values, name=None):
+        if name is None and self.bar is not None:
+            name = self.bar.name
+        return pd.Series(values, index=self.history.columns, name=name)
+
+
+def _tail_sums(values):
+    return np.vstack([np.zeros((1, values.shape[1])),
+                      values.cumsum(axis=0)])
+
+
+def _as_rolling_windows(data):
+    return data if isinstance(data, RollingWindows) else RollingWindows(data)
+
+
+def _as_frame(data):
+    return data.data if isinstance(data, RollingWindows) else data
+
+
+class PRMA_MULTI(BaseTechnicalFeature):
+    """
+    PRMA for a list of windows. Input can be a DataFrame or a
+    RollingWindows that is shared with other features. Returns a dict
+    of outputs by window.
+    """
+    def calculate_all_dates(self, data, windows):
+        data = _as_rolling_windows(data)
+        assert len(data.data) >= max(windows)
+        return {w: data.data / data.mean(w) for w in windows}
+
+    def calculate_last_date(self, data, windows):
+        if isinstance(data, LiveWindows):
+            return {w: data.bar / data.mean(w) for w in windows}
+        return _last_dates(PRMA(), _as_frame(data), windows)
+
+
+class VOL_MULTI(BaseTechnicalFeature):
+
+    def calculate_all_dates(self, data, windows):
+        data = _as_rolling_windows(data)
+        assert len(data.data) >= max(windows)
+        returns = data.derive('pct_change', _pct_change)
+        return {w: returns.std(w) for w in windows}
+
+    def calculate_last_date(self, data, windows):
+        if isinstance(data, LiveWindows):
+            returns = data.derive('pct_change', _pct_change,
+                                  _live_pct_change)
+            # As with `pct_change` of the trailing prices alone, returns
+            # up to their first price are left out
+            return {w: returns.std(data.pct_change_windows(w + 1))
+                    for w in windows}
+        return _last_dates(VOL(), _as_frame(data), windows)
+
+
+class DISCOUNT_MULTI(BaseTechnicalFeature):
+
+    def calculate_all_dates(self, data, windows):
+        data = _as_rolling_windows(data)
+        assert len(data.data) >= max(windows)
+        return {w: data.data / data.max(w) for w in windows}
+
+    def calculate_last_date(self, data, windows):
+        if isinstance(data, LiveWindows):
+            return {w: data.bar / data.max(w) for w in windows}
+        return _last_dates(DISCOUNT(), _as_frame(data), windows)
+
+
+class BOLL_MULTI(BaseTechnicalFeature):
+
+    def calculate_all_dates(self, data, windows):
+        data = _as_rolling_windows(data)
+        assert len(data.data) >= max(windows)
+        out = {}
+        for w in windows:
+            std_price = data.std(w, ddof=0)
+            out[w] = (data.data - (data.mean(w) - 2*std_price)) / \
+                (4*std_price)
+        return out
+
+    def calculate_last_date(self, data, windows):
+        if isinstance(data, LiveWindows):
+            out = {}
+            for w in windows:
+                std_price = data.std(w, ddof=0)
+                out[w] = (data.bar - (data.mean(w) - 2*std_price)) / \
+                    (4*std_price)
+            return out
+        return _last_dates(BOLL(), _as_frame(data), windows)
+
+
+class BOLL_SMOOTH_MULTI(BaseTechnicalFeature):
+
+    def calculate_all_dates(self, data, smooth, windows):
+        data = _as_rolling_windows(data)
+        assert len(data.data) >= max(windows)
+        assert smooth < min(windows)
+        out = {}
+        for w in windows:
+            std_price = data.std(w, ddof=0)
+            out[w] = (data.mean(smooth) - (data.mean(w) - 2*std_price)) / \
+                (4*std_price)
+        return out
+
+    def calculate_last_date(self, data, smooth, windows):
+        if isinstance(data, LiveWindows):
+            assert smooth < min(windows)
+            smooth_price = data.sum(smooth, skipna=False) / smooth
+            out = {}
+            for w in windows:
+                std_price = data.std(w, ddof=0)
+                out[w] = (smooth_price - (data.mean(w) - 2*std_price)) / \
+                    (4*std_price)
+            return out
+        feature = BOLL_SMOOTH()
+        data = _as_frame(data)
+        return {w: feature.calculate_last_date(data, smooth, w)
+                for w in windows}
+
+
+class RSI_MULTI(BaseTechnicalFeature):
+
+    def calculate_all_dates(self, data, windows):
+        data = _as_rolling_windows(data)
+        assert len(data.data) >= max(windows)
+        gains = data.derive('rsi_gain', _rsi_gains)
+        losses = data.derive('rsi_loss', _rsi_losses)
+        return {w: 100 - 100 / (1 + (gains.mean(w) / losses.mean(w)))
+                for w in windows}
+
+    def calculate_last_date(self, data, windows):
+        if isinstance(data, LiveWindows):
+            gains = data.derive('rsi_gain', _rsi_gains,
+                                lambda x: _gains(x.bar - x.last))
+            losses = data.derive('rsi_loss', _rsi_losses,
+                                 lambda x: _gains(x.last - x.bar))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return {w: 100 - 100 / (1 + (gains.sum(w) / losses.sum(w)))
+                        for w in windows}
+        return _last_dates(RSI(), _as_frame(data), windows)
+
+
+class MFI_MULTI(BaseTechnicalFeature):
+
+    def calculate_all_dates(self, high, low, close, volume, windows):
+        assert len(high) >= max(windows)
+        close = _as_frame(close)
+        typ_price = (high.values + low.values + close.values) / 3.
+        lag_typ_price = typ_price - _shift_diff(typ_price, 1)
+        raw_mf = typ_price * volume.values
+        with np.errstate(invalid='ignore'):
+            mf_pos = RollingWindows(_like(
+                np.where(typ_price > lag_typ_price, raw_mf, 0), high))
+            mf_neg = RollingWindows(_like(
+                np.where(typ_price < lag_typ_price, raw_mf, 0), high))
+        return {w: 100 - 100 / (1 + (mf_pos.sum(w) / mf_neg.sum(w)))
+                for w in windows}
+
+    def calculate_last_date(self, high, low, close, volume, windows):
+        close = _as_frame(close)
+        if isinstance(high, LiveWindows):
+            mf_pos, mf_neg = _live_money_flows(high, low, close, volume)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return {w: 100 - 100 / (1 + (mf_pos.sum(w, skipna=False) /
+                                             mf_neg.sum(w, skipna=False)))
+                        for w in windows}
+        feature = MFI()
+        return {w: feature.calculate_last_date(high, low, close, volume, w)
+                for w in windows}
+
+
+def _last_dates(feature, data, windows):
+    return {w: feature.calculate_last_date(data, w) for w in windows}
+
+
+def _like(values, frame):
+    return pd.DataFrame(values, index=frame.index, columns=frame.columns)
+
+
+def _shift_diff(values, n):
+    # Same as `DataFrame.diff(n)`, without per column overhead
+    out = np.full(values.shape, np.nan)
+    out[n:] = values[n:] - values[:-n]
+    return out
+
+
+def _gains(changes):
+    with np.errstate(invalid='ignore'):
+        return np.where(changes > 0, changes, 0)
+
+
+def _rsi_gains(data):
+    return _like(_gains(_shift_diff(data.values, 1)), data)
+
+
+def _rsi_losses(data):
+    return _like(_gains(-_shift_diff(data.values, 1)), data)
+
+
+def _live_pct_change(windows):
+    # Null bars are padded with the last price, as in `_pct_change`
+    bar = windows.bar.fillna(windows.last_valid)
+    return bar / windows.last_valid - 1
+
+
+def _live_money_flows(high, low, close, volume):
+    """
+    Positive and negative money flow LiveWindows. They are memoized on
+    `high`, so it should always come with the same low, close and volume.
+    As in MFI.calculate_last_date, null typical prices count as zero.
+    """
+    def typ_price(high, low, close):
+        return np.nan_to_num((high.values + low.values + close.values) / 3.)
+
+    def history_flows(sign):
+        def func(_):
+            typ = typ_price(high.history, low.history, close.history)
+            lag_typ = typ - _shift_diff(typ, 1)
+            return _like(_money_flows(typ, lag_typ, volume.history.values,
+                                      sign), high.history)
+        return func
+
+    def bar_flows(sign):
+        def func(_):
+            typ = typ_price(high.bar, low.bar, close.bar)
+            lag_typ = typ_price(high.last, low.last, close.last)
+            return _money_flows(typ, lag_typ, volume.bar.values, sign)
+        return func
+
+    return (high.derive('mf_pos', history_flows(1), bar_flows(1)),
+            high.derive('mf_neg', history_flows(-1), bar_flows(-1)))
+
+
+def _money_flows(typ_price, lag_typ_price, volume, sign):
+    with np.errstate(invalid='ignore'):
+        return (sign * typ_price > sign * lag_typ_price) * \
+            typ_price * volume
+
+
+def _pct_change(data):
+    """
+    Same as `DataFrame.pct_change()`: nulls are padded first, so only
+    leading nulls stay null
+    """
+    values = data.values.astype(float)
+    valid = ~np.isnan(values)
+    inds = np.where(valid, np.arange(len(values))[:, None], 0)
+    inds = np.maximum.accumulate(inds, axis=0)
+    padded = values[inds, np.arange(values.shape[1])]
+    padded[~np.maximum.accumulate(valid, axis=0)] = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = padded / (padded - _shift_diff(padded, 1)) - 1
+    return _like(out, data)
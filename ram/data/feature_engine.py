@@ -0,0 +1,304 @@
+import numpy as np
+import pandas as pd
+
+from ram.data.sql_features import clean_sql_cmd
+from ram.data.sql_features import parse_feature_args
+from ram.data.sql_features import get_date_padding
+from ram.data.sql_features import make_id_date_filter
+
+
+# Pricing table columns that can be pulled raw and computed on locally
+RAW_COLUMNS = [
+    'AdjOpen', 'AdjHigh', 'AdjLow', 'AdjClose', 'AdjVwap', 'AdjVolume',
+    'Open_', 'High', 'Low', 'Close_', 'Vwap', 'Volume', 'CashDividend',
+    'AvgDolVol', 'MarketCap', 'SplitFactor', 'DividendFactor'
+]
+
+# Columns read by functions that ignore their data column argument
+_FIXED_COLUMNS = {
+    'RSI': ['AdjClose'],
+    'MFI': ['AdjHigh', 'AdjLow', 'AdjClose', 'AdjVolume']
+}
+
+
+###############################################################################
+
+def is_local_feature(vstring):
+    """
+    True if the feature can be computed by this engine from raw pricing
+    columns. PRMAH, accounting, StarMine and other joined features are
+    left to the database.
+    """
+    try:
+        feature_args = parse_feature_args(vstring)
+    except Exception:
+        return False
+    func_name = feature_args['sql_func'].__name__
+    if func_name not in LOCAL_FUNCS:
+        return False
+    if func_name in _FIXED_COLUMNS:
+        return True
+    if feature_args['data_column'] not in RAW_COLUMNS:
+        return False
+    return (func_name == 'DATACOL') or \
+        (feature_args['sql_func_args'] is not None)
+
+
+def get_raw_columns(feature_args):
+    columns = []
+    for f in feature_args:
+        func_name = f['sql_func'].__name__
+        for c in _FIXED_COLUMNS.get(func_name, [f['data_column']]):
+            if c not in columns:
+                columns.append(c)
+    return columns
+
+
+def make_raw_sqlcmd(features, ids, start_date, end_date,
+                    table='ram.dbo.ram_equity_pricing', id_table=None):
+    """
+    Single query for the raw columns that `features` are computed from,
+    padded the same way as the SQL features so windows are fully formed
+    at the start date.
+
+    Returns
+    -------
+    sqlcmd : str
+    columns : list
+        Column names of the result set
+    """
+    feature_args = [parse_feature_args(f) for f in features]
+    raw_columns = get_raw_columns(feature_args)
+    filter_commands = make_id_date_filter(ids, start_date, end_date,
+                                          id_table,
+                                          get_date_padding(feature_args))
+    sqlcmd = \
+        """
+        select A.SecCode, A.Date_, {0} from {1} A
+        {2}
+        """.format(', '.join(['A.{}'.format(c) for c in raw_columns]),
+                   table, filter_commands)
+    return clean_sql_cmd(sqlcmd), ['SecCode', 'Date'] + raw_columns
+
+
+def compute_features(raw, features, start_date, end_date):
+    """
+    Computes features from raw pricing rows with the same semantics as
+    their SQL versions: row based windows per SecCode that are partial
+    at the start of the pull, nulls ignored by aggregates, and
+    PERCENT_RANK with nulls ranked first.
+
+    Parameters
+    ----------
+    raw : pandas.DataFrame
+        With columns SecCode, Date and the raw columns from
+        `make_raw_sqlcmd`
+    features : list
+    start_date/end_date : datetime
+        Range of the output, after shifts are applied
+
+    Returns
+    -------
+    data : pandas.DataFrame
+        With columns SecCode, Date and one column per feature
+    """
+    raw = raw.sort_values(['SecCode', 'Date']).reset_index(drop=True)
+    groups = _Groups(raw.SecCode.values)
+
+    output = raw[['SecCode', 'Date']].copy()
+    ranks = []
+    for vstring in features:
+        f = parse_feature_args(vstring)
+        func = LOCAL_FUNCS[f['sql_func'].__name__]
+        values = func(raw, groups, f['data_column'], f['sql_func_args'])
+        if f['shift']:
+            shift_n = f['shift'][1]
+            values = groups.shift(values, shift_n if f['shift'][0] == 'LAG'
+                                  else -shift_n)
+        output[vstring] = values
+        if f['rank']:
+            ranks.append(vstring)
+
+    output = output[(output.Date >= start_date) &
+                    (output.Date <= end_date)].reset_index(drop=True)
+    for vstring in ranks:
+        output[vstring] = percent_rank(output, vstring)
+    return output
+
+
+###############################################################################
+#  Rolling kernels. All functions share the interface
+#  (raw, groups, data_column, length_arg) and return an array aligned with
+#  the rows of `raw`.
+
+def DATACOL(raw, groups, data_column, length_arg):
+    return _values(raw, data_column)
+
+
+def MA(raw, groups, data_column, length_arg):
+    return groups.rolling(_values(raw, data_column), length_arg, 'mean')
+
+
+def PRMA(raw, groups, data_column, length_arg):
+    values = _values(raw, data_column)
+    return _divide(values, groups.rolling(values, length_arg, 'mean'))
+
+
+def MIN(raw, groups, data_column, length_arg):
+    return groups.rolling(_values(raw, data_column), length_arg, 'min')
+
+
+def MAX(raw, groups, data_column, length_arg):
+    return groups.rolling(_values(raw, data_column), length_arg, 'max')
+
+
+def DISCOUNT(raw, groups, data_column, length_arg):
+    values = _values(raw, data_column)
+    return -1 * (_divide(values, groups.rolling(values, length_arg,
+                                                'max')) - 1)
+
+
+def BOLL(raw, groups, data_column, length_arg):
+    values = _values(raw, data_column)
+    avg = groups.rolling(values, length_arg, 'mean')
+    std = groups.rolling(values, length_arg, 'std')
+    return _divide(values - (avg - 2 * std), 4 * std)
+
+
+def VOL(raw, groups, data_column, length_arg):
+    values = _values(raw, data_column)
+    returns = _divide(values, groups.shift(values, 1))
+    return groups.rolling(returns, length_arg, 'std')
+
+
+def RSI(raw, groups, data_column, length_arg):
+    values = _values(raw, 'AdjClose')
+    with np.errstate(invalid='ignore'):
+        change = values - groups.shift(values, 1)
+        up_move = np.where(change > 0, change, 0.)
+        down_move = np.where(change < 0, change, 0.)
+    up_move = groups.rolling(up_move, length_arg, 'sum')
+    down_move = groups.rolling(down_move, length_arg, 'sum')
+    return 100 * _divide(up_move, up_move - down_move)
+
+
+def MFI(raw, groups, data_column, length_arg):
+    typ_price = (_values(raw, 'AdjHigh') + _values(raw, 'AdjLow') +
+                 _values(raw, 'AdjClose')) / 3
+    lag_typ_price = groups.shift(typ_price, 1)
+    raw_mf = typ_price * _values(raw, 'AdjVolume')
+    with np.errstate(invalid='ignore'):
+        mon_flow_p = np.where(typ_price > lag_typ_price, raw_mf, 0.)
+        mon_flow = np.where(
+            np.isnan(lag_typ_price) |
+            (~np.isnan(typ_price) & (typ_price != lag_typ_price)),
+            raw_mf, 0.)
+    mon_flow_p = groups.rolling(mon_flow_p, length_arg, 'sum')
+    mon_flow = groups.rolling(mon_flow, length_arg, 'sum')
+    return _divide(mon_flow_p, mon_flow) * 100
+
+
+LOCAL_FUNCS = {
+    'DATACOL': DATACOL,
+    'MA': MA,
+    'PRMA': PRMA,
+    'MIN': MIN,
+    'MAX': MAX,
+    'DISCOUNT': DISCOUNT,
+    'BOLL': BOLL,
+    'VOL': VOL,
+    'RSI': RSI,
+    'MFI': MFI
+}
+
+
+###############################################################################
+
+class _Groups(object):
+
+    def __init__(self, seccodes):
+        """
+        Row positions of contiguous SecCode groups in sorted data
+        """
+        self._n_rows = len(seccodes)
+        starts = np.flatnonzero(np.r_[True, seccodes[1:] != seccodes[:-1]]) \
+            if self._n_rows else np.array([], dtype=int)
+        sizes = np.diff(np.r_[starts, self._n_rows])
+        self.group_index = np.repeat(np.arange(len(starts)), sizes)
+        self.position = np.arange(self._n_rows) - np.repeat(starts, sizes)
+
+    def shift(self, values, n):
+        """
+        Like SQL LAG(n) for positive n and LEAD(-n) for negative n,
+        within each SecCode.
+        """
+        out = np.full(self._n_rows, np.nan)
+        if n == 0:
+            return values.astype(float)
+        if n > 0:
+            valid = np.flatnonzero(self.position >= n)
+        else:
+            valid = np.flatnonzero(np.r_[
+                self.group_index[-n:] == self.group_index[:n],
+                np.zeros(-n, dtype=bool)][:self._n_rows])
+        out[valid] = values[valid - n]
+        return out
+
+    def rolling(self, values, length, method):
+        """
+        Trailing window of `length` rows within each SecCode. Groups are
+        laid out with `length - 1` empty rows between them, so a single
+        pandas rolling pass over the buffer never mixes SecCodes.
+        """
+        pad = length - 1
+        buff_index = np.arange(self._n_rows) + (self.group_index + 1) * pad
+        buff = np.full(self._n_rows + (self.group_index[-1] + 1) * pad
+                       if self._n_rows else 0, np.nan)
+        buff[buff_index] = values
+        # Sample stdev is null for a single row, as in SQL
+        min_periods = min(2, length) if method == 'std' else 1
+        roll = pd.Series(buff).rolling(length, min_periods=min_periods)
+        return getattr(roll, method)().values[buff_index]
+
+
+def _values(raw, column):
+    return raw[column].values.astype(float)
+
+
+def _divide(numerator, denominator):
+    # Division by zero is null, as with nullif in the SQL versions
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = numerator / denominator
+    out[~np.isfinite(out)] = np.nan
+    return out
+
+
+def unranked_feature(feature):
+    return '_'.join([x for x in feature.split('_') if x != 'RANK'])
+
+
+def rank_features(data, features):
+    """
+    Builds `features` from `data`, which holds their unranked versions.
+    RANK features are ranked across all SecCodes in `data`.
+
+    Returns
+    -------
+    data : pandas.DataFrame
+        With columns SecCode, Date and one column per feature
+    """
+    output = data[['SecCode', 'Date']].copy()
+    for f in features:
+        base = unranked_feature(f)
+        output[f] = percent_rank(data, base) if base != f else \
+            data[base].values
+    return output
+
+
+def percent_rank(data, column):
+    """
+    SQL Server PERCENT_RANK of `column` by Date, with nulls ranked first
+    """
+    rank = data.groupby('Date')[column].rank(method='min', na_option='top')
+    count = data.groupby('Date')[column].transform('size')
+    return ((rank - 1) / (count - 1)).where(count > 1, 0.).values
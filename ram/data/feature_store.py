@@ -0,0 +1,198 @@
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+import datetime as dt
+
+from ram.data.feature_engine import rank_features
+from ram.data.feature_engine import unranked_feature
+from ram.utils.read_write import atomic_write
+from ram.utils.time_funcs import check_input_date
+
+
+class FeatureStore(object):
+
+    def __init__(self, store_dir, features,
+                 table='ram.dbo.ram_equity_pricing'):
+        """
+        Local store of feature values by SecCode, so that overlapping
+        universe periods only query the (SecCode, date range) blocks
+        that have not been pulled before.
+
+        Values of a SecCode on a date don't depend on which universe it
+        is pulled with, except for RANK features. Those are stored
+        unranked and ranked across the universe when a period is
+        assembled. Stored values are not refreshed, so the store is
+        meant for historical builds, not live data.
+
+        Parameters
+        ----------
+        store_dir : str
+        features : list
+            Each distinct feature set and table gets its own store
+        table : str
+        """
+        self._features = features
+        self._base_features = []
+        for f in features:
+            base = unranked_feature(f)
+            if base not in self._base_features:
+                self._base_features.append(base)
+        key = hashlib.sha1(json.dumps(
+            [table] + sorted(self._base_features)).encode('utf-8'))
+        self._store_dir = os.path.join(store_dir, key.hexdigest()[:16])
+        if not os.path.isdir(self._store_dir):
+            os.makedirs(self._store_dir)
+        self._coverage_path = os.path.join(self._store_dir, 'coverage.json')
+        if os.path.isfile(self._coverage_path):
+            self._coverage = json.load(open(self._coverage_path, 'r'))
+        else:
+            self._coverage = {}
+        self._stats = {'queries': 0, 'queried_seccodes': 0}
+
+    # ~~~~~~ Interface ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def get_seccode_data(self, dh, seccodes, start_date, end_date):
+        """
+        Same output as `dh.get_seccode_data(seccodes, features, ...)`,
+        pulling only the blocks that are missing from the store.
+
+        Parameters
+        ----------
+        dh : DataHandlerSQL
+        seccodes : list
+        start_date/end_date : datetime
+        """
+        start_date = check_input_date(start_date)
+        end_date = check_input_date(end_date)
+        self.update(dh, seccodes, start_date, end_date)
+        data = [self._read(s) for s in seccodes]
+        data = [d[(d.Date >= start_date) & (d.Date <= end_date)]
+                for d in data if d is not None]
+        if data:
+            data = pd.concat(data, ignore_index=True)
+        else:
+            data = pd.DataFrame(columns=['SecCode', 'Date'] +
+                                self._base_features)
+        data = data.sort_values(['SecCode', 'Date']).reset_index(drop=True)
+        return rank_features(data, self._features)
+
+    def update(self, dh, seccodes, start_date, end_date):
+        """
+        Queries the date ranges of each SecCode missing from the store.
+        SecCodes missing the same range are pulled together.
+        """
+        blocks = {}
+        for s in seccodes:
+            for block in _missing_ranges(self._get_coverage(s),
+                                         start_date, end_date):
+                blocks.setdefault(block, []).append(s)
+        for (block_start, block_end), block_seccodes in \
+                sorted(blocks.items()):
+            data = dh.get_seccode_data(
+                block_seccodes, self._base_features,
+                _to_datetime(block_start), _to_datetime(block_end))
+            self._stats['queries'] += 1
+            self._stats['queried_seccodes'] += len(block_seccodes)
+            data = data.set_index('SecCode')
+            seccode_index = set(data.index)
+            for s in block_seccodes:
+                if s in seccode_index:
+                    self._write(s, data.loc[[s]].reset_index())
+                self._add_coverage(s, block_start, block_end)
+        if blocks:
+            self._save_coverage()
+
+    def get_stats(self):
+        return self._stats.copy()
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _path(self, seccode):
+        return os.path.join(self._store_dir, '{}.npz'.format(int(seccode)))
+
+    def _read(self, seccode):
+        path = self._path(seccode)
+        if not os.path.isfile(path):
+            return None
+        archive = np.load(path, allow_pickle=True)
+        data = pd.DataFrame({'Date': archive['Date']})
+        for i, f in enumerate(self._base_features):
+            data[f] = archive['c{}'.format(i)]
+        archive.close()
+        data.insert(0, 'SecCode', seccode)
+        return data
+
+    def _write(self, seccode, data):
+        stored = self._read(seccode)
+        if stored is not None:
+            data = pd.concat([stored, data], ignore_index=True)
+            data = data.drop_duplicates('Date', keep='last')
+        data = data.sort_values('Date')
+        arrays = {'Date': pd.to_datetime(data.Date).values}
+        for i, f in enumerate(self._base_features):
+            arrays['c{}'.format(i)] = data[f].values
+        with atomic_write(self._path(seccode)) as f:
+            np.savez_compressed(f, **arrays)
+
+    def _get_coverage(self, seccode):
+        return self._coverage.get(str(int(seccode)), [])
+
+    def _add_coverage(self, seccode, start_date, end_date):
+        self._coverage[str(int(seccode))] = _merge_ranges(
+            self._get_coverage(seccode) + [[start_date, end_date]])
+
+    def _save_coverage(self):
+        with atomic_write(self._coverage_path, 'w') as f:
+            json.dump(self._coverage, f)
+
+
+###############################################################################
+
+def _to_datetime(date_string):
+    return dt.datetime.strptime(date_string, '%Y-%m-%d')
+
+
+def _merge_ranges(ranges):
+    """
+    Merges overlapping and adjacent [start, end] date string ranges
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged:
+            next_day = _to_datetime(merged[-1][1]) + dt.timedelta(days=1)
+            if start <= next_day.strftime('%Y-%m-%d'):
+                merged[-1][1] = max(merged[-1][1], end)
+                continue
+        merged.append([start, end])
+    return merged
+
+
+def _missing_ranges(coverage, start_date, end_date):
+    """
+    Parts of [start_date, end_date] not in the merged `coverage` ranges
+
+    Returns
+    -------
+    ranges : list
+        Of (start, end) tuples of date strings
+    """
+    missing = []
+    current = start_date
+    for cov_start, cov_end in coverage:
+        cov_start = _to_datetime(cov_start)
+        cov_end = _to_datetime(cov_end)
+        if cov_end < current:
+            continue
+        if cov_start > end_date:
+            break
+        if cov_start > current:
+            missing.append((current, cov_start - dt.timedelta(days=1)))
+        current = cov_end + dt.timedelta(days=1)
+        if current > end_date:
+            break
+    if current <= end_date:
+        missing.append((current, end_date))
+    return [(s.strftime('%Y-%m-%d'), e.strftime('%Y-%m-%d'))
+            for s, e in missing]
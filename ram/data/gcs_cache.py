@@ -0,0 +1,233 @@
+import os
+import hashlib
+import threading
+from contextlib import contextmanager
+from multiprocessing.pool import ThreadPool
+
+from ram import config
+from ram.utils.read_write import atomic_write
+
+
+class GCSCache(object):
+
+    def __init__(self,
+                 cache_dir=config.GCS_CACHE_DIR,
+                 max_bytes=20 * 1024 ** 3,
+                 prefetch_workers=2):
+        """
+        Read-through local cache of Cloud Storage blobs. Entries are
+        keyed by the blob name and its generation, so an overwritten
+        blob is downloaded again while unchanged blobs are read from
+        disk across runs and processes.
+
+        Parameters
+        ----------
+        cache_dir : str
+        max_bytes : int
+            Least recently used entries are evicted above this size
+        prefetch_workers : int
+            Threads that download blobs passed to `prefetch`
+        """
+        self._cache_dir = cache_dir
+        self._max_bytes = max_bytes
+        self._prefetch_workers = prefetch_workers
+        self._pool = None
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._pins = {}
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0,
+                       'prefetches': 0}
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    # ~~~~~~ Interface ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def get_path(self, bucket, path):
+        """
+        Local path of the current version of the blob, downloading it
+        if it isn't cached. Raises IOError if the blob doesn't exist.
+
+        The entry can be evicted once this returns, so readers should
+        use `open_blob`.
+        """
+        cache_path = self._get_pinned_path(bucket, path)
+        self._unpin(cache_path)
+        return cache_path
+
+    @contextmanager
+    def open_blob(self, bucket, path):
+        """
+        Yields the cached file of the current version of the blob. The
+        entry is pinned against eviction until the file is open.
+        """
+        cache_path = self._get_pinned_path(bucket, path)
+        try:
+            f = open(cache_path, 'rb')
+        finally:
+            self._unpin(cache_path)
+        try:
+            yield f
+        finally:
+            f.close()
+
+    def download_as_string(self, bucket, path):
+        with self.open_blob(bucket, path) as f:
+            return f.read()
+
+    def prefetch(self, bucket, paths):
+        """
+        Downloads blobs in the background so later reads are local.
+        Blobs that are missing or fail are left to the reader.
+        """
+        if self._pool is None:
+            self._pool = ThreadPool(self._prefetch_workers)
+        for path in paths:
+            self._pool.apply_async(self._prefetch, (bucket, path))
+
+    def get_stats(self):
+        with self._lock:
+            stats = self._stats.copy()
+        entries = self._list_entries()
+        stats['entries'] = len(entries)
+        stats['bytes'] = sum([_file_size(os.path.join(self._cache_dir, f))
+                              for f in entries])
+        return stats
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _prefetch(self, bucket, path):
+        try:
+            self.get_path(bucket, path)
+            self._increment('prefetches')
+        except Exception:
+            pass
+
+    def _get_pinned_path(self, bucket, path):
+        blob = bucket.get_blob(path)
+        if blob is None:
+            raise IOError('Blob not found: {}'.format(path))
+        return self._get_blob_path(blob)
+
+    def _get_blob_path(self, blob):
+        """
+        Returns the cache path of the blob, pinned against eviction
+        until it is passed to `_unpin`
+        """
+        key = _make_key(blob)
+        cache_path = self._path(key)
+        # Only one thread downloads a blob; others wait for it
+        with self._lock:
+            event = self._pending.get(key)
+            if event is None:
+                if os.path.isfile(cache_path):
+                    self._stats['hits'] += 1
+                    self._pin(cache_path)
+                    # Mark as recently used
+                    os.utime(cache_path, None)
+                    return cache_path
+                self._stats['misses'] += 1
+                self._pending[key] = threading.Event()
+                self._pin(cache_path)
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            event.wait()
+            with self._lock:
+                if os.path.isfile(cache_path):
+                    self._stats['hits'] += 1
+                    self._pin(cache_path)
+                    return cache_path
+            return self._get_blob_path(blob)
+        try:
+            with atomic_write(cache_path) as f:
+                blob.download_to_file(f)
+            self._evict()
+        except:
+            self._unpin(cache_path)
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(key).set()
+        return cache_path
+
+    def _pin(self, cache_path):
+        # Called with the lock held
+        self._pins[cache_path] = self._pins.get(cache_path, 0) + 1
+
+    def _unpin(self, cache_path):
+        with self._lock:
+            self._pins[cache_path] -= 1
+            if self._pins[cache_path] == 0:
+                del self._pins[cache_path]
+
+    def _evict(self):
+        entries = []
+        for f in self._list_entries():
+            path = os.path.join(self._cache_dir, f)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        total_bytes = sum([e[1] for e in entries])
+        while entries and (total_bytes > self._max_bytes):
+            _, size, path = entries.pop(0)
+            # Entries being handed out are never evicted
+            with self._lock:
+                if path in self._pins:
+                    continue
+                _remove_quietly(path)
+                total_bytes -= size
+                self._stats['evictions'] += 1
+
+    def _list_entries(self):
+        return [f for f in os.listdir(self._cache_dir)
+                if f.endswith('.blob')]
+
+    def _path(self, key):
+        return os.path.join(self._cache_dir, '{}.blob'.format(key))
+
+    def _increment(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+
+###############################################################################
+
+_CACHE = []
+_CACHE_LOCK = threading.Lock()
+
+
+def get_gcs_cache():
+    """
+    Returns the process-wide cache, creating it the first time it is
+    requested.
+    """
+    with _CACHE_LOCK:
+        if not _CACHE:
+            _CACHE.append(GCSCache())
+        return _CACHE[0]
+
+
+def _make_key(blob):
+    version = blob.generation if blob.generation is not None else blob.etag
+    bucket_name = blob.bucket.name if blob.bucket is not None else ''
+    digest = hashlib.sha1('{}/{}#{}'.format(
+        bucket_name, blob.name, version).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,103 @@
+import time
+import threading
+
+
+class BucketCatalog(object):
+
+    def __init__(self, bucket, ttl=60):
+        """
+        Directory style listings of a Cloud Storage bucket. Each listing
+        is a prefix (and delimiter) query, so its cost grows with the
+        objects under the prefix rather than the whole bucket, and
+        results are reused for `ttl` seconds.
+
+        Parameters
+        ----------
+        bucket : google.cloud.storage.Bucket
+        ttl : float
+            Seconds a listing is reused before it is queried again
+        """
+        self._bucket = bucket
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._listings = {}
+        self._stats = {'queries': 0, 'hits': 0}
+
+    # ~~~~~~ Interface ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def list_dirs(self, prefix, refresh=False):
+        """
+        Sorted names of the directories directly under `prefix`
+        """
+        return self._get_listing(prefix, True, refresh)[1]
+
+    def list_files(self, prefix, recursive=True, refresh=False):
+        """
+        Sorted full names of the blobs under `prefix`, or only the ones
+        directly under it if not `recursive`
+        """
+        return self._get_listing(prefix, not recursive, refresh)[0]
+
+    def invalidate(self, prefix=None):
+        """
+        Drops listings of `prefix` and anything under it, or all
+        listings if no prefix is given.
+        """
+        prefix = _as_dir(prefix) if prefix else ''
+        with self._lock:
+            for key in self._listings.keys():
+                if key[0].startswith(prefix):
+                    del self._listings[key]
+
+    def get_stats(self):
+        with self._lock:
+            return self._stats.copy()
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _get_listing(self, prefix, delimited, refresh):
+        key = (_as_dir(prefix), delimited)
+        with self._lock:
+            listing = self._listings.get(key)
+            if (not refresh) and (listing is not None) and \
+                    (time.time() - listing[0] < self._ttl):
+                self._stats['hits'] += 1
+                return listing[1]
+        result = self._query(key[0], delimited)
+        with self._lock:
+            self._listings[key] = (time.time(), result)
+            self._stats['queries'] += 1
+        return result
+
+    def _query(self, prefix, delimited):
+        iterator = self._bucket.list_blobs(
+            prefix=prefix, delimiter='/' if delimited else None)
+        names = []
+        dirs = set()
+        # Directories are reported per page, so walk the pages
+        for page in iterator.pages:
+            names.extend([blob.name for blob in page])
+            dirs.update(page.prefixes)
+        dirs = [x[len(prefix):].rstrip('/') for x in dirs]
+        return sorted(names), sorted(dirs)
+
+
+###############################################################################
+
+_CATALOGS = {}
+_CATALOGS_LOCK = threading.Lock()
+
+
+def get_bucket_catalog(bucket):
+    """
+    Returns the process-wide catalog of the bucket, creating it the
+    first time it is requested.
+    """
+    with _CATALOGS_LOCK:
+        if bucket.name not in _CATALOGS:
+            _CATALOGS[bucket.name] = BucketCatalog(bucket)
+        return _CATALOGS[bucket.name]
+
+
+def _as_dir(prefix):
+    return prefix if prefix.endswith('/') else prefix + '/'
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+
+class DataPanel(object):
+
+    def __init__(self, data, fields, date_column='Date',
+                 seccode_column='SecCode'):
+        """
+        Pivots `fields` of a long SecCode/Date frame once into a single
+        float array, so feature and response code can share Date x
+        SecCode views instead of each pivoting the frame again.
+
+        Fields are the first axis of the array, so each field is a
+        contiguous (n_dates, n_seccodes) block. Dates and SecCodes are
+        sorted, and rows missing from the long frame are NaN, as with
+        `DataFrame.pivot`.
+
+        Parameters
+        ----------
+        data : pandas.DataFrame
+        fields : list
+            Numeric columns of `data`
+        date_column/seccode_column : str
+        """
+        date_codes, dates = pd.factorize(data[date_column], sort=True)
+        sec_codes, seccodes = pd.factorize(data[seccode_column], sort=True)
+        self.dates = pd.Index(dates, name='Date')
+        self.seccodes = pd.Index(seccodes, name='SecCode')
+        self.fields = list(fields)
+        self._field_index = {f: i for i, f in enumerate(self.fields)}
+        self._clean_values = {}
+
+        n_dates = len(self.dates)
+        n_seccodes = len(self.seccodes)
+        flat_index = date_codes * n_seccodes + sec_codes
+        if len(np.unique(flat_index)) < len(flat_index):
+            raise ValueError('Index contains duplicate entries, '
+                             'cannot reshape')
+        self._values = np.full((len(self.fields), n_dates, n_seccodes),
+                               np.nan)
+        for i, f in enumerate(self.fields):
+            self._values[i].flat[flat_index] = data[f].values
+
+    # ~~~~~~ Interface ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def get_values(self, field):
+        """
+        Date x SecCode array of `field`. This is a view into the panel,
+        so it should not be modified.
+        """
+        return self._values[self._field_index[field]]
+
+    def get_frame(self, field):
+        """
+        Same as `data.pivot(index='Date', columns='SecCode', values=field)`
+        but without copying the values.
+        """
+        return self._make_frame(self.get_values(field))
+
+    def get_clean_frame(self, field, lag=0):
+        """
+        Same as `clean_pivot_raw_data(data, field, lag)`. The lagged and
+        padded values are computed once per field and lag.
+        """
+        assert lag >= 0
+        key = (field, lag)
+        if key not in self._clean_values:
+            frame = self.get_frame(field).shift(lag)
+            # Allow to fill up to five days of missing data if there was a
+            # previous data point
+            frame = frame.fillna(method='pad', limit=5)
+            self._clean_values[key] = frame.values
+        return self._make_frame(self._clean_values[key])
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _make_frame(self, values):
+        return pd.DataFrame(values, index=self.dates, columns=self.seccodes,
+                            copy=False)
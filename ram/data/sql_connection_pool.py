@@ -0,0 +1,159 @@
+import time
+import threading
+from contextlib import contextmanager
+
+
+class SQLConnectionPool(object):
+
+    def __init__(self,
+                 connect_func,
+                 max_size=4,
+                 checkout_timeout=60,
+                 health_check_interval=60):
+        """
+        Bounded pool of database connections that are handed out to
+        callers and returned after each statement, so that a handshake
+        is only paid when a connection is first opened or found dead.
+
+        Parameters
+        ----------
+        connect_func : function
+            Returns a new open DB-API connection
+        max_size : int
+            Max number of open connections, idle and checked out
+        checkout_timeout : int
+            Seconds to wait for a free connection before raising
+        health_check_interval : int
+            Idle connections older than this many seconds are pinged
+            before they are handed out again
+        """
+        assert max_size > 0
+        self._connect_func = connect_func
+        self._max_size = max_size
+        self._checkout_timeout = checkout_timeout
+        self._health_check_interval = health_check_interval
+        self._condition = threading.Condition()
+        # LIFO stack of (connection, time checked in)
+        self._idle = []
+        self._open_count = 0
+        self._stats = {
+            'connects': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'reconnects': 0,
+            'discards': 0
+        }
+
+    # ~~~~~~ Interface ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def checkout(self):
+        with self._condition:
+            connection, last_used = self._reserve()
+            self._stats['checkouts'] += 1
+        if connection is None:
+            return self._open()
+        if not self._is_healthy(connection, last_used):
+            _close_quietly(connection)
+            with self._condition:
+                self._stats['reconnects'] += 1
+            return self._open()
+        return connection
+
+    def checkin(self, connection, discard=False):
+        with self._condition:
+            if discard:
+                self._stats['discards'] += 1
+                self._open_count -= 1
+            else:
+                self._idle.append((connection, time.time()))
+            self._condition.notify()
+        if discard:
+            _close_quietly(connection)
+
+    @contextmanager
+    def connection(self):
+        """
+        Checks out a connection and returns it when the block exits.
+        The connection is discarded if the block raises.
+        """
+        connection = self.checkout()
+        try:
+            yield connection
+        except:
+            self.checkin(connection, discard=True)
+            raise
+        self.checkin(connection)
+
+    def close_idle(self):
+        with self._condition:
+            idle = self._idle
+            self._idle = []
+            self._open_count -= len(idle)
+            self._condition.notify_all()
+        for connection, _ in idle:
+            _close_quietly(connection)
+
+    def get_stats(self):
+        with self._condition:
+            stats = self._stats.copy()
+            stats['idle'] = len(self._idle)
+            stats['open'] = self._open_count
+            stats['max_size'] = self._max_size
+        return stats
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _reserve(self):
+        """
+        Must be called holding the condition. Returns an idle connection,
+        or (None, None) if a slot was reserved for a new one.
+        """
+        deadline = time.time() + self._checkout_timeout
+        waited = False
+        while True:
+            if self._idle:
+                return self._idle.pop()
+            if self._open_count < self._max_size:
+                self._open_count += 1
+                return None, None
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise RuntimeError('Timed out waiting for SQL connection')
+            if not waited:
+                self._stats['waits'] += 1
+                waited = True
+            self._condition.wait(remaining)
+
+    def _open(self):
+        try:
+            connection = self._connect_func()
+        except:
+            # Release the reserved slot
+            with self._condition:
+                self._open_count -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._stats['connects'] += 1
+        return connection
+
+    def _is_healthy(self, connection, last_used):
+        if getattr(connection, 'connected', 1) != 1:
+            return False
+        if (time.time() - last_used) < self._health_check_interval:
+            return True
+        try:
+            cursor = connection.cursor()
+            cursor.execute('select 1')
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except:
+            return False
+
+
+def _close_quietly(connection):
+    try:
+        connection.close()
+    except:
+        pass
@@ -1,4 +1,5 @@
 import re
+import math
 import datetime as dt
 
 
@@ -70,19 +71,23 @@ FUNCS = [
 ###############################################################################
 
 def sqlcmd_from_feature_list(features, ids, start_date, end_date,
-                             table='ram.dbo.ram_equity_pricing'):
-    feature_data = []
-    for f in features:
-        feature_data.append(
-            parse_input_var(
-                f, table,
-                make_id_date_filter(ids, start_date, end_date)
-            )
-        )
-
-    column_commands, join_commands = make_commands(feature_data)
+                             table='ram.dbo.ram_equity_pricing',
+                             fuse=True, id_table=None):
+    feature_args = [parse_feature_args(f) for f in features]
+    filter_commands = make_id_date_filter(ids, start_date, end_date,
+                                          id_table,
+                                          get_date_padding(feature_args))
+
+    feature_data = [make_feature_data(a, table, filter_commands)
+                    for a in feature_args]
+    if fuse:
+        groups = compile_feature_groups(feature_args, feature_data,
+                                        table, filter_commands)
+    else:
+        groups = None
+
+    column_commands, join_commands = make_commands(feature_data, groups)
     final_select_commands = make_final_commands(feature_data)
-    filter_commands = make_id_date_filter(ids, start_date, end_date)
 
     # Combine everything
     sqlcmd = \
@@ -116,12 +121,24 @@ def make_final_commands(feature_data):
     return final_cmds
 
 
-def make_commands(feature_data):
+def make_commands(feature_data, groups=None):
+    """
+    Each group is a subquery joined once, that can return several
+    features. Without groups every feature gets its own subquery.
+    """
+    if groups is None:
+        groups = [{'sqlcmd': f['sqlcmd'], 'features': [f['feature_name']]}
+                  for f in feature_data]
+    aliases = {}
+    for i, g in enumerate(groups):
+        for feature_name in g['features']:
+            aliases[feature_name] = i
 
     col_cmds = ''
     join_cmds = ''
 
-    for i, f in enumerate(feature_data):
+    for f in feature_data:
+        i = aliases[f['feature_name']]
         if f['shift']:
             shift_cmd, shift_n = f['shift']
             col_cmds += \
@@ -136,45 +153,112 @@ def make_commands(feature_data):
                 , x{0}.{1}
                 """.format(i, f['feature_name'])
 
+    for i, g in enumerate(groups):
         join_cmds += \
             """
             left join ({0}) x{1}
                 on A.SecCode = x{1}.SecCode
                 and A.Date_ = x{1}.Date_
-            """.format(f['sqlcmd'], i)
+            """.format(g['sqlcmd'], i)
 
     return clean_sql_cmd(col_cmds), clean_sql_cmd(join_cmds)
 
 
-def make_id_date_filter(ids, start_date, end_date):
-    # First pull date ranges. Make this dynamic somehow?
-    sdate = start_date - dt.timedelta(days=365)
-    fdate = end_date + dt.timedelta(days=90)
+def make_id_date_filter(ids, start_date, end_date, id_table=None,
+                        padding=(365, 90)):
+    """
+    If `id_table` is given, the ids are assumed to be loaded in that
+    (temp) table's SecCode column and are not written into the filter.
+    `padding` is the calendar days pulled before start_date and after
+    end_date, see get_date_padding.
+    """
+    sdate = start_date - dt.timedelta(days=padding[0])
+    fdate = end_date + dt.timedelta(days=padding[1])
+    if id_table:
+        id_filter = '(select SecCode from {0})'.format(id_table)
+    else:
+        id_filter = format_ids(ids)
     sqlcmd = \
         """
         where A.Date_ between '{0}' and '{1}'
         and A.SecCode in {2}
-        """.format(sdate, fdate, format_ids(ids))
+        """.format(sdate, fdate, id_filter)
     return sqlcmd
 
 
+# Functions that compute over a trailing window of `length_arg` rows, and
+# the extra rows they need for a first difference or lagged price
+_WINDOW_FUNCS = {
+    'MA': 0, 'PRMA': 0, 'PRMAH': 0, 'MIN': 0, 'MAX': 0, 'DISCOUNT': 0,
+    'BOLL': 0, 'VOL': 1, 'RSI': 1, 'MFI': 1
+}
+
+# Padding allows for up to this share of a name's rows in the padded
+# span to be missing, for halts and thin pricing history
+_PADDING_MISSING_ROWS = 0.5
+
+# Calendar days added to any padding to cover holidays
+_PADDING_BUFFER_DAYS = 20
+
+
+def get_date_padding(feature_args):
+    """
+    Calendar days of data needed before the start date and after the end
+    date for the features to be fully formed over the requested range.
+    Window functions need their window length, plus one for those built
+    on changes. LAG/LEAD need N rows on top of that. Accounting,
+    StarMine and other as-of joins look their source tables up directly
+    for each date, so they need nothing beyond the date itself.
+
+    Returns
+    -------
+    padding : tuple
+        (lookback days, lead days)
+    """
+    lookback_rows = 0
+    lead_rows = 0
+    for f in feature_args:
+        rows = 0
+        func_name = f['sql_func'].__name__
+        if (func_name in _WINDOW_FUNCS) and f['sql_func_args']:
+            rows = f['sql_func_args'] + _WINDOW_FUNCS[func_name]
+        if f['shift'] and (f['shift'][0] == 'LAG'):
+            rows += f['shift'][1]
+        elif f['shift']:
+            lead_rows = max(lead_rows, f['shift'][1])
+        lookback_rows = max(lookback_rows, rows)
+    return _rows_to_days(lookback_rows), _rows_to_days(lead_rows)
+
+
+def _rows_to_days(rows):
+    # Seven calendar days per five trading days, for rows that are only
+    # partly present
+    return int(math.ceil(rows / (1 - _PADDING_MISSING_ROWS) * 7 / 5.)) + \
+        _PADDING_BUFFER_DAYS
+
+
 ###############################################################################
 
 def parse_input_var(vstring, table, filter_commands):
+    return make_feature_data(parse_feature_args(vstring), table,
+                             filter_commands)
 
-    # Return object that is used downstream per requested feature
+
+def parse_feature_args(vstring):
+    """
+    Splits a feature string into the registered function that makes its
+    SQL, the function's arguments, and the shift/rank modifiers.
+    """
     out = {
         'shift': False,
         'rank': False,
         'feature_name': vstring,
-        'sqlcmd': False
+        # Function used to generate SQL script
+        'sql_func': DATACOL,
+        'sql_func_args': None,
+        'data_column': None
     }
 
-    # Function used to generate SQL script
-    sql_func = DATACOL
-    sql_func_args = None
-    sql_func_data_column = None
-
     # Parse and iterate input args
     for arg in vstring.split('_'):
 
@@ -187,48 +271,315 @@ def parse_input_var(vstring, table, filter_commands):
             out['rank'] = True
 
         elif arg[0] in FUNCS:
-            sql_func = globals()[arg[0]]
+            out['sql_func'] = globals()[arg[0]]
             try:
-                sql_func_args = int(arg[1])
+                out['sql_func_args'] = int(arg[1])
             except:
-                sql_func_args = None
+                out['sql_func_args'] = None
 
         # Raw data
         elif arg[0] in ['ROpen', 'RHigh', 'RLow', 'RClose', 'RVwap',
                         'RVolume', 'RCashDividend']:
             arg[0] = arg[0][1:]
-            sql_func_data_column = arg[0]
+            out['data_column'] = arg[0]
             if arg[0] in ['Open', 'Close']:
-                sql_func_data_column += '_'
+                out['data_column'] += '_'
 
         # Data to be passed to a technical function
-        elif (sql_func != DATACOL) and \
+        elif (out['sql_func'] != DATACOL) and \
              (arg[0] in ['Open', 'High', 'Low', 'Close', 'Vwap', 'Volume']):
-            sql_func_data_column = 'Adj' + arg[0]
+            out['data_column'] = 'Adj' + arg[0]
 
         # Adjusted data
         elif arg[0] in ['AdjOpen', 'AdjHigh', 'AdjLow', 'AdjClose',
                         'AdjVwap', 'AdjVolume']:
-            sql_func_data_column = arg[0]
+            out['data_column'] = arg[0]
 
         # Adjustment irrelevant columns
         elif arg[0] in ['AvgDolVol', 'MarketCap',
                         'SplitFactor', 'DividendFactor']:
-            sql_func_data_column = arg[0]
+            out['data_column'] = arg[0]
 
         # IBES Estimate measures
         elif arg[0] in ibes_code_map.keys():
-            sql_func_data_column = arg[0]
+            out['data_column'] = arg[0]
 
         else:
             raise Exception('Input not properly formatted: {{ %s }}' % vstring)
 
-    out['sqlcmd'] = sql_func(sql_func_data_column, vstring,
-                             sql_func_args, table)
-    out['sqlcmd'] += filter_commands
+    return out
+
 
+def make_feature_data(feature_args, table, filter_commands):
+    # Return object that is used downstream per requested feature
+    out = {
+        'shift': feature_args['shift'],
+        'rank': feature_args['rank'],
+        'feature_name': feature_args['feature_name'],
+        'sqlcmd': False
+    }
+    out['sqlcmd'] = feature_args['sql_func'](
+        feature_args['data_column'], feature_args['feature_name'],
+        feature_args['sql_func_args'], table)
+    out['sqlcmd'] += filter_commands
     return out
 
+
+###############################################################################
+#  Fused subqueries. Features that read the same source table through the
+#  same joins are compiled into a single select with one expression each,
+#  so the source rows are only scanned once per group.
+
+_WINDOW = 'over (partition by SecCode order by Date_ ' + \
+    'rows between {0} preceding and current row)'
+
+_WINDOW_EXPRESSIONS = {
+    'DATACOL': '{col}',
+    'MA': 'avg({col}) {w}',
+    'PRMA': '{col} / avg({col}) {w}',
+    'MIN': 'min({col}) {w}',
+    'MAX': 'max({col}) {w}',
+    'DISCOUNT': '-1 * ({col} / max({col}) {w} - 1)',
+    'BOLL': '({col} - (avg({col}) {w} - 2 * stdev({col}) {w})) / '
+            'nullif((4 * stdev({col}) {w}), 0)',
+    'VOL': 'stdev({col} / LAG1_{col}) {w}',
+}
+
+_ACCOUNTING_ITEMS = {
+    'NETINCOMEQ': 'NETINCOMEQ',
+    'NETINCOMETTM': 'NETINCOMETTM',
+    'NETINCOMEGROWTHQ': 'NETINCOMEGROWTHQ',
+    'NETINCOMEGROWTHTTM': 'NETINCOMEGROWTHTTM',
+    'OPERATINGINCOMEQ': 'OPERATINGINCOMEQ',
+    'OPERATINGINCOMETTM': 'OPERATINGINCOMETTM',
+    'OPERATINGINCOMEGROWTHQ': 'OPERATINGINCOMEGROWTHQ',
+    'OPERATINGINCOMEGROWTHTTM': 'OPERATINGINCOMEGROWTHTTM',
+    'EBITQ': 'EBITQ',
+    'EBITTTM': 'EBITTTM',
+    'EBITGROWTHQ': 'EBITGROWTHQ',
+    'EBITGROWTHTTM': 'EBITGROWTHTTM',
+    'SALESQ': 'SALESQ',
+    'SALESTTM': 'SALESTTM',
+    'SALESGROWTHQ': 'SALESGROWTHQ',
+    'SALESGROWTHTTM': 'SALESGROWTHTTM',
+    'ADJEPSQ': 'ADJEPSQ',
+    'ADJEPSTTM': 'ADJEPSTTM',
+    'ADJEPSGROWTHQ': 'ADJEPSGROWTHQ',
+    'ADJEPSGROWTHTTM': 'ADJEPSGROWTHTTM',
+    'FREECASHFLOWQ': 'FREECASHFLOWQ',
+    'FREECASHFLOWTTM': 'FREECASHFLOWTTM',
+    'FREECASHFLOWGROWTHQ': 'FREECASHFLOWGROWTHQ',
+    'FREECASHFLOWGROWTHTTM': 'FREECASHFLOWGROWTHTTM',
+    'GROSSMARGINQ': 'X_GROSSMARGINQ',
+    'GROSSMARGINTTM': 'X_GROSSMARGINTTM',
+    'GROSSPROFASSET': 'X_GROSSPROFASSET',
+    'ASSETS': 'ASSETS',
+}
+
+_STARMINE_FIELDS = {
+    'ARM': ('ram.dbo.ram_starmine_arm', 'ARMScore'),
+    'ARMREVENUE': ('ram.dbo.ram_starmine_arm', 'ARMRevComp'),
+    'ARMRECS': ('ram.dbo.ram_starmine_arm', 'ARMRecsComp'),
+    'ARMEARNINGS': ('ram.dbo.ram_starmine_arm', 'ARMPrefErnComp'),
+    'ARMEXRECS': ('ram.dbo.ram_starmine_arm', 'ARMScoreExRecs'),
+    'SESPLITFACTOR': ('ram.dbo.ram_starmine_smart_estimate', 'SplitFactor'),
+    'EPSESTIMATEFQ': ('ram.dbo.ram_starmine_smart_estimate', 'SE_EPS_FQ{}'),
+    'EPSSURPRISEFQ': ('ram.dbo.ram_starmine_smart_estimate',
+                      'SE_EPS_Surprise_FQ{}'),
+    'EBITDAESTIMATEFQ': ('ram.dbo.ram_starmine_smart_estimate',
+                         'SE_EBITDA_FQ{}'),
+    'EBITDASURPRISEFQ': ('ram.dbo.ram_starmine_smart_estimate',
+                         'SE_EBITDA_Surprise_FQ{}'),
+    'REVENUEESTIMATEFQ': ('ram.dbo.ram_starmine_smart_estimate',
+                          'SE_REV_FQ{}'),
+    'REVENUESURPRISEFQ': ('ram.dbo.ram_starmine_smart_estimate',
+                          'SE_REV_Surprise_FQ{}'),
+    'SIRANK': ('ram.dbo.ram_starmine_short_interest', 'SI_Rank'),
+    'SIMARKETCAPRANK': ('ram.dbo.ram_starmine_short_interest',
+                        'SI_MarketCapRank'),
+    'SISECTORRANK': ('ram.dbo.ram_starmine_short_interest',
+                     'SI_SectorRank'),
+    'SIUNADJRANK': ('ram.dbo.ram_starmine_short_interest', 'SI_UnAdjRank'),
+    'SISHORTSQUEEZE': ('ram.dbo.ram_starmine_short_interest',
+                       'SI_ShortSqueeze'),
+    'SIINSTOWNERSHIP': ('ram.dbo.ram_starmine_short_interest',
+                        'SI_InstOwnership'),
+}
+
+
+def compile_feature_groups(feature_args, feature_data, table,
+                           filter_commands):
+    """
+    Groups features by source and join pattern. Groups with more than
+    one feature are compiled to a single fused subquery, everything else
+    keeps the subquery from make_feature_data.
+
+    Returns
+    -------
+    groups : list
+        Dicts with the subquery `sqlcmd` and the `features` it returns
+    """
+    keyed = {}
+    order = []
+    for args, data in zip(feature_args, feature_data):
+        key = _fusion_key(args)
+        if key is None:
+            key = ('SINGLE', args['feature_name'])
+        if key not in keyed:
+            keyed[key] = []
+            order.append(key)
+        keyed[key].append((args, data))
+
+    groups = []
+    for key in order:
+        members = keyed[key]
+        if (key[0] == 'SINGLE') or (len(members) == 1):
+            for _, data in members:
+                groups.append({'sqlcmd': data['sqlcmd'],
+                               'features': [data['feature_name']]})
+            continue
+        member_args = [m[0] for m in members]
+        if key[0] == 'WINDOW':
+            sqlcmd = _FUSED_WINDOW(member_args, table, filter_commands)
+        elif key[0] == 'ACCOUNTING':
+            sqlcmd = _FUSED_ACCOUNTING(member_args, table, filter_commands)
+        else:
+            sqlcmd = _FUSED_STARMINE(member_args, key[1], table,
+                                     filter_commands)
+        groups.append({'sqlcmd': sqlcmd,
+                       'features': [a['feature_name'] for a in member_args]})
+    return groups
+
+
+def _fusion_key(feature_args):
+    func_name = feature_args['sql_func'].__name__
+    if func_name in _WINDOW_EXPRESSIONS:
+        if feature_args['data_column'] is None:
+            return None
+        if (func_name != 'DATACOL') and \
+                (feature_args['sql_func_args'] is None):
+            return None
+        return ('WINDOW',)
+    if func_name in _ACCOUNTING_ITEMS:
+        return ('ACCOUNTING',)
+    if func_name in _STARMINE_FIELDS:
+        return ('STARMINE', _STARMINE_FIELDS[func_name][0])
+    return None
+
+
+def _FUSED_WINDOW(feature_args, table, filter_commands):
+    """
+    Window features of one table from a single scan. As in the per
+    feature queries, the BOLL windows and the lagged prices of VOL are
+    computed in an unfiltered inner select and the id/date filter is
+    applied to the outer select. The other windows start at the padded
+    start date, as in their single select per feature queries.
+    """
+    columns = []
+    lag_columns = []
+    inner_expressions = ''
+    expressions = ''
+    for f in feature_args:
+        func_name = f['sql_func'].__name__
+        col = f['data_column']
+        if col not in columns:
+            columns.append(col)
+        if (func_name == 'VOL') and (col not in lag_columns):
+            lag_columns.append(col)
+        window = _WINDOW.format(f['sql_func_args'] - 1) \
+            if f['sql_func_args'] else ''
+        expression = '{0} as {1} '.format(
+            _WINDOW_EXPRESSIONS[func_name].format(col=col, w=window),
+            f['feature_name'])
+        if func_name == 'BOLL':
+            inner_expressions += ', ' + expression
+            expressions += ', {0} '.format(f['feature_name'])
+        else:
+            expressions += ', ' + expression
+
+    inner_columns = ''.join([', {0}'.format(c) for c in columns])
+    for col in lag_columns:
+        inner_columns += \
+            """
+            , lag({0}, 1) over (
+                partition by SecCode
+                order by Date_) as LAG1_{0}
+            """.format(col)
+
+    sqlcmd = \
+        """
+        select SecCode, Date_ {0}
+        from (
+            select SecCode, Date_ {1} {2}
+            from {3}
+        ) A
+        {4}
+        """.format(expressions, inner_columns, inner_expressions, table,
+                   filter_commands)
+    return clean_sql_cmd(sqlcmd)
+
+
+def _FUSED_ACCOUNTING(feature_args, table, filter_commands):
+    items = []
+    expressions = ''
+    for f in feature_args:
+        item = _ACCOUNTING_ITEMS[f['sql_func'].__name__]
+        if item not in items:
+            items.append(item)
+        expressions += \
+            """
+            , max(case when B.ItemName = '{0}'
+                       then B.Value_ end) as {1}
+            """.format(item, f['feature_name'])
+
+    sqlcmd = \
+        """
+        select      A.SecCode,
+                    A.Date_
+                    {1}
+        from        {0} A
+        join        ram.dbo.ram_master_ids M
+            on      A.SecCode = M.SecCode
+            and     A.Date_ between M.StartDate and M.EndDate
+        left join   ram.dbo.ram_idccode_to_gvkey_map G
+            on      M.IdcCode = G.IdcCode
+            and     A.Date_ between G.StartDate and G.EndDate
+        left join   ram.dbo.ram_compustat_accounting_derived B
+            on      G.GVKey = B.GVKey
+            and     B.ItemName in {2}
+            and     B.AsOfDate = (select max(d.AsOfDate)
+                        from ram.dbo.ram_compustat_accounting_derived d
+                        where d.GVKey = G.GVKey and d.AsOfDate < A.Date_)
+        {3}
+        group by    A.SecCode, A.Date_
+        """.format(table, expressions, format_ids(items), filter_commands)
+    return clean_sql_cmd(sqlcmd)
+
+
+def _FUSED_STARMINE(feature_args, source_table, table, filter_commands):
+    expressions = ''
+    for f in feature_args:
+        field = _STARMINE_FIELDS[f['sql_func'].__name__][1]
+        field = field.format(f['sql_func_args'])
+        expressions += ', B.{0} as {1} '.format(field, f['feature_name'])
+
+    sqlcmd = \
+        """
+        select      A.SecCode,
+                    A.Date_
+                    {1}
+        from        {0} A
+        join        ram.dbo.ram_starmine_map M
+            on      A.SecCode = M.SecCode
+            and     A.Date_ between M.StartDate and M.EndDate
+        left join   {2} B
+            on      M.SecId = B.SecId
+            and     B.AsOfDate = A.Date_
+        {3}
+        """.format(table, expressions, source_table, filter_commands)
+    return clean_sql_cmd(sqlcmd)
+
+
 ###############################################################################
 #  NOTE: All feature functions must have the same interface
 
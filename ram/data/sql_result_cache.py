@@ -0,0 +1,164 @@
+import os
+import time
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+
+from ram import config
+from ram.utils.read_write import atomic_write
+
+
+class SQLResultCache(object):
+
+    def __init__(self,
+                 cache_dir=config.SQL_CACHE_DIR,
+                 max_bytes=20 * 1024 ** 3,
+                 max_entries=None):
+        """
+        On-disk cache of query results. Entries are keyed by the hash of
+        the final SQL text and the data-as-of stamp of the database, so
+        a table update makes every older entry unreachable. Frames are
+        stored column by column in compressed .npz files.
+
+        Parameters
+        ----------
+        cache_dir : str
+        max_bytes : int
+            Least recently used entries are evicted above this size
+        max_entries : int
+            Optional cap on the number of entries
+        """
+        self._cache_dir = cache_dir
+        self._max_bytes = max_bytes
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    # ~~~~~~ Interface ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def make_key(self, sqlcmd, data_as_of, seccodes=None):
+        """
+        Parameters
+        ----------
+        sqlcmd : str
+        data_as_of : datetime
+            Time of the last database table update
+        seccodes : list
+            SecCodes the statement reads from a temp table, if any,
+            since they are not part of the SQL text
+        """
+        digest = hashlib.sha1(sqlcmd.encode('utf-8'))
+        if seccodes is not None:
+            seccodes = sorted(set([int(x) for x in seccodes]))
+            digest.update(str(seccodes).encode('utf-8'))
+        return '{}_{}'.format(_as_of_tag(data_as_of), digest.hexdigest())
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            archive = np.load(path, allow_pickle=True)
+            columns = archive['__columns__'].tolist()
+            data = pd.DataFrame(
+                dict([(c, archive['c{}'.format(i)])
+                      for i, c in enumerate(columns)]),
+                columns=columns)
+            archive.close()
+            # Mark as recently used
+            os.utime(path, None)
+        except (IOError, OSError, KeyError, ValueError):
+            self._increment('misses')
+            return None
+        self._increment('hits')
+        return data
+
+    def put(self, key, data):
+        arrays = {'__columns__': np.array(data.columns.tolist(),
+                                          dtype=object)}
+        for i, c in enumerate(data.columns):
+            arrays['c{}'.format(i)] = data[c].values
+        with atomic_write(self._path(key)) as f:
+            np.savez_compressed(f, **arrays)
+        self._increment('writes')
+        self._evict()
+
+    def invalidate(self, data_as_of=None):
+        """
+        Deletes entries written against any other data-as-of stamp, or
+        everything if none is given.
+        """
+        tag = _as_of_tag(data_as_of) if data_as_of is not None else None
+        for f in self._list_entries():
+            if (tag is None) or (not f.startswith(tag + '_')):
+                _remove_quietly(os.path.join(self._cache_dir, f))
+
+    def get_stats(self):
+        with self._lock:
+            stats = self._stats.copy()
+        entries = self._list_entries()
+        stats['entries'] = len(entries)
+        stats['bytes'] = sum([_file_size(os.path.join(self._cache_dir, f))
+                              for f in entries])
+        return stats
+
+    def __getstate__(self):
+        # Locks can't be pickled; workers in other processes keep
+        # their own stats
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _evict(self):
+        entries = []
+        for f in self._list_entries():
+            path = os.path.join(self._cache_dir, f)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        total_bytes = sum([e[1] for e in entries])
+        max_entries = self._max_entries or len(entries)
+        while entries and ((total_bytes > self._max_bytes) or
+                           (len(entries) > max_entries)):
+            _, size, path = entries.pop(0)
+            _remove_quietly(path)
+            total_bytes -= size
+            self._increment('evictions')
+
+    def _list_entries(self):
+        return [f for f in os.listdir(self._cache_dir) if f.endswith('.npz')]
+
+    def _path(self, key):
+        return os.path.join(self._cache_dir, '{}.npz'.format(key))
+
+    def _increment(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+
+def _as_of_tag(data_as_of):
+    return pd.Timestamp(data_as_of).strftime('%Y%m%d%H%M%S')
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
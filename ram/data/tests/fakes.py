@@ -0,0 +1,120 @@
+"""
+In-memory stand-ins for database connections and Cloud Storage buckets,
+shared by the ram.data tests.
+"""
+
+
+class FakeCursor(object):
+
+    def __init__(self, connection=None, rows=None):
+        self._connection = connection
+        self._rows = rows if rows is not None else []
+
+    def execute(self, sqlcmd):
+        if not self._connection.alive:
+            raise Exception('Connection dropped')
+        self._connection.statements.append(sqlcmd)
+
+    def fetchall(self):
+        return self._connection.fetchall()
+
+    def fetchmany(self, n):
+        out, self._rows = self._rows[:n], self._rows[n:]
+        return out
+
+    def close(self):
+        pass
+
+
+class FakeConnection(object):
+
+    def __init__(self):
+        self.connected = 1
+        self.alive = True
+        self.closed = False
+        self.statements = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def fetchall(self):
+        # Rows returned for every statement
+        return [(1,)]
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+###############################################################################
+
+class FakeBucket(object):
+
+    name = 'test_bucket'
+
+    def __init__(self, names=None, page_size=2):
+        self.blobs = {}
+        self.downloads = []
+        self.calls = []
+        self.page_size = page_size
+        for name in (names or []):
+            self.upload(name, '')
+
+    def upload(self, path, content):
+        generation = self.blobs[path].generation + 1 \
+            if path in self.blobs else 1
+        self.blobs[path] = FakeBlob(self, path, content, generation)
+
+    def get_blob(self, path):
+        return self.blobs.get(path)
+
+    def list_blobs(self, prefix='', delimiter=None):
+        self.calls.append((prefix, delimiter))
+        names = sorted([x for x in self.blobs if x.startswith(prefix)])
+        blobs = []
+        prefixes = []
+        for name in names:
+            rest = name[len(prefix):]
+            if delimiter and (delimiter in rest):
+                prefix_ = prefix + rest.split(delimiter)[0] + delimiter
+                if prefix_ not in prefixes:
+                    prefixes.append(prefix_)
+            else:
+                blobs.append(self.blobs[name])
+        # Spread blobs and prefixes over several pages
+        pages = []
+        for i in range(0, max(len(blobs), len(prefixes)), self.page_size):
+            pages.append(FakePage(blobs[i:i + self.page_size],
+                                  set(prefixes[i:i + self.page_size])))
+        return FakeIterator(pages)
+
+
+class FakeBlob(object):
+
+    def __init__(self, bucket, name, content, generation):
+        self.bucket = bucket
+        self.name = name
+        self.content = content
+        self.generation = generation
+        self.etag = None
+
+    def download_to_file(self, f):
+        self.bucket.downloads.append(self.name)
+        if self.content is None:
+            raise IOError('Download failed')
+        f.write(self.content)
+
+
+class FakePage(list):
+
+    def __init__(self, blobs, prefixes):
+        super(FakePage, self).__init__(blobs)
+        self.prefixes = prefixes
+
+
+class FakeIterator(object):
+
+    def __init__(self, pages):
+        self.pages = iter(pages)
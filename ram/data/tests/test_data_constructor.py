@@ -2,8 +2,10 @@ import os
 import json
 import shutil
 import unittest
+import numpy as np
 import pandas as pd
 import datetime as dt
+from pandas.util.testing import assert_frame_equal
 
 from ram import config
 from ram.data.data_constructor import *
@@ -11,9 +13,19 @@ from ram.data.data_constructor import _get_versions
 from ram.data.data_constructor import _get_meta_data
 from ram.data.data_constructor import _get_max_test_dates_counts
 from ram.data.data_constructor import _get_strategy_version_stats
+from ram.data.data_constructor import _get_delta_start_date
+from ram.data.data_constructor import _same_adjustment
+from ram.data.data_constructor import _get_seccode_data_all_features
+from ram.data.data_constructor import _init_worker
+from ram.data.data_constructor import _has_dates
+from ram.data.data_constructor import _WORKER
 
 
 from ram.data.data_constructor_blueprint import DataConstructorBlueprint
+from ram.data.data_constructor_blueprint import \
+    DataConstructorBlueprintContainer
+from ram.utils.read_write import make_manifest_entry
+from ram.utils.read_write import update_manifest
 
 
 class TestDataConstructor(unittest.TestCase):
@@ -126,6 +138,128 @@ class TestDataConstructor(unittest.TestCase):
         benchmark = result[-2:]
         self.assertListEqual(result, benchmark)
 
+    def test_run_parallel(self):
+        # Don't execute on cloud instance
+        if config.GCP_CLOUD_IMPLEMENTATION:
+            return
+        blueprint = DataConstructorBlueprint('universe', 'Test description')
+        blueprint.universe_date_parameters['train_period_length'] = 1
+        DataConstructor(self.prepped_data_dir).run(blueprint)
+        DataConstructor(self.prepped_data_dir, n_workers=2).run(blueprint)
+        path = os.path.join(self.prepped_data_dir, 'GeneralOutput')
+        files1 = os.listdir(os.path.join(path, 'version_0001'))
+        files2 = os.listdir(os.path.join(path, 'version_0002'))
+        self.assertListEqual(sorted(files1), sorted(files2))
+        for f in [x for x in files1 if x.find('_data.csv') > -1]:
+            data1 = pd.read_csv(os.path.join(path, 'version_0001', f))
+            data2 = pd.read_csv(os.path.join(path, 'version_0002', f))
+            self.assertTrue(data1.equals(data2))
+        meta1 = json.load(open(os.path.join(path, 'version_0001',
+                                            'meta.json')))
+        meta2 = json.load(open(os.path.join(path, 'version_0002',
+                                            'meta.json')))
+        self.assertEqual(meta1['max_train_date'], meta2['max_train_date'])
+        self.assertListEqual(meta1['newly_created_files'],
+                             meta2['newly_created_files'])
+
+    def test_run_container(self):
+        # Don't execute on cloud instance
+        if config.GCP_CLOUD_IMPLEMENTATION:
+            return
+        container = DataConstructorBlueprintContainer()
+        blueprint = DataConstructorBlueprint('universe', 'Test description')
+        blueprint.universe_date_parameters['train_period_length'] = 1
+        blueprint.features = ['AdjClose', 'RANK_PRMA10_AdjClose']
+        container.add_blueprint(blueprint)
+        blueprint = DataConstructorBlueprint('universe', 'Test description')
+        blueprint.universe_date_parameters['train_period_length'] = 1
+        blueprint.universe_filter_arguments['where'] = \
+            'MarketCap >= 1000 and Close_ between 15 and 1000'
+        blueprint.features = ['PRMA10_AdjClose', 'RANK_AdjClose']
+        container.add_blueprint(blueprint)
+        DataConstructor(self.prepped_data_dir).run_container(container)
+        # Same output as separate runs
+        for blueprint in container.get_blueprints():
+            DataConstructor(self.prepped_data_dir).run(blueprint)
+        path = os.path.join(self.prepped_data_dir, 'GeneralOutput')
+        for v1, v2 in [('version_0001', 'version_0003'),
+                       ('version_0002', 'version_0004')]:
+            files1 = os.listdir(os.path.join(path, v1))
+            files2 = os.listdir(os.path.join(path, v2))
+            self.assertListEqual(sorted(files1), sorted(files2))
+            for f in [x for x in files1 if x.find('_data.csv') > -1]:
+                data1 = pd.read_csv(os.path.join(path, v1, f))
+                data2 = pd.read_csv(os.path.join(path, v2, f))
+                assert_frame_equal(data1, data2)
+
+    def test_has_dates(self):
+        path = os.path.join(self.prepped_data_dir, 'GeneralOutput')
+        os.makedirs(path)
+        data = pd.DataFrame({
+            'SecCode': [10, 10, 10],
+            'Date': pd.to_datetime(['2010-01-04', '2010-01-05',
+                                    '2010-01-07']),
+            'V1': [1, 2, 3.]})
+        data.to_csv(os.path.join(path, '20100101_data.csv'), index=False)
+        entry = make_manifest_entry(
+            data, os.path.join(path, '20100101_data.csv'))
+        dates = np.array([dt.datetime(2010, 1, 4), dt.datetime(2010, 1, 5),
+                          dt.datetime(2010, 1, 6), dt.datetime(2010, 1, 7)])
+        # Missing interior date within the file's min and max date
+        self.assertFalse(_has_dates(path, '20100101_data.csv', entry, dates))
+        self.assertTrue(_has_dates(path, '20100101_data.csv', entry,
+                                   dates[[0, 1, 3]]))
+        # Entries without dates are answered from the file
+        entry.pop('dates')
+        self.assertFalse(_has_dates(path, '20100101_data.csv', entry, dates))
+        self.assertTrue(_has_dates(path, '20100101_data.csv', entry,
+                                   dates[[0, 1, 3]]))
+
+    def test_init_worker(self):
+        # Thread workers hand their handlers back to be closed
+        handlers = []
+        _init_worker(None, handlers)
+        self.assertEqual(len(handlers), 1)
+        self.assertIs(handlers[0], _WORKER.dh)
+        handlers[0].close_connections()
+
+    def test_run_container_options(self):
+        container = DataConstructorBlueprintContainer()
+        for i in range(2):
+            container.add_blueprint(
+                DataConstructorBlueprint('universe', 'Test description'))
+        # Fused pulls don't support workers, so blueprints run on their own
+        dc = DataConstructor(self.prepped_data_dir, n_workers=2)
+        runs = []
+        dc.run = runs.append
+        dc.run_container(container)
+        self.assertListEqual(runs, container.get_blueprints())
+
+    def test_get_seccode_data_all_features(self):
+        class FakeDataHandler(object):
+            def __init__(self):
+                self.batches = []
+
+            def get_seccode_data(self, seccodes, features, start_date,
+                                 end_date):
+                self.batches.append(features)
+                data = pd.DataFrame({'SecCode': [10, 20],
+                                     'Date': [start_date] * 2})
+                for f in features:
+                    data[f] = 1.
+                return data
+        dh = FakeDataHandler()
+        features = ['V{}'.format(i) for i in range(
+            MAX_SECCODE_DATA_FEATURES + 5)]
+        result = _get_seccode_data_all_features(
+            dh, [10, 20], features, dt.datetime(2010, 1, 1),
+            dt.datetime(2010, 2, 1))
+        self.assertListEqual([len(x) for x in dh.batches],
+                             [MAX_SECCODE_DATA_FEATURES, 5])
+        self.assertListEqual(result.columns.tolist(),
+                             ['Date', 'SecCode'] + features)
+        self.assertEqual(len(result), 2)
+
     def test_run_market_data(self):
         # Don't execute on cloud instance
         if config.GCP_CLOUD_IMPLEMENTATION:
@@ -185,6 +319,20 @@ class TestDataConstructor(unittest.TestCase):
         self.assertEqual(result[0], 'No Files')
         self.assertEqual(result[1], 'No Files')
         self.assertEqual(result[2], 0)
+        # Answered from manifest without opening files
+        df.Date = pd.to_datetime(df.Date)
+        path = os.path.join(self.prepped_data_dir, 'GeneralOutput',
+                            'version_0002')
+        df.to_csv(os.path.join(path, '20111010_data.csv'))
+        update_manifest(path, [make_manifest_entry(
+            df, os.path.join(path, '20111010_data.csv'))])
+        os.remove(os.path.join(path, '20111010_data.csv'))
+        result = _get_max_test_dates_counts(self.prepped_data_dir,
+                                            'GeneralOutput',
+                                            'version_0002')
+        self.assertEqual(result[0], '20111010')
+        self.assertEqual(result[1], '2010-01-04')
+        self.assertEqual(result[2], 1)
         result = _get_strategy_version_stats('GeneralOutput',
                                              self.prepped_data_dir)
         print_data_versions('GeneralOutput',
@@ -201,6 +349,76 @@ class TestDataConstructor(unittest.TestCase):
         dc.run_live(blueprint)
         self.assertTrue(os.path.isfile(os.path.join(path, 'asdf.csv')))
 
+    def test_get_previous_live_data(self):
+        path = self.implementation_data_dir
+        data = pd.DataFrame({
+            'SecCode': ['10', '10', '10'],
+            'Date': [dt.datetime(2017, 1, 3), dt.datetime(2017, 1, 31),
+                     dt.datetime(2017, 2, 1)],
+            'V1': [1, 2, 3],
+            'TestFlag': [False, False, True]})
+        data.to_csv(os.path.join(path, '20170202_version_0001.csv'),
+                    index=None)
+        blueprint = DataConstructorBlueprint('universe', 'Test')
+        blueprint.output_file_dir = path
+        dc = DataConstructor()
+        dc._init_run_live(blueprint, '20170202_version_0001.csv')
+        result = dc._get_previous_live_data(dt.date(2017, 1, 1),
+                                            dt.date(2017, 1, 31))
+        self.assertListEqual(result.V1.tolist(), [1, 2, 3])
+        self.assertFalse('TestFlag' in result)
+        # New universe
+        result = dc._get_previous_live_data(dt.date(2017, 2, 1),
+                                            dt.date(2017, 2, 28))
+        self.assertIsNone(result)
+        result = dc._get_previous_live_data(dt.date(2017, 1, 1),
+                                            dt.date(2017, 2, 28))
+        self.assertIsNone(result)
+        dc._init_run_live(blueprint)
+        result = dc._get_previous_live_data(dt.date(2017, 1, 1),
+                                            dt.date(2017, 1, 31))
+        self.assertIsNone(result)
+
+    def test_get_delta_start_date(self):
+        data = pd.DataFrame({
+            'SecCode': ['10', '10', '10', '20'],
+            'Date': [dt.datetime(2017, 1, 3), dt.datetime(2017, 1, 4),
+                     dt.datetime(2017, 1, 5), dt.datetime(2017, 1, 5)]})
+        # Last complete date is pulled again to check the adjustment
+        result = _get_delta_start_date(data, ['AdjClose', 'PRMA10_AdjClose'])
+        self.assertEqual(result, dt.datetime(2017, 1, 5))
+        result = _get_delta_start_date(data, ['AdjClose',
+                                              'LEAD1_AdjClose'])
+        self.assertEqual(result, dt.datetime(2017, 1, 4))
+        result = _get_delta_start_date(data, ['LEAD2_AdjClose'])
+        self.assertEqual(result, dt.datetime(2017, 1, 3))
+        result = _get_delta_start_date(data, ['LEAD3_AdjClose'])
+        self.assertIsNone(result)
+        self.assertIsNone(_get_delta_start_date(None, ['AdjClose']))
+
+    def test_same_adjustment(self):
+        previous = pd.DataFrame({
+            'SecCode': ['10', '10', '20', '20'],
+            'Date': pd.to_datetime(['2017-01-04', '2017-01-05'] * 2),
+            'AdjClose': [10., 11., 20., np.nan],
+            'PRMA10_AdjClose': [1., 1.1, 0.9, 1.],
+            'MarketCap': [100., 110., 200., 210.]})
+        delta = pd.DataFrame({
+            'SecCode': ['10', '20', '10'],
+            'Date': [dt.date(2017, 1, 5), dt.date(2017, 1, 5),
+                     dt.date(2017, 1, 6)],
+            'AdjClose': [11., np.nan, 12.],
+            'PRMA10_AdjClose': [1.1, 1., 1.2],
+            'MarketCap': [111., 211., 120.]})
+        overlap_date = dt.datetime(2017, 1, 5)
+        self.assertTrue(_same_adjustment(previous, delta, overlap_date))
+        # Split after the previous file rescales the adjusted history
+        delta.loc[delta.SecCode == '10', 'AdjClose'] /= 2
+        self.assertFalse(_same_adjustment(previous, delta, overlap_date))
+        # Missing SecCode on the overlap date
+        delta = delta[delta.SecCode == '20']
+        self.assertFalse(_same_adjustment(previous, delta, overlap_date))
+
     def test_make_implementation_dates(self):
         dc = DataConstructor(self.prepped_data_dir)
         blueprint = DataConstructorBlueprint('universe', 'Test description')
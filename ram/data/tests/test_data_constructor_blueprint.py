@@ -32,6 +32,7 @@ class TestDataConstructorBlueprint(unittest.TestCase):
         self.assertEqual(dcb.universe_date_parameters['test_period_length'], 1)
         self.assertFalse(hasattr(dcb, 'market_data_params'))
         self.assertEqual(dcb.output_dir_name, 'GeneralOutput')
+        self.assertEqual(dcb.output_file_format, 'csv')
         #
         dcb = DataConstructorBlueprint('universe', 'Test description',
                                        market_data_flag=True)
@@ -67,12 +68,21 @@ class TestDataConstructorBlueprint(unittest.TestCase):
         bp = container.get_blueprint_by_name_or_index('blueprint_0002')
         bp = container.get_blueprint_by_name_or_index(0)
         bp = container.get_blueprint_by_name_or_index('0')
+        dcb2 = DataConstructorBlueprint('etfs', 'Test description')
+        container.add_blueprint(dcb2)
+        result = container.get_blueprints()
+        self.assertEqual(len(result), 3)
+        self.assertEqual(result[2], dcb2)
 
     def test_to_from_json(self):
         dcb = DataConstructorBlueprint('universe', 'Test')
         result = dcb.to_json()
         dcb2 = DataConstructorBlueprint(blueprint_json=result)
         self.assertDictEqual(result, dcb2.to_json())
+        # Blueprints written before output formats default to csv
+        result.pop('output_file_format')
+        dcb2 = DataConstructorBlueprint(blueprint_json=result)
+        self.assertEqual(dcb2.to_json()['output_file_format'], 'csv')
 
     def tearDown(self):
         pass
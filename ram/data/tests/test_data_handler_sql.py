@@ -1,12 +1,23 @@
 
+import shutil
+import decimal
 import unittest
+import tempfile
 import numpy as np
 import pandas as pd
 import datetime as dt
 from numpy.testing import assert_array_equal
+from pandas.util.testing import assert_frame_equal
 
 from ram.data.data_handler_sql import DataHandlerSQL
 from ram.data.data_handler_sql import _check_for_duplicates
+from ram.data.data_handler_sql import _fetch_columnar
+from ram.data.data_handler_sql import _align_batches
+from ram.data.data_handler_sql import make_temp_seccode_table_cmds
+from ram.data.sql_connection_pool import SQLConnectionPool
+from ram.data.sql_result_cache import SQLResultCache
+from ram.data.tests.fakes import FakeConnection
+from ram.data.tests.fakes import FakeCursor
 
 
 class TestDataHandlerSQL(unittest.TestCase):
@@ -44,6 +55,152 @@ class TestDataHandlerSQL(unittest.TestCase):
         self.assertRaises(ValueError, _check_for_duplicates, test_df,
                           ['SecCode', 'Date'])
 
+    def test_fetch_columnar(self):
+        rows = [(i, dt.datetime(2010, 1, i+1),
+                 decimal.Decimal('1.5') if i % 2 else None,
+                 'ABC' if i < 3 else None) for i in range(5)]
+        result = _fetch_columnar(FakeCursor(rows=rows),
+                                 ['SecCode', 'Date', 'V1', 'V2'], 2)
+        self.assertEqual(result.SecCode.dtype, np.int64)
+        self.assertEqual(result.Date.dtype, np.dtype('datetime64[ns]'))
+        self.assertEqual(result.V1.dtype, np.float64)
+        self.assertEqual(result.V2.dtype, object)
+        assert_array_equal(result.SecCode, range(5))
+        self.assertEqual(result.Date.iloc[4], pd.Timestamp('2010-01-05'))
+        assert_array_equal(result.V1, [np.nan, 1.5, np.nan, 1.5, np.nan])
+        assert_array_equal(result.V2, ['ABC'] * 3 + [None] * 2)
+        result = _fetch_columnar(FakeCursor(rows=[]), ['SecCode', 'Date'], 2)
+        self.assertListEqual(result.columns.tolist(), ['SecCode', 'Date'])
+        self.assertEqual(len(result), 0)
+
+    def test_align_batches(self):
+        batch1 = pd.DataFrame({
+            'SecCode': [2, 1, 1],
+            'Date': pd.to_datetime(['2010-01-02', '2010-01-01',
+                                    '2010-01-02']),
+            'V1': [1., 2., 3.]}).set_index(['SecCode', 'Date'])
+        batch2 = pd.DataFrame({
+            'SecCode': [1, 3],
+            'Date': pd.to_datetime(['2010-01-01', '2010-01-01']),
+            'V2': [5., 6.]}).set_index(['SecCode', 'Date'])
+        result = _align_batches([batch1, batch2])
+        self.assertListEqual(result.columns.tolist(),
+                             ['SecCode', 'Date', 'V1', 'V2'])
+        assert_array_equal(result.SecCode, [1, 1, 2, 3])
+        assert_array_equal(result.V1, [2, 3, 1, np.nan])
+        assert_array_equal(result.V2, [5, np.nan, np.nan, 6])
+        result = _align_batches([])
+        self.assertListEqual(result.columns.tolist(), ['SecCode', 'Date'])
+
+    def test_make_temp_seccode_table_cmds(self):
+        result = make_temp_seccode_table_cmds(range(2500), '#ABC')
+        self.assertEqual(len(result), 5)
+        self.assertEqual(result[1],
+                         'create table #ABC (SecCode int primary key);')
+        self.assertTrue(result[2].startswith(
+            'insert into #ABC values (0), (1)'))
+        self.assertTrue(result[4].endswith('(2499);'))
+
+    def test_temp_table_filter(self):
+        connection = FakeConnection()
+        pool = SQLConnectionPool(lambda: connection, max_size=1)
+        dh = DataHandlerSQL(pool=pool, seccode_filter='temp_table')
+        dh.sql_execute('select 1', False, temp_seccodes=[3, 1, 2])
+        self.assertEqual(len(connection.statements), 4)
+        self.assertEqual(connection.statements[2],
+                         'insert into #ram_seccodes values (1), (2), (3);')
+        # Same universe is not reloaded
+        dh.sql_execute('select 2', False, temp_seccodes=[1, 2, 3])
+        self.assertEqual(len(connection.statements), 5)
+        dh.sql_execute('select 3', False, temp_seccodes=[1, 2])
+        self.assertEqual(len(connection.statements), 9)
+
+    def test_local_feature_engine(self):
+        # SQL versions are the reference for locally computed features
+        features = ['AdjClose', 'MA10_AdjClose', 'PRMA10_AdjClose',
+                    'VOL10_AdjClose', 'BOLL10_AdjClose', 'DISCOUNT10_AdjClose',
+                    'MIN10_AdjClose', 'MAX10_AdjClose', 'RSI10_AdjClose',
+                    'MFI10_AdjClose', 'LAG1_PRMA5_AdjClose',
+                    'RANK_PRMA5_AdjClose', 'GSECTOR']
+        args = ([4760, 78331, 58973], features, '2015-01-01', '2015-06-30')
+        benchmark = self.dh.get_seccode_data(*args)
+        dh = DataHandlerSQL(feature_engine='local')
+        result = dh.get_seccode_data(*args)
+        self.assertListEqual(result.columns.tolist(),
+                             benchmark.columns.tolist())
+        assert_frame_equal(result[features[:-1]].astype(float),
+                           benchmark[features[:-1]].astype(float),
+                           check_less_precise=True)
+
+    def test_get_filtered_seccodes_batch(self):
+        connection = FakeConnection()
+        connection.fetchall = lambda: [
+            (dt.date(2010, 1, 31), 30), (dt.date(2010, 1, 31), 10),
+            (dt.date(2010, 2, 28), 20)]
+        pool = SQLConnectionPool(lambda: connection, max_size=1)
+        dh = DataHandlerSQL(pool=pool)
+        filter_dates = [dt.datetime(2010, 1, 31), dt.datetime(2010, 2, 28),
+                        dt.datetime(2010, 3, 31)]
+        result = dh.get_filtered_seccodes_batch(
+            filter_dates, {'univ_size': 2, 'where': 'MarketCap >= 200'})
+        self.assertEqual(len(connection.statements), 1)
+        self.assertIn("('2010-01-31'), ('2010-02-28'), ('2010-03-31')",
+                      connection.statements[0])
+        self.assertIn('PARTITION BY F.RequestDate, ID.Issuer',
+                      connection.statements[0])
+        assert_array_equal(result[filter_dates[0]], [30, 10])
+        assert_array_equal(result[filter_dates[1]], [20])
+        self.assertEqual(len(result[filter_dates[2]]), 0)
+        # Failed query raises instead of returning empty universes
+        connection.fetchall = lambda: None
+        self.assertRaises(IOError, dh.get_filtered_seccodes_batch,
+                          filter_dates, {'univ_size': 2})
+
+    def test_result_cache(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            cache = SQLResultCache(cache_dir)
+            connection = FakeConnection()
+            pool = SQLConnectionPool(lambda: connection, max_size=1)
+            dh = DataHandlerSQL(pool=pool, stream_fetch=False, cache=cache)
+            # FakeConnection returns 1 for the table monitor stamp
+            data = pd.DataFrame({'SecCode': [10], 'V1': [2.0]},
+                                columns=['SecCode', 'V1'])
+            cache.put(cache.make_key('select 2', 1), data)
+            result = dh._execute_to_frame('select 2', ['SecCode', 'V1'])
+            self.assertEqual(result.V1.iloc[0], 2.0)
+            self.assertEqual(len(connection.statements), 1)
+            self.assertEqual(dh.get_cache_stats()['hits'], 1)
+            # Miss goes to the database and is written back
+            result = dh._execute_to_frame('select 3', ['V1'])
+            self.assertEqual(len(connection.statements), 2)
+            self.assertEqual(dh.get_cache_stats()['writes'], 2)
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_result_cache_without_stamp(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            cache = SQLResultCache(cache_dir)
+            data = pd.DataFrame({'V1': [2.0]})
+            cache.put(cache.make_key('select 2', 1), data)
+            connection = FakeConnection()
+            # Table monitor can't be read
+            connection.fetchall = lambda: [(None,)]
+            pool = SQLConnectionPool(lambda: connection, max_size=1)
+            dh = DataHandlerSQL(pool=pool, stream_fetch=False, cache=cache)
+            self.assertIsNone(dh.get_data_as_of())
+            result = dh._execute_to_frame('select 2', ['V1'])
+            self.assertTrue(result.V1.isnull().all())
+            # Cache is neither invalidated, read, nor written
+            stats = dh.get_cache_stats()
+            self.assertEqual(stats['entries'], 1)
+            self.assertEqual(stats['hits'] + stats['misses'], 0)
+            self.assertEqual(stats['writes'], 1)
+            assert_frame_equal(cache.get(cache.make_key('select 2', 1)), data)
+        finally:
+            shutil.rmtree(cache_dir)
+
     def tearDown(self):
         pass
 
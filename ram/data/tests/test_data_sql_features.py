@@ -2,6 +2,7 @@ import unittest
 import datetime as dt
 
 from ram.data.sql_features import *
+from ram.data.sql_features import _FUSED_WINDOW
 
 
 class TestSqlFeatures(unittest.TestCase):
@@ -52,6 +53,98 @@ class TestSqlFeatures(unittest.TestCase):
         }
         self.assertDictEqual(result, benchmark)
 
+    def test_compile_feature_groups(self):
+        features = ['PRMA10_AdjClose', 'LAG1_VOL10_AdjClose', 'GSECTOR',
+                    'BOLL20_AdjClose', 'SALESQ', 'NETINCOMETTM', 'ARM']
+        feature_args = [parse_feature_args(f) for f in features]
+        feature_data = [make_feature_data(f, 'ABC', '')
+                        for f in feature_args]
+        result = compile_feature_groups(feature_args, feature_data,
+                                        'ABC', '')
+        self.assertEqual(len(result), 4)
+        self.assertListEqual(result[0]['features'],
+                             ['PRMA10_AdjClose', 'LAG1_VOL10_AdjClose',
+                              'BOLL20_AdjClose'])
+        self.assertListEqual(result[1]['features'], ['GSECTOR'])
+        self.assertEqual(result[1]['sqlcmd'], feature_data[2]['sqlcmd'])
+        self.assertListEqual(result[2]['features'],
+                             ['SALESQ', 'NETINCOMETTM'])
+        self.assertListEqual(result[3]['features'], ['ARM'])
+        self.assertEqual(result[0]['sqlcmd'].count('from ABC'), 1)
+        self.assertTrue(result[0]['sqlcmd'].find(
+            'lag(AdjClose, 1) over') > 0)
+        self.assertTrue(result[2]['sqlcmd'].find(
+            "B.ItemName in ('SALESQ', 'NETINCOMETTM')") > 0)
+
+    def test_fused_window_filter(self):
+        features = ['PRMA10_AdjClose', 'VOL10_AdjClose', 'BOLL20_AdjClose']
+        feature_args = [parse_feature_args(f) for f in features]
+        filter_commands = "where A.Date_ between '2011-01-01' and " + \
+            "'2012-01-01'"
+        result = clean_sql_cmd(_FUSED_WINDOW(feature_args, 'ABC',
+                                             filter_commands))
+        # BOLL windows and the VOL lag see rows before the filter start
+        inner = result[result.find('from ('):result.find(') A')]
+        self.assertTrue(inner.find('lag(AdjClose, 1) over') > 0)
+        self.assertTrue(inner.find('stdev(AdjClose) over') > 0)
+        self.assertEqual(inner.find('where'), -1)
+        self.assertTrue(result.endswith(') A ' + filter_commands))
+
+    def test_sqlcmd_from_feature_list_fused(self):
+        start_date = dt.datetime(2011, 1, 1)
+        end_date = dt.datetime(2012, 1, 1)
+        features = ['AdjClose', 'PRMA10_AdjClose', 'PRMA20_AdjClose',
+                    'PRMA40_AdjClose', 'VOL10_AdjClose', 'BOLL20_AdjClose']
+        result = sqlcmd_from_feature_list(features, [1, 2], start_date,
+                                          end_date, 'ABC')[0]
+        benchmark = sqlcmd_from_feature_list(features, [1, 2], start_date,
+                                             end_date, 'ABC', fuse=False)[0]
+        self.assertEqual(result.count('from ABC'), 2)
+        self.assertEqual(benchmark.count('from ABC'), 7)
+        self.assertTrue(len(result) < len(benchmark))
+
+    def test_make_id_date_filter(self):
+        start_date = dt.datetime(2011, 1, 1)
+        end_date = dt.datetime(2012, 1, 1)
+        result = clean_sql_cmd(make_id_date_filter([1, 2], start_date,
+                                                   end_date))
+        self.assertTrue(result.endswith("A.SecCode in ('1', '2')"))
+        result = clean_sql_cmd(make_id_date_filter([1, 2], start_date,
+                                                   end_date, '#ABC'))
+        self.assertTrue(result.endswith(
+            'A.SecCode in (select SecCode from #ABC)'))
+
+    def test_get_date_padding(self):
+        result = get_date_padding([parse_feature_args('AdjClose')])
+        self.assertTupleEqual(result, (20, 20))
+        features = ['AdjClose', 'PRMA10_AdjClose', 'LAG2_VOL20_AdjClose',
+                    'LEAD5_AdjClose', 'SALESQ']
+        result = get_date_padding([parse_feature_args(f) for f in features])
+        # VOL20 needs 21 rows, plus 2 for the lag
+        self.assertTupleEqual(result, (85, 34))
+        start_date = dt.datetime(2011, 1, 1)
+        end_date = dt.datetime(2012, 1, 1)
+        result = sqlcmd_from_feature_list(['AdjClose'], [1, 2], start_date,
+                                          end_date, 'ABC')[0]
+        self.assertTrue(result.find(
+            "between '2010-12-12 00:00:00' and '2012-01-21 00:00:00'") > 0)
+
+    def test_get_date_padding_gapped(self):
+        # Weekdays less about ten holidays a year, and a halt just before
+        # the start date that removes close to half of the window's rows
+        start_date = dt.datetime(2011, 1, 3)
+        dates = [start_date - dt.timedelta(days=x) for x in range(1, 2000)]
+        dates = [d for i, d in enumerate(dates)
+                 if (d.weekday() < 5) and (i % 36 != 0)]
+        for rows in [1, 10, 21, 61, 252]:
+            halt = int(rows * 0.45)
+            history = dates[halt:]
+            padding = get_date_padding([parse_feature_args(
+                'MA{}_AdjClose'.format(rows))])[0]
+            padded = [d for d in history
+                      if d >= start_date - dt.timedelta(days=padding)]
+            self.assertTrue(len(padded) >= rows)
+
     def test_DATACOL(self):
         result = DATACOL('Open_', 'LAG1_ROpen', None, 'ABC')
         benchmark = "select SecCode, Date_, Open_ as LAG1_ROpen from ABC A"
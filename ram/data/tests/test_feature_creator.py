@@ -58,6 +58,36 @@ class TestFeatureCreator(unittest.TestCase):
         benchmark['e'] = [np.nan, np.nan, 0.6]
         assert_frame_equal(result, benchmark)
 
+    def test_data_rank_stack(self):
+        values = np.array([
+            [[1, 2, 1, 2], [3, np.nan, -np.inf, 3], [np.nan] * 4],
+            [[5, np.inf, 4, 4], [1, 2, 3, 4], [np.nan, 2, 1, np.nan]]])
+        result = data_rank_stack(values)
+        for i in range(2):
+            benchmark = pd.DataFrame(values[i]).rank(axis=1, pct=True)
+            assert_array_equal(result[i], benchmark.values)
+        # Filled with median ranks, and back filled for empty dates
+        result = data_rank_stack(values, fill_median=True, backfill=True)
+        benchmark = data_fill_median(
+            pd.DataFrame(values[0]).rank(axis=1, pct=True), True)
+        assert_array_equal(result[0], benchmark.values)
+        assert_array_equal(result[0, 1], [5/6., 5/6., 1/3., 5/6.])
+        assert_array_equal(result[1, 0], [1, 0.5, 0.5, 0.5])
+
+    def test_data_fill_median_stack(self):
+        values = np.array([
+            [[1, 2, np.nan, 4], [np.nan] * 4, [3, np.nan, 5, 1]],
+            [[np.nan] * 4, [np.nan, 1, 2, np.inf], [1, 2, 3, 4]]])
+        result = data_fill_median_stack(values)
+        assert_array_equal(result[0, 0], [1, 2, 2, 4])
+        assert_array_equal(result[0, 1], [np.nan] * 4)
+        assert_array_equal(result[1, 1], [2, 1, 2, np.inf])
+        self.assertTrue(np.isnan(values[0, 0, 2]))
+        result = data_fill_median_stack(values, backfill=True)
+        assert_array_equal(result[0, 1], [3] * 4)
+        assert_array_equal(result[1, 0], [2] * 4)
+        assert_array_equal(result[1, 2], [1, 2, 3, 4])
+
     def test_FeatureAggregator(self):
         # DataFrame with multiple dates and SecCodes in columns
         data = pd.DataFrame(columns=['A', 'B', 'C'])
@@ -84,6 +114,36 @@ class TestFeatureCreator(unittest.TestCase):
         benchmark.VAR3 = benchmark.VAR3.astype(object)
         assert_frame_equal(result, benchmark)
 
+    def test_FeatureAggregator_align(self):
+        data = pd.DataFrame(columns=['A', 'B'])
+        data.loc[dt.date(2010, 1, 2)] = [1, 2]
+        data.loc[dt.date(2010, 1, 3)] = [3, 4]
+        data = data.astype(float)
+        feat = FeatureAggregator()
+        feat.add_feature(data, 'VAR1')
+        # New SecCode and date, and a Series for a single date
+        data2 = pd.DataFrame({'C': [5.], 'A': [6.]},
+                             index=[dt.date(2010, 1, 1)])
+        feat.add_feature(data2, 'VAR2', fill_median=False)
+        feat.add_feature(pd.Series([10., np.nan], index=['B', 'A'],
+                                   name=dt.date(2010, 1, 3)),
+                         'VAR1', fill_median=False)
+        result = feat.make_dataframe()
+        benchmark = pd.DataFrame()
+        benchmark['SecCode'] = ['A', 'A', 'A', 'B', 'B', 'C']
+        benchmark['Date'] = [dt.date(2010, 1, 1), dt.date(2010, 1, 2),
+                             dt.date(2010, 1, 3), dt.date(2010, 1, 2),
+                             dt.date(2010, 1, 3), dt.date(2010, 1, 1)]
+        benchmark['VAR1'] = [np.nan, 1, 3, 2, 7, np.nan]
+        benchmark['VAR2'] = [6, np.nan, np.nan, np.nan, np.nan, 5]
+        assert_frame_equal(result, benchmark)
+        # Bools are kept
+        feat = FeatureAggregator()
+        feat.add_feature(data > 2, 'VAR1')
+        result = feat.make_dataframe()
+        self.assertEqual(result.VAR1.dtype, bool)
+        assert_array_equal(result.VAR1, [False, True, False, True])
+
     def test_prma(self):
         dates = [dt.date(2010, 1, 1) + dt.timedelta(days=x) for x in range(4)]
         data = pd.DataFrame()
@@ -191,6 +251,154 @@ class TestFeatureCreator(unittest.TestCase):
         result2 = RSI().calculate_last_date(data, 3)
         assert_array_almost_equal(result1.iloc[-1], result2.round(2))
 
+    def test_RollingWindows(self):
+        dates = [dt.date(2010, 1, 1) + dt.timedelta(days=x) for x in range(8)]
+        data = pd.DataFrame(index=dates)
+        data['V1'] = [2, 3, 4, 3, 2, 7, 1, 1]
+        data['V2'] = [2, 3, np.nan, 5, 6, 7, 8, 9]
+        data['V3'] = [5, 5, 5, 5, 5, 5, 5, 5]
+        windows = RollingWindows(data)
+        for w in [1, 2, 3, 5, 8]:
+            assert_frame_equal(windows.mean(w), data.rolling(w).mean())
+            assert_frame_equal(windows.sum(w), data.rolling(w).sum())
+            assert_frame_equal(windows.max(w), data.rolling(w).max())
+            assert_frame_equal(windows.std(w, ddof=0),
+                               data.rolling(w).std(ddof=0))
+        assert_frame_equal(windows.std(3), data.rolling(3).std())
+        # Constant windows have no spread
+        self.assertTrue((windows.std(3).V3.iloc[2:] == 0).all())
+        # Derived data is memoized
+        result = windows.derive('diff', lambda x: x.diff())
+        self.assertIs(result, windows.derive('diff', lambda x: x.diff()))
+        assert_frame_equal(result.mean(2), data.diff().rolling(2).mean())
+
+    def test_multi_features(self):
+        dates = [dt.date(2010, 1, 1) + dt.timedelta(days=x)
+                 for x in range(30)]
+        data = pd.DataFrame(index=dates)
+        data['V1'] = np.random.RandomState(123).rand(30) + 10
+        data['V2'] = np.random.RandomState(234).rand(30) + 10
+        data.iloc[4, 1] = np.nan
+        volume = data * 0 + 100
+        windows = RollingWindows(data)
+        for live_flag in [False, True]:
+            result = PRMA_MULTI(live_flag).fit(windows, [2, 5, 10])
+            for w in [2, 5, 10]:
+                benchmark = PRMA(live_flag).fit(data, w)
+                assert_array_almost_equal(result[w], benchmark)
+            result = VOL_MULTI(live_flag).fit(windows, [5, 10])
+            for w in [5, 10]:
+                benchmark = VOL(live_flag).fit(data, w)
+                assert_array_almost_equal(result[w], benchmark)
+            result = DISCOUNT_MULTI(live_flag).fit(windows, [2, 5, 10])
+            for w in [2, 5, 10]:
+                benchmark = DISCOUNT(live_flag).fit(data, w)
+                assert_array_almost_equal(result[w], benchmark)
+            result = BOLL_MULTI(live_flag).fit(windows, [5, 10])
+            for w in [5, 10]:
+                benchmark = BOLL(live_flag).fit(data, w)
+                assert_array_almost_equal(result[w], benchmark)
+            result = BOLL_SMOOTH_MULTI(live_flag).fit(windows, 2, [5, 10])
+            for w in [5, 10]:
+                benchmark = BOLL_SMOOTH(live_flag).fit(data, 2, w)
+                assert_array_almost_equal(result[w], benchmark)
+            result = RSI_MULTI(live_flag).fit(windows, [5, 10])
+            for w in [5, 10]:
+                benchmark = RSI(live_flag).fit(data, w)
+                assert_array_almost_equal(result[w], benchmark)
+            result = MFI_MULTI(live_flag).fit(data, data, data, volume,
+                                              [5, 10])
+            for w in [5, 10]:
+                benchmark = MFI(live_flag).fit(data, data, data, volume, w)
+                assert_array_almost_equal(result[w], benchmark)
+        # Frames can be passed in directly
+        result = PRMA_MULTI().fit(data, [5])
+        assert_frame_equal(result[5], PRMA().fit(data, 5))
+        # Live windows of the history, completed with the last bar
+        history = data.iloc[:-1]
+        windows = LiveWindows(history).set_bar(data.iloc[-1])
+        live = [LiveWindows(history).set_bar(data.iloc[-1])
+                for _ in range(3)] + \
+            [LiveWindows(volume.iloc[:-1]).set_bar(volume.iloc[-1])]
+        benchmarks = {
+            'prma': PRMA_MULTI(True).fit(data, [2, 5, 10]),
+            'vol': VOL_MULTI(True).fit(data, [5, 10]),
+            'disc': DISCOUNT_MULTI(True).fit(data, [2, 5, 10]),
+            'boll': BOLL_MULTI(True).fit(data, [5, 10]),
+            'boll_smooth': BOLL_SMOOTH_MULTI(True).fit(data, 2, [5, 10]),
+            'rsi': RSI_MULTI(True).fit(data, [5, 10]),
+            'mfi': MFI_MULTI(True).fit(data, data, data, volume, [5, 10])
+        }
+        results = {
+            'prma': PRMA_MULTI(True).fit(windows, [2, 5, 10]),
+            'vol': VOL_MULTI(True).fit(windows, [5, 10]),
+            'disc': DISCOUNT_MULTI(True).fit(windows, [2, 5, 10]),
+            'boll': BOLL_MULTI(True).fit(windows, [5, 10]),
+            'boll_smooth': BOLL_SMOOTH_MULTI(True).fit(windows, 2, [5, 10]),
+            'rsi': RSI_MULTI(True).fit(windows, [5, 10]),
+            'mfi': MFI_MULTI(True).fit(*(live + [[5, 10]]))
+        }
+        for key, result in results.items():
+            for w, benchmark in benchmarks[key].items():
+                self.assertEqual(result[w].name, benchmark.name)
+                assert_array_almost_equal(result[w], benchmark)
+
+    def test_multi_features_flat_windows(self):
+        dates = [dt.date(2010, 1, 1) + dt.timedelta(days=x)
+                 for x in range(30)]
+        data = pd.DataFrame(index=dates)
+        data['V1'] = 42.
+        data['V2'] = np.random.RandomState(123).rand(30) + 10
+        windows = RollingWindows(data)
+        assert_array_equal(windows.mean(10).V1.iloc[9:], 42)
+        # No spread, so no position within the bands, and ranked as null
+        # like the infinite values of the single window features
+        for result in [BOLL_MULTI().calculate_all_dates(windows, [10]),
+                       BOLL_SMOOTH_MULTI().calculate_all_dates(
+                           windows, 2, [10])]:
+            self.assertTrue(result[10].V1.isnull().all())
+            self.assertFalse(np.isinf(result[10].values).any())
+        result = data_rank(BOLL_MULTI().calculate_all_dates(windows, [10])[10])
+        benchmark = data_rank(BOLL().calculate_all_dates(data, 10))
+        assert_frame_equal(result, benchmark)
+
+    def test_LiveWindows(self):
+        dates = [dt.date(2010, 1, 1) + dt.timedelta(days=x) for x in range(8)]
+        data = pd.DataFrame(index=dates)
+        data['V1'] = [2, 3, 4, 3, 2, 7, 1, 1]
+        data['V2'] = [2, 3, np.nan, 5, 6, 7, 8, np.nan]
+        data['V3'] = [np.nan, np.nan, np.nan, 5, 5, 5, 5, 5]
+        windows = LiveWindows(data.iloc[:-1])
+        # Bars are aligned by SecCode
+        windows.set_bar(data.iloc[-1][['V3', 'V2', 'V1']])
+        self.assertEqual(windows.bar.name, dates[-1])
+        for w in [1, 2, 5, 8]:
+            window = data.iloc[-w:]
+            assert_array_almost_equal(windows.mean(w), window.mean())
+            assert_array_almost_equal(windows.sum(w), window.sum())
+            assert_array_equal(windows.max(w), window.max())
+            assert_array_almost_equal(windows.std(w), window.std())
+            assert_array_almost_equal(windows.std(w, ddof=0),
+                                      window.std(ddof=0))
+            assert_array_equal(windows.sum(w, skipna=False),
+                               window.values.sum(axis=0))
+        # Constant windows have no spread
+        self.assertEqual(windows.std(5).V3, 0)
+        # Returns after the first price of each window
+        for w in [3, 6, 8]:
+            benchmark = data.iloc[-w:].pct_change().notnull().sum()
+            assert_array_equal(windows.pct_change_windows(w), benchmark)
+        # Derived windows are memoized, and their bar is refreshed
+        result = windows.derive('diff', lambda x: x.diff(),
+                                lambda x: x.bar - x.last)
+        self.assertIs(result, windows.derive('diff', lambda x: x.diff(),
+                                             lambda x: x.bar - x.last))
+        assert_array_almost_equal(result.mean(3),
+                                  data.diff().iloc[-3:].mean())
+        windows.set_bar([1, 2, 3])
+        result = windows.derive('diff', None, lambda x: x.bar - x.last)
+        assert_array_equal(result.bar, [0, -6, -2])
+
     def test_data_fill_median(self):
         data = pd.DataFrame(index=range(3, 8))
         data['V1'] = [np.nan, 1, 2, 3, 4]
@@ -0,0 +1,123 @@
+import unittest
+import numpy as np
+import pandas as pd
+import datetime as dt
+from numpy.testing import assert_array_equal, assert_array_almost_equal
+
+from ram.data.feature_engine import *
+
+
+class TestFeatureEngine(unittest.TestCase):
+
+    def setUp(self):
+        dates = pd.date_range('2017-01-02', periods=6, freq='B')
+        self.raw = pd.DataFrame({
+            'SecCode': [20] * 6 + [10] * 4,
+            'Date': list(dates) + list(dates[2:]),
+            'AdjClose': [10, 11, 10, 12, np.nan, 13, 5, 5, 4, 6.],
+            'AdjHigh': [11, 12, 11, 13, np.nan, 14, 6, 6, 5, 7.],
+            'AdjLow': [9, 10, 9, 11, np.nan, 12, 4, 4, 3, 5.],
+            'AdjVolume': [100, 200, 100, 300, np.nan, 100, 10, 20, 30, 40.]
+        })
+        self.start = dt.datetime(2017, 1, 1)
+        self.end = dt.datetime(2017, 1, 31)
+
+    def _compute(self, features):
+        return compute_features(self.raw, features, self.start, self.end)
+
+    def test_is_local_feature(self):
+        self.assertTrue(is_local_feature('PRMA10_AdjClose'))
+        self.assertTrue(is_local_feature('LAG1_VOL20_Close'))
+        self.assertTrue(is_local_feature('RANK_MFI5_AdjClose'))
+        self.assertTrue(is_local_feature('AvgDolVol'))
+        self.assertTrue(is_local_feature('RClose'))
+        self.assertFalse(is_local_feature('PRMAH10_AdjClose'))
+        self.assertFalse(is_local_feature('GSECTOR'))
+        self.assertFalse(is_local_feature('SALESQ'))
+        self.assertFalse(is_local_feature('NOTAFEATURE'))
+
+    def test_make_raw_sqlcmd(self):
+        sqlcmd, columns = make_raw_sqlcmd(
+            ['PRMA10_AdjClose', 'MFI5_AdjClose', 'AvgDolVol'], [10, 20],
+            dt.datetime(2017, 1, 1), dt.datetime(2017, 2, 1))
+        self.assertEqual(columns, ['SecCode', 'Date', 'AdjClose', 'AdjHigh',
+                                   'AdjLow', 'AdjVolume', 'AvgDolVol'])
+        self.assertIn('A.AdjClose, A.AdjHigh', sqlcmd)
+        self.assertIn("A.SecCode in ('10', '20')", sqlcmd)
+
+    def test_windows(self):
+        result = self._compute(['MA2_AdjClose', 'PRMA2_AdjClose',
+                                'MIN3_AdjClose', 'DISCOUNT3_AdjClose'])
+        # Sorted by SecCode
+        assert_array_equal(result.SecCode, [10] * 4 + [20] * 6)
+        assert_array_equal(result['MA2_AdjClose'],
+                           [5, 5, 4.5, 5, 10, 10.5, 10.5, 11, 12, 13])
+        assert_array_almost_equal(result['PRMA2_AdjClose'],
+                                  [1, 1, 4/4.5, 1.2, 1, 11/10.5, 10/10.5,
+                                   12/11., np.nan, 1])
+        assert_array_equal(result['MIN3_AdjClose'],
+                           [5, 5, 4, 4, 10, 10, 10, 10, 10, 12])
+        assert_array_almost_equal(result['DISCOUNT3_AdjClose'],
+                                  [0, 0, .2, 0, 0, 0, 1/11., 0, np.nan, 0])
+
+    def test_std_windows(self):
+        result = self._compute(['VOL3_AdjClose', 'BOLL3_AdjClose'])
+        prices = np.array([10, 11, 10, 12.])
+        returns = prices[1:] / prices[:-1]
+        vol = result['VOL3_AdjClose'].values[4:]
+        self.assertTrue(np.isnan(vol[0]))
+        self.assertTrue(np.isnan(vol[1]))
+        self.assertAlmostEqual(vol[2], np.std(returns[:2], ddof=1))
+        self.assertAlmostEqual(vol[3], np.std(returns, ddof=1))
+        # Null returns around the missing price are ignored
+        self.assertAlmostEqual(vol[4], np.std(returns[1:], ddof=1))
+        self.assertTrue(np.isnan(vol[5]))
+        boll = result['BOLL3_AdjClose'].values[4:]
+        std = np.std(prices[1:], ddof=1)
+        self.assertAlmostEqual(
+            boll[3], (12 - (np.mean(prices[1:]) - 2 * std)) / (4 * std))
+        # Constant window has no deviation
+        self.assertTrue(np.isnan(result['BOLL3_AdjClose'].values[1]))
+
+    def test_rsi_mfi(self):
+        result = self._compute(['RSI3_AdjClose', 'MFI3_AdjClose'])
+        rsi = result['RSI3_AdjClose'].values
+        # SecCode 10: changes 0, -1, 2
+        self.assertTrue(np.isnan(rsi[1]))
+        self.assertAlmostEqual(rsi[2], 0)
+        self.assertAlmostEqual(rsi[3], 100 * 2 / 3.)
+        mfi = result['MFI3_AdjClose'].values
+        # SecCode 10: typical prices 5, 5, 4, 6
+        flows = np.array([5 * 10, 5 * 20, 4 * 30, 6 * 40.])
+        self.assertAlmostEqual(mfi[0], 0)
+        self.assertAlmostEqual(mfi[1], 0)
+        self.assertAlmostEqual(mfi[3], 100 * flows[3] /
+                               (flows[2] + flows[3]))
+
+    def test_shift_rank(self):
+        result = self._compute(['LAG1_AdjClose', 'LEAD2_AdjClose',
+                                'RANK_AdjClose'])
+        assert_array_equal(result['LAG1_AdjClose'],
+                           [np.nan, 5, 5, 4, np.nan, 10, 11, 10, 12, np.nan])
+        assert_array_equal(result['LEAD2_AdjClose'],
+                           [4, 6, np.nan, np.nan, 10, 12, np.nan, 13,
+                            np.nan, np.nan])
+        rank = result.set_index(['Date', 'SecCode'])['RANK_AdjClose']
+        self.assertEqual(rank.loc[(pd.Timestamp('2017-01-02'), 20)], 0)
+        self.assertEqual(rank.loc[(pd.Timestamp('2017-01-04'), 10)], 0)
+        self.assertEqual(rank.loc[(pd.Timestamp('2017-01-04'), 20)], 1)
+        # Nulls rank first
+        self.assertEqual(rank.loc[(pd.Timestamp('2017-01-06'), 20)], 0)
+        self.assertEqual(rank.loc[(pd.Timestamp('2017-01-06'), 10)], 1)
+
+    def test_date_filter(self):
+        result = compute_features(self.raw, ['LEAD1_AdjClose'], self.start,
+                                  dt.datetime(2017, 1, 3))
+        assert_array_equal(result['LEAD1_AdjClose'], [11, 10])
+
+    def tearDown(self):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
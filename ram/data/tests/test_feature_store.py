@@ -0,0 +1,110 @@
+import os
+import shutil
+import unittest
+import tempfile
+import numpy as np
+import pandas as pd
+import datetime as dt
+from numpy.testing import assert_array_equal
+
+from ram.data.feature_store import FeatureStore
+from ram.data.feature_store import _merge_ranges
+from ram.data.feature_store import _missing_ranges
+
+
+class FakeDataHandler(object):
+
+    def __init__(self):
+        self.calls = []
+
+    def get_seccode_data(self, seccodes, features, start_date, end_date):
+        self.calls.append((sorted(seccodes), start_date, end_date))
+        dates = pd.date_range(start_date, end_date, freq='B')
+        data = pd.DataFrame(
+            [(s, d) for s in seccodes for d in dates],
+            columns=['SecCode', 'Date'])
+        # Deterministic values by SecCode and date
+        data['AdjClose'] = data.SecCode.astype(float) * 1000 + \
+            data.Date.dt.day
+        data['AvgDolVol'] = data.SecCode.astype(float)
+        return data
+
+
+class TestFeatureStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store_dir = tempfile.mkdtemp()
+        self.dh = FakeDataHandler()
+
+    def test_missing_ranges(self):
+        coverage = [['2017-01-05', '2017-01-10'], ['2017-01-20', '2017-01-31']]
+        result = _missing_ranges(coverage, dt.datetime(2017, 1, 1),
+                                 dt.datetime(2017, 2, 5))
+        benchmark = [('2017-01-01', '2017-01-04'),
+                     ('2017-01-11', '2017-01-19'),
+                     ('2017-02-01', '2017-02-05')]
+        self.assertListEqual(result, benchmark)
+        result = _missing_ranges(coverage, dt.datetime(2017, 1, 6),
+                                 dt.datetime(2017, 1, 8))
+        self.assertListEqual(result, [])
+        result = _missing_ranges([], dt.datetime(2017, 1, 6),
+                                 dt.datetime(2017, 1, 8))
+        self.assertListEqual(result, [('2017-01-06', '2017-01-08')])
+
+    def test_merge_ranges(self):
+        result = _merge_ranges([['2017-01-11', '2017-01-20'],
+                                ['2017-01-01', '2017-01-10'],
+                                ['2017-02-01', '2017-02-05'],
+                                ['2017-02-03', '2017-02-04']])
+        benchmark = [['2017-01-01', '2017-01-20'],
+                     ['2017-02-01', '2017-02-05']]
+        self.assertListEqual(result, benchmark)
+
+    def test_get_seccode_data(self):
+        store = FeatureStore(self.store_dir, ['AdjClose', 'AvgDolVol'])
+        result = store.get_seccode_data(self.dh, [10, 20], '2017-01-02',
+                                        '2017-01-31')
+        self.assertEqual(len(self.dh.calls), 1)
+        self.assertListEqual(result.columns.tolist(),
+                             ['SecCode', 'Date', 'AdjClose', 'AvgDolVol'])
+        benchmark = self.dh.get_seccode_data(
+            [10, 20], None, dt.datetime(2017, 1, 2), dt.datetime(2017, 1, 31))
+        assert_array_equal(result.AdjClose.values, benchmark.AdjClose.values)
+        assert_array_equal(result.Date.values, benchmark.Date.values)
+        # Overlapping period only pulls missing blocks
+        self.dh.calls = []
+        result = store.get_seccode_data(self.dh, [20, 30], '2017-01-16',
+                                        '2017-02-15')
+        self.assertListEqual(self.dh.calls, [
+            ([30], dt.datetime(2017, 1, 16), dt.datetime(2017, 2, 15)),
+            ([20], dt.datetime(2017, 2, 1), dt.datetime(2017, 2, 15))])
+        self.assertListEqual(sorted(result.SecCode.unique()), [20, 30])
+        self.assertEqual(result.Date.min(), pd.Timestamp('2017-01-16'))
+        self.assertEqual(result.Date.max(), pd.Timestamp('2017-02-15'))
+        self.assertEqual(len(result), 46)
+        # Coverage persists across instances
+        self.dh.calls = []
+        store = FeatureStore(self.store_dir, ['AdjClose', 'AvgDolVol'])
+        store.get_seccode_data(self.dh, [10, 20, 30], '2017-01-16',
+                               '2017-01-31')
+        self.assertListEqual(self.dh.calls, [])
+
+    def test_rank_features(self):
+        store = FeatureStore(self.store_dir, ['AdjClose', 'RANK_AdjClose'])
+        result = store.get_seccode_data(self.dh, [10, 20, 30], '2017-01-02',
+                                        '2017-01-03')
+        self.assertListEqual(result.columns.tolist(),
+                             ['SecCode', 'Date', 'AdjClose', 'RANK_AdjClose'])
+        assert_array_equal(result.RANK_AdjClose.values,
+                           [0, 0, 0.5, 0.5, 1, 1])
+        # Rank is across the requested universe only
+        result = store.get_seccode_data(self.dh, [20, 30], '2017-01-02',
+                                        '2017-01-03')
+        assert_array_equal(result.RANK_AdjClose.values, [0, 0, 1, 1])
+
+    def tearDown(self):
+        shutil.rmtree(self.store_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import time
+import shutil
+import unittest
+import tempfile
+
+from ram.data.gcs_cache import GCSCache
+from ram.data.tests.fakes import FakeBucket
+
+
+class TestGCSCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.bucket = FakeBucket()
+        self.bucket.upload('prepped_data/a.csv', 'A,B\n1,2\n')
+        self.bucket.upload('prepped_data/b.csv', 'A,B\n3,4\n')
+
+    def test_read_through(self):
+        cache = GCSCache(self.cache_dir)
+        result = cache.download_as_string(self.bucket, 'prepped_data/a.csv')
+        self.assertEqual(result, 'A,B\n1,2\n')
+        result = cache.download_as_string(self.bucket, 'prepped_data/a.csv')
+        self.assertEqual(result, 'A,B\n1,2\n')
+        self.assertEqual(self.bucket.downloads, ['prepped_data/a.csv'])
+        # Other processes share entries through the directory
+        cache2 = GCSCache(self.cache_dir)
+        cache2.download_as_string(self.bucket, 'prepped_data/a.csv')
+        self.assertEqual(len(self.bucket.downloads), 1)
+        stats = cache.get_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['entries'], 1)
+        # New generation is downloaded again
+        self.bucket.upload('prepped_data/a.csv', 'A,B\n5,6\n')
+        result = cache.download_as_string(self.bucket, 'prepped_data/a.csv')
+        self.assertEqual(result, 'A,B\n5,6\n')
+        self.assertEqual(len(self.bucket.downloads), 2)
+
+    def test_missing_blob(self):
+        cache = GCSCache(self.cache_dir)
+        with self.assertRaises(IOError):
+            cache.get_path(self.bucket, 'prepped_data/c.csv')
+
+    def test_evict(self):
+        cache = GCSCache(self.cache_dir, max_bytes=10)
+        path_a = cache.get_path(self.bucket, 'prepped_data/a.csv')
+        os.utime(path_a, (time.time() - 100, time.time() - 100))
+        path_b = cache.get_path(self.bucket, 'prepped_data/b.csv')
+        self.assertFalse(os.path.isfile(path_a))
+        self.assertTrue(os.path.isfile(path_b))
+        self.assertEqual(cache.get_stats()['evictions'], 1)
+
+    def test_failed_download(self):
+        cache = GCSCache(self.cache_dir)
+        self.bucket.upload('prepped_data/c.csv', None)
+        with self.assertRaises(IOError):
+            cache.get_path(self.bucket, 'prepped_data/c.csv')
+        self.assertListEqual(os.listdir(self.cache_dir), [])
+        self.assertDictEqual(cache._pins, {})
+
+    def test_pinned_entries(self):
+        cache = GCSCache(self.cache_dir, max_bytes=10)
+        path_a = cache._get_pinned_path(self.bucket, 'prepped_data/a.csv')
+        os.utime(path_a, (time.time() - 100, time.time() - 100))
+        # Entries being handed out are skipped
+        cache.get_path(self.bucket, 'prepped_data/b.csv')
+        self.assertTrue(os.path.isfile(path_a))
+        cache._unpin(path_a)
+        self.assertDictEqual(cache._pins, {})
+        cache._evict()
+        self.assertFalse(os.path.isfile(path_a))
+        with cache.open_blob(self.bucket, 'prepped_data/a.csv') as f:
+            self.assertEqual(f.read(), 'A,B\n1,2\n')
+        self.assertDictEqual(cache._pins, {})
+
+    def test_prefetch(self):
+        cache = GCSCache(self.cache_dir)
+        cache.prefetch(self.bucket, ['prepped_data/a.csv',
+                                     'prepped_data/b.csv',
+                                     'prepped_data/c.csv'])
+        cache._pool.close()
+        cache._pool.join()
+        self.assertEqual(sorted(self.bucket.downloads),
+                         ['prepped_data/a.csv', 'prepped_data/b.csv'])
+        cache.get_path(self.bucket, 'prepped_data/b.csv')
+        stats = cache.get_stats()
+        self.assertEqual(stats['prefetches'], 2)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(len(self.bucket.downloads), 2)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+from ram.data.gcs_catalog import BucketCatalog
+from ram.data.tests.fakes import FakeBucket
+
+
+class TestBucketCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.bucket = FakeBucket([
+            'prepped_data/StratA/version_0001/meta.json',
+            'prepped_data/StratA/version_0001/20100101_data.csv',
+            'prepped_data/StratA/version_0001/20100201_data.csv',
+            'prepped_data/StratA/version_0001/20100301_data.csv',
+            'prepped_data/StratA/version_0002/meta.json',
+            'prepped_data/StratA/version_0003/meta.json',
+            'prepped_data/StratB/version_0001/meta.json',
+            'simulations/StratA/run_0001/meta.json',
+        ])
+
+    def test_list_dirs(self):
+        catalog = BucketCatalog(self.bucket)
+        result = catalog.list_dirs('prepped_data')
+        self.assertEqual(result, ['StratA', 'StratB'])
+        result = catalog.list_dirs('prepped_data/StratA/')
+        self.assertEqual(result, ['version_0001', 'version_0002',
+                                  'version_0003'])
+        self.assertEqual(self.bucket.calls[-1],
+                         ('prepped_data/StratA/', '/'))
+
+    def test_list_files(self):
+        catalog = BucketCatalog(self.bucket)
+        result = catalog.list_files('prepped_data/StratA/version_0001',
+                                    recursive=False)
+        self.assertEqual(len(result), 4)
+        self.assertEqual(result[0],
+                         'prepped_data/StratA/version_0001/20100101_data.csv')
+        result = catalog.list_files('prepped_data/StratA')
+        self.assertEqual(len(result), 6)
+        result = catalog.list_files('prepped_data/StratA', recursive=False)
+        self.assertEqual(result, [])
+
+    def test_ttl(self):
+        catalog = BucketCatalog(self.bucket, ttl=60)
+        catalog.list_dirs('prepped_data')
+        self.bucket.upload('prepped_data/StratC/version_0001/x.csv', '')
+        self.assertEqual(catalog.list_dirs('prepped_data'),
+                         ['StratA', 'StratB'])
+        self.assertEqual(catalog.list_dirs('prepped_data', refresh=True),
+                         ['StratA', 'StratB', 'StratC'])
+        self.assertEqual(catalog.get_stats(), {'queries': 2, 'hits': 1})
+        self.bucket.upload('prepped_data/StratD/version_0001/x.csv', '')
+        catalog.invalidate('prepped_data')
+        self.assertEqual(len(catalog.list_dirs('prepped_data')), 4)
+        # Expired listings are queried again
+        catalog = BucketCatalog(self.bucket, ttl=0)
+        catalog.list_dirs('prepped_data')
+        catalog.list_dirs('prepped_data')
+        self.assertEqual(catalog.get_stats()['queries'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+import numpy as np
+import pandas as pd
+import datetime as dt
+
+from numpy.testing import assert_array_equal
+from pandas.util.testing import assert_frame_equal
+
+from ram.data.panel import DataPanel
+from ram.data.feature_creator import clean_pivot_raw_data
+
+
+class TestDataPanel(unittest.TestCase):
+
+    def setUp(self):
+        data = pd.DataFrame()
+        data['SecCode'] = ['b'] * 8 + ['a'] * 7
+        data['Date'] = [dt.date(2010, 1, i) for i in range(1, 9)] + \
+            [dt.date(2010, 1, i) for i in range(2, 9)]
+        data['V1'] = [1, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, 8,
+                      2, 3, np.nan, 5, 6, 7, 8]
+        data['V2'] = range(15)
+        self.data = data
+
+    def test_get_frame(self):
+        panel = DataPanel(self.data, ['V1', 'V2'])
+        for field in ['V1', 'V2']:
+            result = panel.get_frame(field)
+            benchmark = self.data.pivot(index='Date', columns='SecCode',
+                                        values=field).astype(float)
+            assert_frame_equal(result, benchmark)
+        self.assertListEqual(panel.seccodes.tolist(), ['a', 'b'])
+        self.assertEqual(panel.dates[0], dt.date(2010, 1, 1))
+        # Frames are views of the panel
+        result = panel.get_frame('V2')
+        self.assertTrue(np.shares_memory(result.values,
+                                         panel.get_values('V2')))
+
+    def test_get_clean_frame(self):
+        panel = DataPanel(self.data, ['V1', 'V2'])
+        for lag in [0, 1]:
+            result = panel.get_clean_frame('V1', lag=lag)
+            benchmark = clean_pivot_raw_data(self.data, 'V1', lag=lag)
+            assert_frame_equal(result, benchmark)
+        result = panel.get_clean_frame('V1')
+        assert_array_equal(result['b'].values,
+                           [1, 1, 1, 1, 1, 1, np.nan, 8])
+
+    def test_duplicates(self):
+        data = self.data.append(self.data.iloc[:1])
+        with self.assertRaises(ValueError):
+            DataPanel(data, ['V1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
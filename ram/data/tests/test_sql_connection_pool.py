@@ -0,0 +1,71 @@
+import unittest
+
+from ram.data.sql_connection_pool import SQLConnectionPool
+from ram.data.tests.fakes import FakeConnection
+
+
+class TestSQLConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = SQLConnectionPool(connect_func=FakeConnection,
+                                      max_size=2,
+                                      checkout_timeout=0.1,
+                                      health_check_interval=0)
+
+    def test_reuse(self):
+        c1 = self.pool.checkout()
+        self.pool.checkin(c1)
+        c2 = self.pool.checkout()
+        self.assertIs(c1, c2)
+        self.pool.checkin(c2)
+        stats = self.pool.get_stats()
+        self.assertEqual(stats['connects'], 1)
+        self.assertEqual(stats['checkouts'], 2)
+        self.assertEqual(stats['idle'], 1)
+        self.assertEqual(stats['open'], 1)
+
+    def test_bounded(self):
+        c1 = self.pool.checkout()
+        c2 = self.pool.checkout()
+        self.assertIsNot(c1, c2)
+        with self.assertRaises(RuntimeError):
+            self.pool.checkout()
+        self.assertEqual(self.pool.get_stats()['waits'], 1)
+        self.pool.checkin(c1)
+        c3 = self.pool.checkout()
+        self.assertIs(c1, c3)
+
+    def test_health_check(self):
+        c1 = self.pool.checkout()
+        self.pool.checkin(c1)
+        c1.alive = False
+        c2 = self.pool.checkout()
+        self.assertIsNot(c1, c2)
+        self.assertTrue(c1.closed)
+        stats = self.pool.get_stats()
+        self.assertEqual(stats['reconnects'], 1)
+        self.assertEqual(stats['open'], 1)
+
+    def test_connection_context_discard(self):
+        with self.assertRaises(ValueError):
+            with self.pool.connection() as c1:
+                raise ValueError()
+        self.assertTrue(c1.closed)
+        stats = self.pool.get_stats()
+        self.assertEqual(stats['discards'], 1)
+        self.assertEqual(stats['open'], 0)
+        self.assertEqual(stats['idle'], 0)
+
+    def test_close_idle(self):
+        with self.pool.connection() as c1:
+            pass
+        self.pool.close_idle()
+        self.assertTrue(c1.closed)
+        self.assertEqual(self.pool.get_stats()['open'], 0)
+
+    def tearDown(self):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
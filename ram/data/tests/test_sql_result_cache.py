@@ -0,0 +1,110 @@
+import os
+import shutil
+import pickle
+import unittest
+import tempfile
+import numpy as np
+import pandas as pd
+import datetime as dt
+from multiprocessing.pool import ThreadPool
+
+from numpy.testing import assert_array_equal
+from pandas.util.testing import assert_frame_equal
+
+from ram.data.sql_result_cache import SQLResultCache
+
+
+class TestSQLResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.as_of = dt.datetime(2017, 1, 3, 6, 30)
+        self.data = pd.DataFrame({
+            'SecCode': np.array([10, 10, 20], dtype=np.int64),
+            'Date': pd.to_datetime(['2017-01-01', '2017-01-02',
+                                    '2017-01-01']),
+            'V1': [1.5, np.nan, 3.0],
+            'Ticker': ['AAPL', 'AAPL', None]},
+            columns=['SecCode', 'Date', 'V1', 'Ticker'])
+
+    def test_round_trip(self):
+        cache = SQLResultCache(self.cache_dir)
+        key = cache.make_key('select 1', self.as_of)
+        self.assertIsNone(cache.get(key))
+        cache.put(key, self.data)
+        result = cache.get(key)
+        assert_frame_equal(result, self.data)
+        stats = cache.get_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['writes'], 1)
+        self.assertEqual(stats['entries'], 1)
+
+    def test_make_key(self):
+        cache = SQLResultCache(self.cache_dir)
+        k1 = cache.make_key('select 1', self.as_of)
+        k2 = cache.make_key('select 1', self.as_of + dt.timedelta(days=1))
+        k3 = cache.make_key('select 1', self.as_of, [20, 10])
+        k4 = cache.make_key('select 1', self.as_of, [10, 20, 10])
+        self.assertNotEqual(k1, k2)
+        self.assertNotEqual(k1, k3)
+        self.assertEqual(k3, k4)
+        self.assertTrue(k1.startswith('20170103063000_'))
+
+    def test_evict(self):
+        cache = SQLResultCache(self.cache_dir, max_entries=2)
+        keys = [cache.make_key('select {}'.format(i), self.as_of)
+                for i in range(3)]
+        for i, key in enumerate(keys[:2]):
+            cache.put(key, self.data)
+            path = os.path.join(self.cache_dir, key + '.npz')
+            os.utime(path, (1000 + i, 1000 + i))
+        # Touch first entry so the second is least recently used
+        cache.get(keys[0])
+        cache.put(keys[2], self.data)
+        self.assertIsNotNone(cache.get(keys[0]))
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertIsNotNone(cache.get(keys[2]))
+        self.assertEqual(cache.get_stats()['evictions'], 1)
+        # Byte limit
+        cache = SQLResultCache(self.cache_dir, max_bytes=0)
+        cache.put(keys[0], self.data)
+        self.assertEqual(cache.get_stats()['entries'], 0)
+
+    def test_invalidate(self):
+        cache = SQLResultCache(self.cache_dir)
+        new_as_of = self.as_of + dt.timedelta(days=1)
+        k1 = cache.make_key('select 1', self.as_of)
+        k2 = cache.make_key('select 1', new_as_of)
+        cache.put(k1, self.data)
+        cache.put(k2, self.data)
+        cache.invalidate(new_as_of)
+        self.assertIsNone(cache.get(k1))
+        self.assertIsNotNone(cache.get(k2))
+        cache.invalidate()
+        self.assertEqual(cache.get_stats()['entries'], 0)
+
+    def test_thread_puts(self):
+        cache = SQLResultCache(self.cache_dir)
+        key = cache.make_key('select 1', self.as_of)
+        # Threads of one process writing the same entry don't collide
+        pool = ThreadPool(4)
+        pool.map(lambda _: cache.put(key, self.data), range(20))
+        pool.close()
+        pool.join()
+        assert_frame_equal(cache.get(key), self.data)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+    def test_pickle(self):
+        cache = SQLResultCache(self.cache_dir)
+        key = cache.make_key('select 1', self.as_of)
+        cache.put(key, self.data)
+        cache = pickle.loads(pickle.dumps(cache))
+        assert_frame_equal(cache.get(key), self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import shutil
+import unittest
+import tempfile
+import numpy as np
+import datetime as dt
+from numpy.testing import assert_array_equal
+
+from ram.data.trading_calendar import TradingCalendar
+
+
+class TestTradingCalendar(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.cache_dir, 'dates.npz')
+        self.loads = 0
+        self.as_of = dt.datetime(2017, 1, 9, 6, 30)
+        self.calendar = TradingCalendar(self._load_dates, self.cache_path,
+                                        self._get_as_of)
+
+    def _get_as_of(self):
+        return self.as_of
+
+    def _load_dates(self):
+        self.loads += 1
+        return [dt.datetime(2016, 12, 30), dt.datetime(2017, 1, 3),
+                dt.datetime(2017, 1, 4), dt.datetime(2017, 1, 5),
+                dt.datetime(2017, 1, 6), dt.datetime(2017, 1, 9)]
+
+    def test_prior_next_trading_date(self):
+        result = self.calendar.prior_trading_date(
+            ['2017-01-01', '2017-01-04', '2017-01-09', '2016-12-01'])
+        benchmark = np.array(['2016-12-30', '2017-01-03', '2017-01-06',
+                              'NaT'], dtype='M8[D]')
+        assert_array_equal(result, benchmark)
+        result = self.calendar.next_trading_date(dt.date(2017, 1, 6))
+        self.assertEqual(result, np.datetime64('2017-01-09'))
+        result = self.calendar.next_trading_date(dt.date(2017, 1, 9))
+        self.assertTrue(np.isnat(result))
+
+    def test_offset(self):
+        result = self.calendar.offset(['2017-01-01', '2017-01-04'], 2)
+        benchmark = np.array(['2017-01-05', '2017-01-06'], dtype='M8[D]')
+        assert_array_equal(result, benchmark)
+        result = self.calendar.offset('2017-01-04', -2)
+        self.assertEqual(result, np.datetime64('2016-12-30'))
+        assert_array_equal(self.calendar.is_trading_date(
+            ['2017-01-01', '2017-01-03']), [False, True])
+
+    def test_date_range(self):
+        result = self.calendar.date_range('2017-01-01', dt.date(2017, 1, 5))
+        benchmark = np.array(['2017-01-03', '2017-01-04', '2017-01-05'],
+                             dtype='M8[D]')
+        assert_array_equal(result, benchmark)
+
+    def test_persistence(self):
+        self.calendar.get_dates()
+        self.calendar.get_dates()
+        self.assertEqual(self.loads, 1)
+        self.assertTrue(os.path.isfile(self.cache_path))
+        # New instance reads file
+        calendar = TradingCalendar(self._load_dates, self.cache_path,
+                                   self._get_as_of)
+        self.assertEqual(len(calendar.get_dates()), 6)
+        self.assertEqual(self.loads, 1)
+        # Table update makes the file and loaded dates stale
+        self.as_of = dt.datetime(2017, 1, 10, 7, 45)
+        calendar.get_dates()
+        self.assertEqual(self.loads, 2)
+        calendar = TradingCalendar(self._load_dates, self.cache_path,
+                                   self._get_as_of)
+        calendar.get_dates()
+        self.assertEqual(self.loads, 2)
+        self.assertListEqual(os.listdir(self.cache_dir),
+                             ['dates.npz'])
+        # Unknown stamp keeps loaded and persisted dates
+        self.as_of = None
+        calendar.get_dates()
+        calendar = TradingCalendar(self._load_dates, self.cache_path,
+                                   self._get_as_of)
+        self.assertEqual(len(calendar.get_dates()), 6)
+        self.assertEqual(self.loads, 2)
+        self.as_of = dt.datetime(2017, 1, 10, 7, 45)
+        calendar.get_dates()
+        self.assertEqual(self.loads, 2)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
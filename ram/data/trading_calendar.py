@@ -0,0 +1,166 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+from ram import config
+from ram.utils.read_write import atomic_write
+
+
+class TradingCalendar(object):
+
+    def __init__(self,
+                 load_func,
+                 cache_path=None,
+                 as_of_func=None):
+        """
+        Sorted array of trading dates that answers date lookups locally
+        with `searchsorted`. Dates are loaded once through `load_func`,
+        persisted to `cache_path` with the data-as-of stamp they were
+        loaded at, and reloaded when `as_of_func` returns a new stamp.
+
+        Parameters
+        ----------
+        load_func : function
+            Returns an iterable of dates
+        cache_path : str
+            Optional .npz file the dates are persisted to
+        as_of_func : function
+            Returns the time of the last table update. Without it dates
+            are loaded once.
+        """
+        self._load_func = load_func
+        self._cache_path = cache_path
+        self._as_of_func = as_of_func
+        self._lock = threading.Lock()
+        self._dates = None
+        self._as_of = None
+
+    # ~~~~~~ Interface ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def get_dates(self):
+        """
+        Returns sorted datetime64[D] array of trading dates
+        """
+        with self._lock:
+            as_of = self._get_as_of()
+            # Dates already loaded are kept while the stamp is unknown
+            if (self._dates is None) or \
+                    ((as_of is not None) and (self._as_of != as_of)):
+                self._load(as_of)
+            return self._dates
+
+    def refresh(self):
+        with self._lock:
+            self._load(self._get_as_of(), use_file=False)
+
+    def prior_trading_date(self, dates):
+        """
+        Last trading date strictly before each date
+        """
+        return self._lookup(dates, 'left', -1)
+
+    def next_trading_date(self, dates):
+        """
+        First trading date strictly after each date
+        """
+        return self._lookup(dates, 'right', 0)
+
+    def offset(self, dates, n):
+        """
+        Trading date `n` trading days from each date. Non-trading dates
+        are first rolled forward to the next trading date, so `n=0`
+        returns the current or next trading date.
+        """
+        return self._lookup(dates, 'left', n)
+
+    def is_trading_date(self, dates):
+        all_dates = self.get_dates()
+        dates, scalar = _to_datetime64(dates)
+        inds = np.searchsorted(all_dates, dates).clip(0, len(all_dates) - 1)
+        out = all_dates[inds] == dates
+        return out[0] if scalar else out
+
+    def date_range(self, start_date, end_date):
+        """
+        Trading dates between start and end date, inclusive
+        """
+        all_dates = self.get_dates()
+        start_date = _to_datetime64(start_date)[0][0]
+        end_date = _to_datetime64(end_date)[0][0]
+        i1 = np.searchsorted(all_dates, start_date, side='left')
+        i2 = np.searchsorted(all_dates, end_date, side='right')
+        return all_dates[i1:i2]
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _lookup(self, dates, side, shift):
+        all_dates = self.get_dates()
+        dates, scalar = _to_datetime64(dates)
+        inds = np.searchsorted(all_dates, dates, side=side) + shift
+        valid = (inds >= 0) & (inds < len(all_dates))
+        out = np.full(len(dates), np.datetime64('NaT'), dtype='M8[D]')
+        out[valid] = all_dates[inds[valid]]
+        return out[0] if scalar else out
+
+    def _get_as_of(self):
+        """
+        Stamp as a string, as stored in the file, or None if `as_of_func`
+        can't tell
+        """
+        if self._as_of_func is None:
+            return ''
+        as_of = self._as_of_func()
+        return str(as_of) if as_of is not None else None
+
+    def _load(self, as_of, use_file=True):
+        if use_file and self._cache_path and \
+                os.path.isfile(self._cache_path):
+            archive = np.load(self._cache_path)
+            file_as_of = str(archive['as_of'])
+            dates = archive['dates']
+            archive.close()
+            if (as_of is None) or (file_as_of == as_of):
+                self._dates = dates
+                self._as_of = file_as_of
+                return
+        dates = pd.to_datetime(list(self._load_func())).values
+        self._dates = np.unique(dates.astype('M8[D]'))
+        self._as_of = as_of
+        # Dates of an unknown stamp are not persisted
+        if self._cache_path and (as_of is not None):
+            cache_dir = os.path.dirname(self._cache_path)
+            if cache_dir and not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            with atomic_write(self._cache_path) as f:
+                np.savez(f, dates=self._dates, as_of=np.array(as_of))
+
+
+###############################################################################
+
+_CALENDARS = {}
+_CALENDARS_LOCK = threading.Lock()
+
+
+def get_trading_calendar(name, load_func, as_of_func=None,
+                         cache_dir=config.TRADING_CALENDAR_DIR):
+    """
+    Returns the process-wide calendar registered under `name`, creating
+    it with `load_func` and `as_of_func` the first time it is requested.
+    """
+    with _CALENDARS_LOCK:
+        if name not in _CALENDARS:
+            cache_path = os.path.join(cache_dir, '{}.npz'.format(name)) \
+                if cache_dir else None
+            _CALENDARS[name] = TradingCalendar(load_func, cache_path,
+                                               as_of_func)
+        return _CALENDARS[name]
+
+
+def _to_datetime64(dates):
+    scalar = not isinstance(dates, (list, tuple, np.ndarray, pd.Index,
+                                    pd.Series))
+    if scalar:
+        dates = [dates]
+    dates = pd.to_datetime(np.asarray(dates)).values.astype('M8[D]')
+    return dates, scalar
@@ -12,7 +12,6 @@ import datetime as dt
 
 from sklearn.externals import joblib
 
-from StringIO import StringIO
 from google.cloud import storage
 
 from abc import ABCMeta, abstractmethod, abstractproperty
@@ -22,9 +21,16 @@ from ram import config
 from gearbox import convert_date_array
 
 from ram.data.data_constructor import DataConstructor
+from ram.data.gcs_cache import get_gcs_cache
+from ram.data.gcs_catalog import get_bucket_catalog
 
 from ram.utils.documentation import get_git_branch_commit
 from ram.utils.documentation import prompt_for_description
+from ram.utils.read_write import PREPPED_DATA_FORMATS
+from ram.utils.read_write import PREPPED_DATA_MANIFEST
+from ram.utils.read_write import is_prepped_data_file
+from ram.utils.read_write import read_manifest
+from ram.utils.read_write import read_prepped_data
 
 
 class Strategy(object):
@@ -97,7 +103,10 @@ class Strategy(object):
                  write_flag=False,
                  ram_prepped_data_dir=config.PREPPED_DATA_DIR,
                  ram_simulations_dir=config.SIMULATIONS_DATA_DIR,
-                 ram_implementation_dir=config.IMPLEMENTATION_DATA_DIR):
+                 ram_implementation_dir=config.IMPLEMENTATION_DATA_DIR,
+                 compact_prepped_data=False,
+                 prepped_data_float_dtype=np.float64,
+                 categorical_seccodes=False):
         """
         Parameters
         ----------
@@ -119,6 +128,15 @@ class Strategy(object):
             the global config file
         ram_implementation_dir : str
             Location where implementation model training output will go.
+        compact_prepped_data : bool
+            Load prepped data with compact types: shared SecCode strings,
+            bool TestFlag and float features as `prepped_data_float_dtype`
+        prepped_data_float_dtype : numpy.dtype
+            For example np.float32 to halve the memory of features.
+            Features built on long rolling sums can differ from float64.
+        categorical_seccodes : bool
+            Load SecCode as a categorical. See `apply_prepped_data_schema`
+            for where that is safe.
         """
         self.strategy_code_version = strategy_code_version
         self.prepped_data_version = prepped_data_version
@@ -127,6 +145,11 @@ class Strategy(object):
         self._ram_prepped_data_dir = ram_prepped_data_dir
         self._ram_simulations_dir = ram_simulations_dir
         self._ram_implementation_dir = ram_implementation_dir
+        self._prepped_data_schema = {
+            'compact': compact_prepped_data,
+            'float_dtype': prepped_data_float_dtype,
+            'categorical_seccodes': categorical_seccodes
+        }
         self._init_gcp_implementation()
         self._init_prepped_data_dir()
         self._init_simulations_output_dir()
@@ -356,13 +379,12 @@ class Strategy(object):
             return
         # Get all run versions for increment for this run
         if self._gcp_implementation:
-            all_files = [x.name for x in self._gcp_bucket.list_blobs()]
-            strip_str = self._strategy_output_dir + '/'
-            all_files = [x for x in all_files if x.startswith(strip_str)]
-            all_files = [x.replace(strip_str, '') for x in all_files]
-            all_files = [x for x in all_files if x.find('run') >= 0]
-            new_ind = int(max(all_files).split('/')[0].split('_')[1]) + 1 \
-                if all_files else 1
+            # Refresh so runs started since the last listing are counted
+            all_dirs = get_bucket_catalog(self._gcp_bucket).list_dirs(
+                self._strategy_output_dir, refresh=True)
+            all_dirs = [x for x in all_dirs if x.find('run') >= 0]
+            new_ind = int(max(all_dirs).split('_')[1]) + 1 \
+                if all_dirs else 1
             path = os.path.join(
                 self._strategy_output_dir, 'run_{0:04d}'.format(new_ind))
         else:
@@ -557,17 +579,18 @@ class Strategy(object):
         last_run_file = max(all_files)
         run_path = os.path.join(self.strategy_run_output_dir,
                                 'index_outputs', last_run_file)
-        data_path = os.path.join(self.data_version_dir,
-                                 '{}_data.csv'.format(last_run_file[:8]))
+        data_file = [x for x in self._prepped_data_files
+                     if x[:8] == last_run_file[:8]][0]
+        data_path = os.path.join(self.data_version_dir, data_file)
 
         if self._gcp_implementation:
             rdata = read_csv_cloud(run_path, self._gcp_bucket)
             rdata = rdata.set_index(rdata.columns[0])
             rdata.index.name = None
-            ddata = read_csv_cloud(data_path, self._gcp_bucket)
+            ddata = read_prepped_data_cloud(data_path, self._gcp_bucket)
         else:
             rdata = pd.read_csv(run_path, index_col=0)
-            ddata = pd.read_csv(data_path)
+            ddata = read_prepped_data(data_path)
 
         # Infer monthly or quarterly
         d_periods = np.diff([int(x[4:6]) for x in all_files])
@@ -582,7 +605,7 @@ class Strategy(object):
 
         elif min(d_periods) == 1:
             run_dates = np.unique(convert_date_array(rdata.index))
-            data_dates = np.unique(convert_date_array(ddata.Date))
+            data_dates = np.unique(ddata.Date.dt.to_pydatetime())
             # Get data_dates from same month as run_dates
             r_year = run_dates[0].year
             r_month = run_dates[0].month
@@ -676,20 +699,32 @@ class Strategy(object):
 
     def _get_prepped_data_file_names(self):
         """
-        Files are located in /prepped_data/{Strategy}/{version_00xx}
+        Files are located in /prepped_data/{Strategy}/{version_00xx}.
+        Names come from the version manifest when there is one.
         """
-        if self._gcp_implementation:
+        manifest = self._read_data_manifest()
+        if manifest is not None:
+            all_files = manifest.keys()
+        elif self._gcp_implementation:
             cursor = self._gcp_bucket.list_blobs(prefix=self.data_version_dir)
             all_files = [x.name for x in cursor]
             all_files = [x.split('/')[-1] for x in all_files]
         else:
             all_files = os.listdir(self.data_version_dir)
-        data_files = [x for x in all_files if x.find('_data.csv') > -1]
-        if 'market_index_data.csv' in data_files:
-            data_files.remove('market_index_data.csv')
+        data_files = [x for x in all_files if is_prepped_data_file(x)]
         self._prepped_data_files = data_files
         self._prepped_data_files.sort()
 
+    def _read_data_manifest(self):
+        if self._gcp_implementation:
+            blob = self._gcp_bucket.get_blob(os.path.join(
+                self.data_version_dir, PREPPED_DATA_MANIFEST))
+            if blob is None:
+                return None
+            return json.loads(blob.download_as_string())['files']
+        else:
+            return read_manifest(self.data_version_dir)
+
     # ~~~~~~ To Be Used by Derived Class ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
     def read_data_from_index(self, index):
@@ -698,26 +733,31 @@ class Strategy(object):
         dpath = os.path.join(self.data_version_dir,
                              self._prepped_data_files[index])
         if self._gcp_implementation:
-            data = read_csv_cloud(dpath, self._gcp_bucket)
+            # Files are read in order, so download the next ones meanwhile
+            next_files = self._prepped_data_files[
+                index + 1:index + 1 + config.GCS_PREFETCH_FILES]
+            get_gcs_cache().prefetch(
+                self._gcp_bucket,
+                [os.path.join(self.data_version_dir, f) for f in next_files])
+            return read_prepped_data_cloud(dpath, self._gcp_bucket,
+                                           **self._prepped_data_schema)
         else:
-            data = pd.read_csv(dpath)
-        data.Date = convert_date_array(data.Date)
-        data.SecCode = data.SecCode.astype(int).astype(str)
-        return data
+            return read_prepped_data(dpath, **self._prepped_data_schema)
 
     def read_market_index_data(self):
-        try:
-            dpath = os.path.join(self.data_version_dir,
-                                 'market_index_data.csv')
-            if self._gcp_implementation:
-                data = read_csv_cloud(dpath, self._gcp_bucket)
-            else:
-                data = pd.read_csv(dpath)
-            data.Date = convert_date_array(data.Date)
-            data.SecCode = data.SecCode.astype(int).astype(str)
-            return data
-        except:
-            return pd.DataFrame()
+        for ext in PREPPED_DATA_FORMATS.values():
+            try:
+                dpath = os.path.join(self.data_version_dir,
+                                     'market_index_data' + ext)
+                if self._gcp_implementation:
+                    return read_prepped_data_cloud(
+                        dpath, self._gcp_bucket, **self._prepped_data_schema)
+                else:
+                    return read_prepped_data(dpath,
+                                             **self._prepped_data_schema)
+            except:
+                continue
+        return pd.DataFrame()
 
     def write_index_results(self, returns_df, index, suffix='returns'):
         """
@@ -725,7 +765,9 @@ class Strategy(object):
         """
         if not self._write_flag:
             return
-        output_name = self._prepped_data_files[index].replace('data', suffix)
+        output_name = os.path.splitext(
+            self._prepped_data_files[index])[0].replace('data', suffix) + \
+            '.csv'
         output_path = os.path.join(self.strategy_run_output_dir,
                                    'index_outputs', output_name)
         if self._gcp_implementation:
@@ -736,8 +778,9 @@ class Strategy(object):
     def write_index_stats(self, stats, index):
         if not self._write_flag:
             return
-        output_name = self._prepped_data_files[index].replace(
-            'data.csv', 'stats.json')
+        output_name = os.path.splitext(
+            self._prepped_data_files[index])[0].replace('data', 'stats') + \
+            '.json'
         output_path = os.path.join(self.strategy_run_output_dir,
                                    'index_outputs', output_name)
         if self._gcp_implementation:
@@ -829,14 +872,19 @@ def write_json_cloud(out_dictionary, path, bucket):
 
 
 def read_json_cloud(path, bucket):
-    blob = bucket.get_blob(path)
     # json.dumps is to get rid of unicode
-    return json.loads(blob.download_as_string(), object_hook=_byteify)
+    return json.loads(get_gcs_cache().download_as_string(bucket, path),
+                      object_hook=_byteify)
 
 
 def read_csv_cloud(path, bucket):
-    blob = bucket.get_blob(path)
-    return pd.read_csv(StringIO(blob.download_as_string()))
+    with get_gcs_cache().open_blob(bucket, path) as f:
+        return pd.read_csv(f)
+
+
+def read_prepped_data_cloud(path, bucket, **kwargs):
+    with get_gcs_cache().open_blob(bucket, path) as f:
+        return read_prepped_data(f, file_name=path, **kwargs)
 
 
 def to_csv_cloud(data, path, bucket):
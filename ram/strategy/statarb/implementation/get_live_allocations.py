@@ -11,8 +11,8 @@ from ram import config
 from ram.strategy.statarb import statarb_config
 from ram.strategy.statarb.main import StatArbStrategy
 from ram.data.data_handler_sql import DataHandlerSQL
-
-from gearbox import convert_date_array
+from ram.utils.read_write import find_prepped_data_file
+from ram.utils.read_write import read_prepped_data
 
 from ramex.orders.orders import LOCOrder, VWAPOrder
 from ramex.application.client import ExecutionClient
@@ -45,11 +45,12 @@ def import_raw_data(data_dir=BASE_DIR):
     output = {}
     print('Importing data...')
     for f in get_todays_version_file_names(data_dir):
-        name = f.replace('.csv', '')
+        name = os.path.splitext(f)[0]
         data = import_format_raw_data(f, data_dir)
         output[name] = data
-    output['market_data'] = import_format_raw_data('market_index_data.csv',
-                                                   data_dir)
+    market_file = find_prepped_data_file(
+        os.listdir(os.path.join(data_dir, 'live')), 'market_index_data')
+    output['market_data'] = import_format_raw_data(market_file, data_dir)
     return output
 
 
@@ -63,10 +64,7 @@ def get_todays_version_file_names(data_dir=BASE_DIR):
 
 def import_format_raw_data(file_name, data_dir=BASE_DIR):
     path = os.path.join(data_dir, 'live', file_name)
-    data = pd.read_csv(path)
-    data.Date = convert_date_array(data.Date)
-    data.SecCode = data.SecCode.astype(int).astype(str)
-    return data
+    return read_prepped_data(path)
 
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -79,11 +77,12 @@ def import_raw_data_archive(recon_date, data_dir=BASE_DIR):
                             'live_directories', dir_name)
 
     for f in get_archive_version_file_names(dir_path):
-        name = f.replace('.csv', '')
+        name = os.path.splitext(f)[0]
         data = import_format_raw_data_archive(f, dir_path)
         output[name] = data
     output['market_data'] = import_format_raw_data_archive(
-        'market_index_data.csv', dir_path)
+        find_prepped_data_file(os.listdir(dir_path), 'market_index_data'),
+        dir_path)
     return output
 
 
@@ -97,10 +96,7 @@ def get_archive_version_file_names(dir_path):
 
 def import_format_raw_data_archive(file_name, dir_path):
     path = os.path.join(dir_path, file_name)
-    data = pd.read_csv(path)
-    data.Date = convert_date_array(data.Date)
-    data.SecCode = data.SecCode.astype(int).astype(str)
-    return data
+    return read_prepped_data(path)
 
 
 ###############################################################################
@@ -31,14 +31,16 @@ def pull_version_data():
     print('[[ Pulling data ]]')
 
     prefix = dt.date.today().strftime('%Y%m%d')
+    all_files = os.listdir(path)
 
     for b, blueprint in blueprints.iteritems():
         # Manually set instance attributes for running live
         blueprint.constructor_type = 'universe_live'
         blueprint.output_file_dir = path
         blueprint.output_file_name = '{}_{}'.format(prefix, b)
-        # Pull data via DataConstructor
-        dc.run_live(blueprint)
+        # Pull data via DataConstructor, only adding new dates to the
+        # previous file if it is for the same universe
+        dc.run_live(blueprint, get_previous_file_name(all_files, prefix, b))
         print('  {} completed'.format(b))
 
     # Rename market_index_data with prefix
@@ -51,6 +53,15 @@ def pull_version_data():
     return
 
 
+def get_previous_file_name(all_files, prefix, version):
+    """
+    Most recent archived file for the version from before today
+    """
+    files = [x for x in all_files if (x.split('.')[0][9:] == version) and
+             (x[:8] < prefix)]
+    return max(files) if files else None
+
+
 def get_unique_blueprints():
     """
     These blueprints come from JSON files that were prepared by the
@@ -4,6 +4,7 @@ import numpy as np
 import pandas as pd
 import datetime as dt
 
+from ram.data.panel import DataPanel
 from ram.data.feature_creator import *
 
 from ram.strategy.statarb.abstract.data_container import BaseDataContainer
@@ -13,6 +14,11 @@ from ram.strategy.statarb.version_005.constructor.constructor import \
 LOW_PRICE_FILTER = 7
 LOW_LIQUIDITY_FILTER = 3
 
+# Pricing columns technical features and binaries are made from
+TECHNICAL_FIELDS = ['AdjOpen', 'AdjHigh', 'AdjLow', 'AdjClose', 'AdjVolume',
+                    'AvgDolVol']
+LIVE_WINDOW_FIELDS = ['AdjHigh', 'AdjLow', 'AdjClose', 'AdjVolume']
+
 data_rank_func = data_rank
 
 
@@ -114,6 +120,12 @@ class DataContainer(BaseDataContainer):
         self._live_prepped_data['market_data'] = market_data
         self._live_prepped_data['prepped_data'] = prepped_data
         self._live_prepped_data['prepped_features'] = prepped_features
+        # Trailing windows of yesterday's prices, that each refresh of live
+        # prices completes with today's bar
+        panel = DataPanel(data, LIVE_WINDOW_FIELDS)
+        self._live_prepped_data['live_windows'] = {
+            f: LiveWindows(panel.get_clean_frame(f))
+            for f in LIVE_WINDOW_FIELDS}
         self._constructor_data = {}
 
     def process_live_data(self, live_pricing_data):
@@ -141,18 +153,21 @@ class DataContainer(BaseDataContainer):
         data = calculate_avgdolvol(data)
         # Cleanup
         data = self._initial_clean(data, -1)
+        # Pivot once for all technical variables
+        panel = DataPanel(data, TECHNICAL_FIELDS)
 
         # Technical variable calculation
         # data_tech, features_tech = self._make_technical_features(
         #     data, live_flag=True)
 
         tdata1, features_t1 = self._make_technical_features(
-            data, live_flag=True, data_rank_create_flag=False)
+            data, live_flag=True, data_rank_create_flag=False, panel=panel)
 
         tdata2, features_t2 = self._make_technical_features(
-            data, live_flag=True, data_rank_create_flag=True)
+            data, live_flag=True, data_rank_create_flag=True, panel=panel)
 
-        bdata, features_b = self._make_binaries(data, live_flag=True)
+        bdata, features_b = self._make_binaries(data, live_flag=True,
+                                                panel=panel)
 
         # Merge technical and non-technical
         pdata = prepped_data.merge(tdata1).merge(tdata2).merge(bdata)
@@ -195,19 +210,21 @@ class DataContainer(BaseDataContainer):
     def process_training_data(self, data, market_data, time_index):
         # First cleanup
         data = self._initial_clean(data, time_index)
+        # Pivot once for all features and responses
+        panel = DataPanel(data, TECHNICAL_FIELDS + self._fundamental_features)
 
         # Create process training data, and get features
-        adata, features_a = self._make_features(data)
+        adata, features_a = self._make_features(data, panel=panel)
 
         tdata1, features_t1 = self._make_technical_features(
-            data, data_rank_create_flag=False)
+            data, data_rank_create_flag=False, panel=panel)
 
         tdata2, features_t2 = self._make_technical_features(
-            data, data_rank_create_flag=True)
+            data, data_rank_create_flag=True, panel=panel)
 
-        bdata, features_b = self._make_binaries(data)
+        bdata, features_b = self._make_binaries(data, panel=panel)
 
-        responses = self._make_responses(data)
+        responses = self._make_responses(data, panel=panel)
 
         pdata = data[['SecCode', 'Date', 'TestFlag', 'TimeIndex']] \
             .merge(adata).merge(tdata1) \
@@ -239,17 +256,17 @@ class DataContainer(BaseDataContainer):
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-    def _make_responses(self, data):
+    def _make_responses(self, data, panel=None):
         for i, days in enumerate(self._response_days_args):
-            temp = simple_responses(data, days=days).merge(
-                smoothed_responses(data, days=days))
+            temp = simple_responses(data, days=days, panel=panel).merge(
+                smoothed_responses(data, days=days, panel=panel))
             if i == 0:
                 responses = temp
             else:
                 responses = responses.merge(temp)
         return responses
 
-    def _make_features(self, data, live_flag=False):
+    def _make_features(self, data, live_flag=False, panel=None):
         """
         Makes fundamental features. Separated for speed during implementation.
         NOTE: All fundamental features are lagged for training due to
@@ -263,14 +280,22 @@ class DataContainer(BaseDataContainer):
         data : pd.DataFrame
             Entire dataframe that is available from a file, training and
             test data.
+        panel : DataPanel
+            Optional panel of `data` with the fundamental features
         """
+        if panel is None:
+            panel = DataPanel(data, self._fundamental_features)
+        lag = 0 if live_flag else 1
+        # Rank and median fill all features at once
+        ranks = data_rank_stack(
+            [panel.get_clean_frame(f, lag=lag).values
+             for f in self._fundamental_features],
+            fill_median=True, backfill=True)
         feat = FeatureAggregator()
-        for feature in self._fundamental_features:
-            if live_flag:
-                temp = clean_pivot_raw_data(data, feature, lag=0)
-            else:
-                temp = clean_pivot_raw_data(data, feature, lag=1)
-            feat.add_feature(data_rank(temp), feature, backfill=True)
+        for feature, temp in zip(self._fundamental_features, ranks):
+            temp = pd.DataFrame(temp, index=panel.dates,
+                                columns=panel.seccodes)
+            feat.add_feature(temp, feature, fill_median=False)
         pdata = data[['SecCode', 'Date']].copy()
         # Capture only the final day
         if live_flag:
@@ -287,15 +312,18 @@ class DataContainer(BaseDataContainer):
     def _make_technical_features(self,
                                  data,
                                  live_flag=False,
-                                 data_rank_create_flag=False):
+                                 data_rank_create_flag=False,
+                                 panel=None):
         # TECHNICAL VARIABLES
         # Clean and format data points
-        open_ = clean_pivot_raw_data(data, 'AdjOpen')
-        high = clean_pivot_raw_data(data, 'AdjHigh')
-        low = clean_pivot_raw_data(data, 'AdjLow')
-        close = clean_pivot_raw_data(data, 'AdjClose')
-        volume = clean_pivot_raw_data(data, 'AdjVolume')
-        avgdolvol = clean_pivot_raw_data(data, 'AvgDolVol')
+        if panel is None:
+            panel = DataPanel(data, TECHNICAL_FIELDS)
+        open_ = panel.get_clean_frame('AdjOpen')
+        high = panel.get_clean_frame('AdjHigh')
+        low = panel.get_clean_frame('AdjLow')
+        close = panel.get_clean_frame('AdjClose')
+        volume = panel.get_clean_frame('AdjVolume')
+        avgdolvol = panel.get_clean_frame('AvgDolVol')
         # All technical features should be created within this function
         feat = self._calculate_technical_features(
             open_, high, low, close, volume, avgdolvol, live_flag,
@@ -330,45 +358,49 @@ class DataContainer(BaseDataContainer):
             day_ret = day_ret.iloc[-1]
         feat.add_feature(day_ret, 'day_ret')
 
-        # PRMA vals
-        prma = PRMA(live_flag)
+        # Rolling statistics of close are shared by all windows and
+        # features below. Live, they complete yesterday's windows.
+        if live_flag:
+            high, low, windows, volume = self._get_live_windows(
+                high, low, close, volume)
+        else:
+            windows = RollingWindows(close)
+
+        # PRMA vals, including the windows of the smoothed prma
+        prma = PRMA_MULTI(live_flag).fit(
+            windows, [2, 3, 4, 10, 15, 20, 40, 80, 100, 180])
         for i in [10, 15, 20, 40, 80]:
-            feat.add_feature(data_rank(prma.fit(close, i)),
-                             'prma_{}'.format(i))
+            feat.add_feature(data_rank(prma[i]), 'prma_{}'.format(i))
 
-        vol = VOL(live_flag)
+        vol = VOL_MULTI(live_flag).fit(windows, [10, 20, 40])
         for i in [10, 20, 40]:
-            feat.add_feature(data_rank(vol.fit(close, i)),
-                             'vol_{}'.format(i))
+            feat.add_feature(data_rank(vol[i]), 'vol_{}'.format(i))
 
-        disc = DISCOUNT(live_flag)
+        disc = DISCOUNT_MULTI(live_flag).fit(windows, [40, 100, 200])
         for i in [40, 100, 200]:
-            feat.add_feature(data_rank(disc.fit(close, i)),
-                             'disc_{}'.format(i))
+            feat.add_feature(data_rank(disc[i]), 'disc_{}'.format(i))
 
-        bol = BOLL(live_flag)
+        bol = BOLL_MULTI(live_flag).fit(windows, [10, 20, 40, 80])
         for i in [10, 20, 40, 80]:
-            feat.add_feature(data_rank(bol.fit(close, i)),
-                             'boll_{}'.format(i))
+            feat.add_feature(data_rank(bol[i]), 'boll_{}'.format(i))
 
-        bol_smooth = BOLL_SMOOTH(live_flag)
+        bol_smooth = BOLL_SMOOTH_MULTI(live_flag)
+        bol2 = bol_smooth.fit(windows, 2, [40, 80])
         for i in [40, 80]:
-            feat.add_feature(data_rank(bol_smooth.fit(close, 2, i)),
-                             'boll2_{}'.format(i))
+            feat.add_feature(data_rank(bol2[i]), 'boll2_{}'.format(i))
 
+        bol4 = bol_smooth.fit(windows, 4, [80, 160])
         for i in [80, 160]:
-            feat.add_feature(data_rank(bol_smooth.fit(close, 4, i)),
-                             'boll4_{}'.format(i))
+            feat.add_feature(data_rank(bol4[i]), 'boll4_{}'.format(i))
 
-        rsi = RSI(live_flag)
+        rsi = RSI_MULTI(live_flag).fit(windows, [15, 30, 100])
         for i in [15, 30, 100]:
-            feat.add_feature(data_rank(rsi.fit(close, i)),
-                             'rsi_{}'.format(i))
+            feat.add_feature(data_rank(rsi[i]), 'rsi_{}'.format(i))
 
-        mfi = MFI(live_flag)
+        mfi = MFI_MULTI(live_flag).fit(high, low, windows, volume,
+                                       [15, 30, 100])
         for i in [15, 30, 100]:
-            feat.add_feature(data_rank(mfi.fit(high, low, close, volume, i)),
-                             'mfi_{}'.format(i))
+            feat.add_feature(data_rank(mfi[i]), 'mfi_{}'.format(i))
 
         # Smoothed prma
         smooth_params = [
@@ -378,7 +410,7 @@ class DataContainer(BaseDataContainer):
         ]
 
         for p in smooth_params:
-            ret = data_rank(prma.fit(close, p[1]) / prma.fit(close, p[0]))
+            ret = data_rank(prma[p[1]] / prma[p[0]])
             if live_flag:
                 ret = ret.iloc[-1]
             feat.add_feature(ret, 'prma_{}_{}'.format(p[0], p[1]))
@@ -392,9 +424,24 @@ class DataContainer(BaseDataContainer):
 
         return feat
 
-    def _make_binaries(self, data, live_flag=False):
+    def _get_live_windows(self, *frames):
+        """
+        Prepped LiveWindows of LIVE_WINDOW_FIELDS completed with today's
+        bar of each clean frame, or the frames themselves if live data
+        wasn't prepped.
+        """
+        live_windows = getattr(self, '_live_prepped_data', {}).get(
+            'live_windows')
+        if live_windows is None:
+            return frames
+        return [live_windows[f].set_bar(x.iloc[-1])
+                for f, x in zip(LIVE_WINDOW_FIELDS, frames)]
+
+    def _make_binaries(self, data, live_flag=False, panel=None):
         feat = FeatureAggregator()
-        close = clean_pivot_raw_data(data, 'AdjClose')
+        if panel is None:
+            panel = DataPanel(data, ['AdjClose'])
+        close = panel.get_clean_frame('AdjClose')
         # Make binaries here
         ret_up0 = (close.pct_change() > 0).astype(int)
         ret_up1 = ret_up0.shift(1).fillna(0)
@@ -478,9 +525,8 @@ def adjust_todays_prices(data):
 
 
 def calculate_avgdolvol(data, days=30):
-    vwap = data.pivot(index='Date', columns='SecCode', values='AdjVwap')
-    vol = data.pivot(index='Date', columns='SecCode', values='AdjVolume')
-    dolvol = vol * vwap
+    panel = DataPanel(data, ['AdjVwap', 'AdjVolume'])
+    dolvol = panel.get_frame('AdjVolume') * panel.get_frame('AdjVwap')
     avgdolvol = dolvol.rolling(days).mean().unstack().reset_index()
     avgdolvol.columns = ['SecCode', 'Date', 'AvgDolVol']
     if 'AvgDolVol' in data.columns:
@@ -490,12 +536,12 @@ def calculate_avgdolvol(data, days=30):
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-def simple_responses(data, days=2):
+def simple_responses(data, days=2, panel=None):
     """
     Just return 1 or 0 for Position or Negative return
     """
     assert isinstance(days, int)
-    close = data.pivot(index='Date', columns='SecCode', values='AdjClose')
+    close = _get_close(data, panel)
     rets = (close.pct_change(days)
             .shift(-days).rank(axis=1, pct=True) >= 0.5).astype(int)
     output = rets.unstack().reset_index()
@@ -503,9 +549,9 @@ def simple_responses(data, days=2):
     return output
 
 
-def smoothed_responses(data, days=2):
+def smoothed_responses(data, days=2, panel=None):
     assert isinstance(days, int)
-    close = data.pivot(index='Date', columns='SecCode', values='AdjClose')
+    close = _get_close(data, panel)
     for i in range(1, days+1):
         if i == 1:
             rank = close.pct_change(i).shift(-i).rank(axis=1, pct=True)
@@ -517,6 +563,12 @@ def smoothed_responses(data, days=2):
     return output
 
 
+def _get_close(data, panel):
+    if panel is None:
+        return data.pivot(index='Date', columns='SecCode', values='AdjClose')
+    return panel.get_frame('AdjClose')
+
+
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
 ACCOUNTING_FEATURES = [
@@ -80,6 +80,8 @@ class TestDataContainer(unittest.TestCase):
         data[features] = 10
         data['RClose'] = 100
         data['AvgDolVol'] = 100
+        for f in LIVE_WINDOW_FIELDS:
+            data[f] = 100
         data2 = data.copy()
         data2['Date'] = '2010-01-02'
         data2[features] = 20
@@ -94,6 +96,7 @@ class TestDataContainer(unittest.TestCase):
         self.assertTrue('market_data' in container._live_prepped_data)
         self.assertTrue('prepped_data' in container._live_prepped_data)
         self.assertTrue('prepped_features' in container._live_prepped_data)
+        self.assertTrue('live_windows' in container._live_prepped_data)
         self.assertTrue(hasattr(container, '_constructor_data'))
 
     def test_process_live_data(self):
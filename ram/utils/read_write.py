@@ -1,5 +1,12 @@
+import os
+import sys
+import json
+import hashlib
+import threading
 import numpy as np
 import pandas as pd
+from collections import OrderedDict
+from contextlib import contextmanager
 
 from ram.utils.time_funcs import convert_date_array
 
@@ -30,3 +37,272 @@ def import_sql_output(path):
         data[dc] = data[dc].apply(_strip_date)
         data[dc] = convert_date_array(data[dc])
     return data
+
+
+# ~~~~~~ Atomic writes ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+@contextmanager
+def atomic_write(path, mode='wb'):
+    """
+    Yields a file to write the contents of `path` to. The contents go to
+    a temp file, named for the process and thread so concurrent writers
+    don't collide, that replaces `path` when the block exits. Readers
+    never see a partial or missing file, and the temp file is removed
+    if the block raises.
+    """
+    tmp_path = '{}.{}.{}.tmp'.format(
+        path, os.getpid(), threading.current_thread().ident)
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+        replace_file(tmp_path, path)
+    except:
+        if os.path.isfile(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def replace_file(src, dst):
+    """
+    Renames `src` to `dst` in one step, replacing `dst` if it exists.
+    os.rename fails on Windows when `dst` exists.
+    """
+    if os.name == 'nt':
+        _move_file_replace(src, dst)
+    else:
+        os.rename(src, dst)
+
+
+def _move_file_replace(src, dst):
+    import ctypes
+    # MOVEFILE_REPLACE_EXISTING | MOVEFILE_WRITE_THROUGH
+    flags = 0x1 | 0x8
+    encoding = sys.getfilesystemencoding()
+    if isinstance(src, bytes):
+        src = src.decode(encoding)
+    if isinstance(dst, bytes):
+        dst = dst.decode(encoding)
+    if not ctypes.windll.kernel32.MoveFileExW(src, dst, flags):
+        raise ctypes.WinError()
+
+
+# ~~~~~~ Prepped data files ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# File extensions by prepped data format. `npz` stores each column as a
+# typed array with the schema, so no parsing is needed on read.
+PREPPED_DATA_FORMATS = {'csv': '.csv', 'npz': '.npz'}
+
+
+def is_prepped_data_file(file_name):
+    """
+    True for period files such as `20100101_data.npz`, in any format.
+    """
+    file_name = os.path.basename(file_name)
+    stem, ext = os.path.splitext(file_name)
+    return (ext in PREPPED_DATA_FORMATS.values()) and \
+        stem.endswith('_data') and (stem != 'market_index_data')
+
+
+def find_prepped_data_file(file_names, stem):
+    """
+    Returns the file in `file_names` named `stem` in any format, or None
+    """
+    for ext in PREPPED_DATA_FORMATS.values():
+        if stem + ext in file_names:
+            return stem + ext
+    return None
+
+
+def write_prepped_data(data, path, float_dtype=np.float64):
+    """
+    Writes in the format given by the extension of `path`. For npz,
+    SecCode is stored as int, Date as datetime64, TestFlag as bool and
+    numeric features as `float_dtype`.
+    """
+    if not path.endswith(PREPPED_DATA_FORMATS['npz']):
+        data.to_csv(path, index=False)
+        return
+    arrays = {}
+    schema = []
+    for i, col in enumerate(data.columns):
+        values = data[col].values
+        if col == 'SecCode':
+            values = values.astype(np.int64)
+        elif col == 'Date':
+            values = pd.to_datetime(values).values
+        elif col == 'TestFlag':
+            values = values.astype(bool)
+        elif values.dtype.kind in 'biuf':
+            values = values.astype(float_dtype)
+        arrays['c{}'.format(i)] = values
+        schema.append((col, values.dtype.str))
+    arrays['__schema__'] = np.array(schema)
+    with atomic_write(path) as f:
+        np.savez_compressed(f, **arrays)
+
+
+def read_prepped_data(path_or_buffer, file_name=None, columns=None,
+                      compact=False, float_dtype=np.float64,
+                      categorical_seccodes=False):
+    """
+    Reads a prepped data file of either format into the frame strategies
+    expect, with string SecCodes and datetime Dates.
+
+    Parameters
+    ----------
+    path_or_buffer : str or file-like
+    file_name : str
+        Used to detect the format when reading from a buffer
+    columns : list
+        Optional subset of columns to read
+    compact : bool
+        Apply `apply_prepped_data_schema` with `float_dtype` and
+        `categorical_seccodes`
+    """
+    file_name = file_name if file_name else path_or_buffer
+    if file_name.endswith(PREPPED_DATA_FORMATS['npz']):
+        archive = np.load(path_or_buffer, allow_pickle=True)
+        schema = [tuple(x) for x in archive['__schema__']]
+        data = pd.DataFrame(OrderedDict([
+            (col, archive['c{}'.format(i)])
+            for i, (col, _) in enumerate(schema)
+            if (columns is None) or (col in columns)]))
+        archive.close()
+    else:
+        data = pd.read_csv(path_or_buffer, usecols=columns)
+        if 'Date' in data:
+            data.Date = convert_date_array(data.Date)
+    if 'SecCode' in data:
+        data.SecCode = data.SecCode.astype(int).astype(str)
+    if compact:
+        data = apply_prepped_data_schema(data, float_dtype,
+                                         categorical_seccodes)
+    return data
+
+
+def apply_prepped_data_schema(data, float_dtype=np.float64,
+                              categorical_seccodes=False):
+    """
+    Compact in memory types for prepped data. Date becomes
+    datetime64[ns], TestFlag bool, and float features `float_dtype`.
+
+    SecCodes are stored once per distinct value: rows hold references
+    to shared strings, or with `categorical_seccodes` integer codes of
+    a categorical. Categoricals use the least memory but frame-wide
+    `fillna` with a value raises on them, as the DataContainers do, so
+    they are only for code that doesn't.
+    """
+    for col in data.columns:
+        values = data[col]
+        if col == 'SecCode':
+            if values.dtype.kind != 'O':
+                values = values.astype(int).astype(str)
+            values = values.astype('category')
+            if categorical_seccodes:
+                data[col] = values
+            else:
+                data[col] = values.cat.categories.values[
+                    values.cat.codes.values]
+        elif col == 'Date':
+            data[col] = pd.to_datetime(values)
+        elif col == 'TestFlag':
+            data[col] = values.astype(bool)
+        elif values.dtype.kind == 'f':
+            data[col] = values.astype(float_dtype)
+    return data
+
+
+# Per version index of the prepped data files, so metadata questions are
+# answered without opening data files.
+PREPPED_DATA_MANIFEST = 'manifest.json'
+
+
+def make_manifest_entry(data, path):
+    """
+    Summary of the prepped data file at `path` that was written from
+    `data`, with its distinct dates. Dates are split into train and
+    test by TestFlag if present.
+    """
+    dates = pd.to_datetime(data.Date) if 'Date' in data else pd.Series([])
+    if 'TestFlag' in data:
+        test_flag = data.TestFlag.values.astype(bool)
+    else:
+        test_flag = np.zeros(len(data), dtype=bool)
+    min_date, max_date = _min_max_date(dates)
+    min_train_date, max_train_date = _min_max_date(dates[~test_flag])
+    min_test_date, max_test_date = _min_max_date(dates[test_flag])
+    return {
+        'file_name': os.path.basename(path),
+        'n_rows': len(data),
+        'n_seccodes': data.SecCode.nunique() if 'SecCode' in data else 0,
+        'columns': data.columns.tolist(),
+        'dtypes': [data[c].dtype.str for c in data.columns],
+        'n_bytes': os.path.getsize(path),
+        'checksum': file_checksum(path),
+        'min_date': min_date,
+        'max_date': max_date,
+        'min_train_date': min_train_date,
+        'max_train_date': max_train_date,
+        'min_test_date': min_test_date,
+        'max_test_date': max_test_date,
+        'dates': sorted(pd.to_datetime(dates).dt.strftime(
+            '%Y-%m-%d').unique().tolist())
+    }
+
+
+def read_manifest(version_dir):
+    """
+    Returns dict of manifest entries keyed by file name, or None for
+    versions written before manifests existed
+    """
+    path = os.path.join(version_dir, PREPPED_DATA_MANIFEST)
+    if not os.path.isfile(path):
+        return None
+    return json.load(open(path, 'r'))['files']
+
+
+def update_manifest(version_dir, entries, drop_files=None):
+    """
+    Adds or replaces `entries` in the manifest of `version_dir`, and
+    removes the entries of `drop_files`. Versions written before
+    manifests existed get entries for their existing files first, so the
+    manifest always lists every prepped data file.
+    """
+    manifest = read_manifest(version_dir)
+    if manifest is None:
+        manifest = _backfill_manifest(
+            version_dir, [x['file_name'] for x in entries])
+    for file_name in (drop_files or []):
+        manifest.pop(file_name, None)
+    for entry in entries:
+        manifest[entry['file_name']] = entry
+    path = os.path.join(version_dir, PREPPED_DATA_MANIFEST)
+    with atomic_write(path, 'w') as f:
+        json.dump({'files': manifest}, f, indent=1, sort_keys=True)
+
+
+def _backfill_manifest(version_dir, skip_files):
+    manifest = {}
+    for file_name in os.listdir(version_dir):
+        if (not is_prepped_data_file(file_name)) or \
+                (file_name in skip_files):
+            continue
+        path = os.path.join(version_dir, file_name)
+        manifest[file_name] = make_manifest_entry(
+            read_prepped_data(path), path)
+    return manifest
+
+
+def file_checksum(path):
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def _min_max_date(dates):
+    if len(dates) == 0:
+        return None, None
+    return dates.min().strftime('%Y-%m-%d'), \
+        dates.max().strftime('%Y-%m-%d')
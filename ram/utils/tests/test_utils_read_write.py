@@ -7,7 +7,7 @@ import datetime as dt
 from numpy.testing import assert_array_equal
 from pandas.util.testing import assert_frame_equal
 
-from ram.utils.read_write import import_sql_output
+from ram.utils.read_write import *
 
 
 class TestReadWrite(unittest.TestCase):
@@ -27,6 +27,154 @@ class TestReadWrite(unittest.TestCase):
         benchmark['ReportDate'] = [dt.datetime(2015, 2, 3)]
         assert_frame_equal(result, benchmark)
 
+    def test_prepped_data_file_names(self):
+        self.assertTrue(is_prepped_data_file('20100101_data.csv'))
+        self.assertTrue(is_prepped_data_file('path/20100101_data.npz'))
+        self.assertFalse(is_prepped_data_file('market_index_data.npz'))
+        self.assertFalse(is_prepped_data_file('20100101_returns.csv'))
+        self.assertFalse(is_prepped_data_file('meta.json'))
+        result = find_prepped_data_file(['meta.json', 'market_index_data.npz'],
+                                        'market_index_data')
+        self.assertEqual(result, 'market_index_data.npz')
+        result = find_prepped_data_file(['meta.json'], 'market_index_data')
+        self.assertIsNone(result)
+
+    def test_read_write_prepped_data(self):
+        data = pd.DataFrame({
+            'SecCode': ['10', '10', '20'],
+            'Date': [dt.datetime(2010, 1, 1), dt.datetime(2010, 1, 2),
+                     dt.datetime(2010, 1, 1)],
+            'V1': [1.5, np.nan, 3],
+            'Ticker': ['A', 'A', 'B'],
+            'TestFlag': [False, True, False]},
+            columns=['SecCode', 'Date', 'V1', 'Ticker', 'TestFlag'])
+        for file_name in ['prepped_data.csv', 'prepped_data.npz']:
+            write_prepped_data(data, file_name)
+            result = read_prepped_data(file_name)
+            assert_frame_equal(result, data)
+            result = read_prepped_data(file_name, columns=['Date'])
+            self.assertListEqual(result.columns.tolist(), ['Date'])
+            os.remove(file_name)
+        # Typed schema
+        write_prepped_data(data, 'prepped_data.npz', float_dtype=np.float32)
+        archive = np.load('prepped_data.npz', allow_pickle=True)
+        schema = dict([tuple(x) for x in archive['__schema__']])
+        archive.close()
+        self.assertEqual(np.dtype(schema['SecCode']), np.int64)
+        self.assertEqual(np.dtype(schema['Date']), np.dtype('M8[ns]'))
+        self.assertEqual(np.dtype(schema['V1']), np.float32)
+        self.assertEqual(np.dtype(schema['TestFlag']), np.bool_)
+        os.remove('prepped_data.npz')
+
+    def test_apply_prepped_data_schema(self):
+        data = pd.DataFrame({
+            'SecCode': ['10', '10', '20'],
+            'Date': [dt.datetime(2010, 1, 1), dt.datetime(2010, 1, 2),
+                     dt.datetime(2010, 1, 1)],
+            'V1': [1.5, np.nan, 3],
+            'V2': [1, 2, 3],
+            'TestFlag': [0, 1, 0]},
+            columns=['SecCode', 'Date', 'V1', 'V2', 'TestFlag'])
+        result = apply_prepped_data_schema(data.copy(), np.float32)
+        self.assertEqual(result.V1.dtype, np.float32)
+        self.assertEqual(result.V2.dtype, np.int64)
+        self.assertEqual(result.TestFlag.dtype, np.bool_)
+        self.assertEqual(result.Date.dtype, np.dtype('M8[ns]'))
+        self.assertListEqual(result.SecCode.tolist(), ['10', '10', '20'])
+        self.assertIs(result.SecCode.values[0], result.SecCode.values[1])
+        # Still usable with frame-wide fills
+        result.fillna(0.5)
+        result = apply_prepped_data_schema(data.copy(),
+                                           categorical_seccodes=True)
+        self.assertEqual(result.SecCode.dtype.name, 'category')
+        self.assertEqual(result.V1.dtype, np.float64)
+        self.assertListEqual(
+            result.pivot(index='Date', columns='SecCode',
+                         values='V1').columns.tolist(), ['10', '20'])
+        write_prepped_data(data, 'prepped_data.npz')
+        result = read_prepped_data('prepped_data.npz', compact=True,
+                                   float_dtype=np.float32)
+        self.assertEqual(result.V1.dtype, np.float32)
+        self.assertEqual(result.TestFlag.dtype, np.bool_)
+        self.assertListEqual(result.SecCode.tolist(), ['10', '10', '20'])
+        os.remove('prepped_data.npz')
+
+    def test_manifest(self):
+        data = pd.DataFrame({
+            'SecCode': ['10', '10', '20'],
+            'Date': [dt.datetime(2010, 1, 1), dt.datetime(2010, 1, 4),
+                     dt.datetime(2010, 1, 5)],
+            'V1': [1.5, np.nan, 3],
+            'TestFlag': [False, False, True]},
+            columns=['SecCode', 'Date', 'V1', 'TestFlag'])
+        self.assertIsNone(read_manifest('.'))
+        write_prepped_data(data, '20100101_data.npz')
+        entry = make_manifest_entry(data, '20100101_data.npz')
+        self.assertEqual(entry['file_name'], '20100101_data.npz')
+        self.assertEqual(entry['n_rows'], 3)
+        self.assertEqual(entry['n_seccodes'], 2)
+        self.assertListEqual(entry['columns'], data.columns.tolist())
+        self.assertEqual(entry['min_train_date'], '2010-01-01')
+        self.assertEqual(entry['max_train_date'], '2010-01-04')
+        self.assertEqual(entry['min_test_date'], '2010-01-05')
+        self.assertEqual(entry['max_test_date'], '2010-01-05')
+        self.assertEqual(entry['max_date'], '2010-01-05')
+        self.assertListEqual(entry['dates'], ['2010-01-01', '2010-01-04',
+                                              '2010-01-05'])
+        self.assertEqual(entry['checksum'],
+                         file_checksum('20100101_data.npz'))
+        update_manifest('.', [entry])
+        update_manifest('.', [dict(entry, file_name='20100201_data.npz')])
+        result = read_manifest('.')
+        self.assertListEqual(sorted(result.keys()),
+                             ['20100101_data.npz', '20100201_data.npz'])
+        self.assertEqual(result['20100101_data.npz']['n_rows'], 3)
+        update_manifest('.', [], drop_files=['20100201_data.npz'])
+        self.assertListEqual(read_manifest('.').keys(),
+                             ['20100101_data.npz'])
+        os.remove('20100101_data.npz')
+        os.remove(PREPPED_DATA_MANIFEST)
+
+    def test_update_manifest_backfill(self):
+        data = pd.DataFrame({
+            'SecCode': ['10', '20'],
+            'Date': [dt.datetime(2010, 1, 1), dt.datetime(2010, 1, 4)],
+            'V1': [1.5, 3],
+            'TestFlag': [False, True]},
+            columns=['SecCode', 'Date', 'V1', 'TestFlag'])
+        # Version written before manifests, rerun adds one period
+        write_prepped_data(data, '20100101_data.npz')
+        write_prepped_data(data.iloc[:1], '20100201_data.npz')
+        entry = make_manifest_entry(data.iloc[:1], '20100201_data.npz')
+        update_manifest('.', [entry])
+        result = read_manifest('.')
+        self.assertListEqual(sorted(result.keys()),
+                             ['20100101_data.npz', '20100201_data.npz'])
+        self.assertEqual(result['20100101_data.npz']['n_rows'], 2)
+        self.assertEqual(result['20100101_data.npz']['max_test_date'],
+                         '2010-01-04')
+        self.assertEqual(result['20100201_data.npz']['n_rows'], 1)
+        os.remove('20100101_data.npz')
+        os.remove('20100201_data.npz')
+        os.remove(PREPPED_DATA_MANIFEST)
+
+    def test_atomic_write(self):
+        with atomic_write('atomic.txt', 'w') as f:
+            f.write('a')
+        with atomic_write('atomic.txt', 'w') as f:
+            f.write('b')
+        self.assertEqual(open('atomic.txt').read(), 'b')
+        with self.assertRaises(ValueError):
+            with atomic_write('atomic.txt', 'w') as f:
+                f.write('c')
+                raise ValueError
+        # Failed writes leave the file and no temp file behind
+        self.assertEqual(open('atomic.txt').read(), 'b')
+        self.assertListEqual([x for x in os.listdir('.')
+                              if x.startswith('atomic.txt')],
+                             ['atomic.txt'])
+        os.remove('atomic.txt')
+
     def tearDown(self):
         os.remove('sql_file_output.txt')
 
@@ -5,6 +5,7 @@ import datetime as dt
 from numpy.testing import assert_array_equal
 
 from ram.utils.time_funcs import check_input_date, convert_date_array
+from ram.utils.time_funcs import parse_date_strings
 
 
 class TestTimeFuncs(unittest.TestCase):
@@ -45,6 +46,29 @@ class TestTimeFuncs(unittest.TestCase):
         benchmark = np.array([dt.datetime(2010, 1, 1),
                               dt.datetime(2010, 2, 1)])
         assert_array_equal(result, benchmark)
+        dates = ['01/05/2010', '12/31/2010']
+        result = convert_date_array(dates)
+        benchmark = np.array([dt.datetime(2010, 1, 5),
+                              dt.datetime(2010, 12, 31)])
+        assert_array_equal(result, benchmark)
+        # Mixed forms and strings left to the per element parser
+        dates = ['2010-01-01', '1/5/2010', '20100201', 'junk', '01/05/10']
+        result = convert_date_array(dates)
+        self.assertEqual(result[0], dt.datetime(2010, 1, 1))
+        self.assertEqual(result[1], dt.datetime(2010, 1, 5))
+        self.assertEqual(result[2], dt.datetime(2010, 2, 1))
+        self.assertTrue(np.isnan(result[3]))
+        self.assertEqual(result[4], dt.datetime(2010, 1, 5))
+
+    def test_parse_date_strings(self):
+        dates = ['2010-01-01', '02/03/2011', '20120405', '2010-13-01',
+                 '1/5/2010', '2010-01-01 10:00', '']
+        result = parse_date_strings(dates)
+        benchmark = np.array(['2010-01-01', '2011-02-03', '2012-04-05',
+                              'NaT', 'NaT', 'NaT', 'NaT'], dtype='M8[D]')
+        assert_array_equal(result, benchmark)
+        result = parse_date_strings(['2010'])
+        self.assertTrue(np.isnat(result[0]))
 
     def tearDown(self):
         pass
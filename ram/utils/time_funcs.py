@@ -19,19 +19,91 @@ def check_input_date(date):
 
 
 def convert_date_array(dates):
+    """
+    Converts an array of dates or date strings to an array of
+    datetime.datetime. Strings as 'YYYY-MM-DD', 'mm/dd/YYYY' or
+    'YYYYMMDD' are parsed vectorized; anything else is parsed
+    individually, and is nan if it can't be parsed.
+    """
     # Convert to numpy array
     dates = np.array(dates)
     # Check if already converted series
     if isinstance(dates[0], dt.datetime):
         return dates
     if isinstance(dates[0], dt.date):
-        return np.array([dt.datetime(t.year, t.month, t.day) for t in dates])
-
-    # If string, get form of punctuation
-    elif isinstance(dates[0], str):
-        punc = ''.join(p for p in dates[0] if not p.isalnum())
-    else:
+        return dates.astype('M8[D]').astype('M8[us]').astype(dt.datetime)
+    elif not isinstance(dates[0], str):
         raise TypeError('Input must be array of strings or datetime.date')
+    parsed = parse_date_strings(dates)
+    out_dates = parsed.astype('M8[us]').astype(dt.datetime)
+    missing = np.isnat(parsed)
+    if missing.any():
+        out_dates[missing] = _convert_date_strings(dates[missing])
+    return out_dates
+
+
+def parse_date_strings(dates):
+    """
+    Vectorized parsing of 'YYYY-MM-DD', 'mm/dd/YYYY' and 'YYYYMMDD'
+    strings, which can be mixed.
+
+    Returns
+    -------
+    dates : numpy.ndarray
+        datetime64[D], NaT where a string isn't in one of these forms
+    """
+    dates = np.asarray(dates).astype(np.string_)
+    out = np.full(len(dates), np.datetime64('NaT'), dtype='M8[D]')
+    width = dates.dtype.itemsize
+    if (len(dates) == 0) or (width < 8):
+        return out
+    # One row of character codes per string, zero padded
+    chars = np.ascontiguousarray(dates).view(np.uint8).reshape(-1, width)
+    if width < 10:
+        chars = np.hstack([chars, np.zeros((len(dates), 10 - width),
+                                           dtype=np.uint8)])
+    lengths = np.char.str_len(dates)
+    is_digit = (chars >= ord('0')) & (chars <= ord('9'))
+    dash = np.full((len(dates), 1), ord('-'), dtype=np.uint8)
+
+    def _digits(inds):
+        return is_digit[:, inds].all(axis=1)
+
+    # Character positions that make up 'YYYY-MM-DD' for each form
+    forms = [
+        (10, _digits([0, 1, 2, 3, 5, 6, 8, 9]) &
+         (chars[:, 4] == ord('-')) & (chars[:, 7] == ord('-')),
+         [[0, 1, 2, 3, 4, 5, 6, 7, 8, 9]]),
+        (10, _digits([0, 1, 3, 4, 6, 7, 8, 9]) &
+         (chars[:, 2] == ord('/')) & (chars[:, 5] == ord('/')),
+         [[6, 7, 8, 9], None, [0, 1], None, [3, 4]]),
+        (8, _digits(range(8)),
+         [[0, 1, 2, 3], None, [4, 5], None, [6, 7]])
+    ]
+    for length, valid, pieces in forms:
+        inds = np.flatnonzero(valid & (lengths == length))
+        if len(inds) == 0:
+            continue
+        iso = np.hstack([dash[inds] if p is None else chars[inds][:, p]
+                         for p in pieces])
+        iso = np.ascontiguousarray(iso).view('S10').ravel()
+        try:
+            out[inds] = iso.astype('M8[D]')
+        except ValueError:
+            # Out of range months or days; leave to the slow path
+            for i, d in zip(inds, iso):
+                try:
+                    out[i] = np.datetime64(d, 'D')
+                except ValueError:
+                    pass
+    return out
+
+
+def _convert_date_strings(dates):
+    """
+    Per element parsing for strings that aren't in a standard form
+    """
+    punc = ''.join(p for p in dates[0] if not p.isalnum())
     # Convert strings
     try:
         if len(punc) > 0:
@@ -59,15 +131,39 @@ def convert_date_array(dates):
             return np.array([dt.datetime(int(t[:4]), int(t[4:6]),
                                          int(t[6:])) for t in dates])
     except:
-        def get_date(d):
-            try:
-                return dparser.parse(d, fuzzy=True,
-                                     default=dt.datetime(1900, 1, 1))
-            except:
-                return np.nan
-        out_dates = np.array(map(get_date, dates))
-        # Replace null values
-        ind = out_dates == dt.datetime(1900, 1, 1)
-        out_dates[ind] = np.nan
+        pass
 
+    def get_date(d):
+        try:
+            return dparser.parse(d, fuzzy=True,
+                                 default=dt.datetime(1900, 1, 1))
+        except:
+            return np.nan
+    out_dates = np.array(map(get_date, dates))
+    # Replace null values
+    ind = out_dates == dt.datetime(1900, 1, 1)
+    out_dates[ind] = np.nan
     return out_dates
+
+
+if __name__ == '__main__':
+
+    import time
+
+    n_dates = 1000000
+    base = np.arange(np.datetime64('1990-01-01'),
+                     np.datetime64('2018-01-01'))
+    base = base[np.arange(n_dates) % len(base)].astype(dt.date)
+    formats = [('YYYY-MM-DD', '%Y-%m-%d'),
+               ('mm/dd/YYYY', '%m/%d/%Y'),
+               ('YYYYMMDD', '%Y%m%d')]
+    for name, fmt in formats:
+        strings = np.array([d.strftime(fmt) for d in base])
+        t1 = time.time()
+        fast = convert_date_array(strings)
+        t2 = time.time()
+        slow = _convert_date_strings(strings)
+        t3 = time.time()
+        assert np.all(fast == slow)
+        print('{0}: vectorized {1:.2f}s, per element {2:.2f}s'.format(
+            name, t2 - t1, t3 - t2))